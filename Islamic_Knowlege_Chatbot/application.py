@@ -1,48 +1,74 @@
 
-from fastapi import FastAPI, APIRouter, HTTPException
+import json
+from typing import Optional
+from contextlib import asynccontextmanager
 
+from fastapi import FastAPI, APIRouter, HTTPException, Request
+from fastapi.responses import StreamingResponse, PlainTextResponse
 
-from core.config import settings
+
+from core.config import settings, qdrant_configs
 from core.app_logging import configure_logging
 from services.groq_service import groq_service
 from services.open_ai_service import openai_service
 from schemas.routes.text_query import TextQuerySchema
 from schemas.routes.audio_query import AudioQuerySchema
 from services.langgraph_service import LanggraphService
-from services.deepL_service import Deepl_Service
+from services.deepL_service import deepl_service
+from services.language_detection import language_detector
+from services.tracing import tracer, request_id_var, new_request_id
+from services.reranker_server import shared_reranker_available
 
 
 configure_logging()
 import logging
 
-application = FastAPI()
-
-
-qdrant_configs = {
-    "quran": {
-        "url": settings.QURAN_QDRANT_URL,
-        "api_key": settings.QURAN_QDRANT_API_KEY,
-        "collection": settings.QURAN_COLLECTION_NAME
-    },
-    "hadith": {
-        "url": settings.HADITH_QDRANT_URL,
-        "api_key": settings.HADITH_QDRANT_API_KEY,
-        "collection": settings.HADITH_COLLECTION_NAME
-    },
-    "tafseer": {
-        "url": settings.TAFSEER_QDRANT_URL,
-        "api_key": settings.TAFSEER_QDRANT_API_KEY,
-        "collection": settings.TAFSEER_COLLECTION_NAME
-    },
-    "general_islamic_info": {
-        "url": settings.GENERAL_ISLAMIC_INFO_URL,
-        "api_key": settings.GENERAL_ISLAMIC_INFO_KEY,
-        "collection": settings.ISLAMIC_INFO_COLLECTION_NAME
-    }
-}
-
-langgraph_service = LanggraphService(qdrant_configs)
-deepl_services = Deepl_Service()
+_langgraph_service: Optional[LanggraphService] = None
+_warmed_up = False
+
+
+def get_langgraph_service() -> LanggraphService:
+    """Build the RAG pipeline on first use rather than at import time"""
+    global _langgraph_service
+    if _langgraph_service is None:
+        with tracer.span("startup", "build_pipeline"):
+            _langgraph_service = LanggraphService(qdrant_configs)
+    return _langgraph_service
+
+
+async def warm_up() -> None:
+    """Build the pipeline, load the reranker and tokenizer and open the Qdrant connections"""
+    global _warmed_up
+    with tracer.span("startup", "warm_up"):
+        await get_langgraph_service().warm_up()
+    _warmed_up = True
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    if settings.WARM_UP_ON_STARTUP:
+        await warm_up()
+    yield
+
+
+application = FastAPI(lifespan=lifespan)
+
+
+
+@application.middleware("http")
+async def trace_request(request: Request, call_next):
+    """Assign a request id (or reuse the caller's X-Request-ID) and time the request"""
+    request_id = request.headers.get("X-Request-ID") or new_request_id()
+    token = request_id_var.set(request_id)
+    try:
+        # For streaming endpoints this covers the time until the response starts
+        with tracer.span("http_request", request.url.path):
+            response = await call_next(request)
+    finally:
+        request_id_var.reset(token)
+
+    response.headers["X-Request-ID"] = request_id
+    return response
 
 
 
@@ -52,6 +78,53 @@ async def main():
 
 
 
+@application.get("/ready")
+async def ready():
+    """Readiness probe: only route traffic to the worker once warm-up has finished"""
+    if settings.WARM_UP_ON_STARTUP and not _warmed_up:
+        raise HTTPException(status_code=503, detail="Warming up")
+    # Reranking needs the shared reranker process; stay out of rotation while it restarts
+    if settings.RERANKER_SOCKET and not await shared_reranker_available(settings.RERANKER_SOCKET):
+        raise HTTPException(status_code=503, detail="Shared reranker unavailable")
+    return {"status": "ready"}
+
+
+
+@application.get("/cache/stats")
+async def cache_stats():
+    """Semantic answer cache hit rate, lookup latency and eviction counters"""
+    return get_langgraph_service().semantic_cache.stats()
+
+
+
+@application.get("/language_detection/stats")
+async def language_detection_stats():
+    """Local language identification decisions and how often the LLM/DeepL fallback fires"""
+    return language_detector.stats()
+
+
+
+@application.get("/router/stats")
+async def router_stats():
+    """Local query routing decisions and how often the LLM classifier is still needed"""
+    return get_langgraph_service().query_router.stats()
+
+
+
+@application.get("/retrieval/stats")
+async def retrieval_stats():
+    """Adaptive retrieval depth decisions and reranker pairs saved against the fixed limit*2 pool"""
+    return get_langgraph_service().qdrant_service.depth_policy.stats()
+
+
+
+@application.get("/metrics", response_class=PlainTextResponse)
+async def metrics():
+    """Per-stage latency histograms in the Prometheus text format"""
+    return PlainTextResponse(tracer.render_prometheus(), media_type="text/plain; version=0.0.4")
+
+
+
 
 
 @application.post('/text_query')
@@ -61,7 +134,7 @@ async def process_text_query(request: TextQuerySchema):
     logging.info(f"Received user query: {user_input}")
 
     try:
-        translation_result = deepl_services.detect_and_translate_query(user_input)
+        translation_result = await deepl_service.detect_and_translate_query(user_input)
         logging.info(f"Translation result: {translation_result}")
         
         if translation_result.get("status") != "success":
@@ -71,12 +144,13 @@ async def process_text_query(request: TextQuerySchema):
         
         processed_query =  translation_result["processed_query"]
         detected_lang =  translation_result["detected_language"]
+        required_sources = translation_result.get("required_sources")
         
         logging.info(f"Processed query inside Application.py : {processed_query}")
         logging.info(f"Detected language inside application.py : {detected_lang}")
         
         #query to llm
-        llm_response = langgraph_service.query(processed_query, detected_lang)
+        llm_response = await get_langgraph_service().query(processed_query, detected_lang, required_sources=required_sources, filters=translation_result.get("filters"))
         
         if not llm_response:
             logging.error("LLM response generation failed.")
@@ -99,6 +173,49 @@ async def process_text_query(request: TextQuerySchema):
 
 
 
+async def stream_text_query(user_input: str):
+    """Detect/translate the query, then yield answer tokens as they are generated"""
+    translation_result = await deepl_service.detect_and_translate_query(user_input)
+    logging.info(f"Translation result: {translation_result}")
+
+    if translation_result.get("status") != "success":
+        logging.error("Language detection or translation failed.")
+        raise HTTPException(status_code=400, detail="Language detection or translation failed.")
+
+    processed_query =  translation_result["processed_query"]
+    detected_lang =  translation_result["detected_language"]
+    required_sources = translation_result.get("required_sources")
+
+    async for chunk in get_langgraph_service().astream_query(processed_query, detected_lang, required_sources=required_sources, filters=translation_result.get("filters")):
+        yield chunk
+
+
+
+
+
+@application.post('/text_query/stream')
+async def process_text_query_stream(request: TextQuerySchema):
+    """Process user text query and stream the response as Server-Sent Events"""
+    user_input = request.query.strip()
+    logging.info(f"Received streaming user query: {user_input}")
+
+    async def event_stream():
+        try:
+            async for chunk in stream_text_query(user_input):
+                yield f"data: {json.dumps({'token': chunk}, ensure_ascii=False)}\n\n"
+
+        except Exception as e:
+            error = {"status": "error", "message": f"Error processing query: {str(e)}"}
+            yield f"event: error\ndata: {json.dumps(error, ensure_ascii=False)}\n\n"
+
+        yield "event: done\ndata: {}\n\n"
+
+    return StreamingResponse(event_stream(), media_type="text/event-stream")
+
+
+
+
+
 @application.post('/audio_query')
 async def process_audio_query(request: AudioQuerySchema):
     """Process user audio query and return Islamic chatbot response"""    
@@ -106,14 +223,14 @@ async def process_audio_query(request: AudioQuerySchema):
     try:
         file_path = request.file_path
 
-        transcription_response = groq_service.transcribe_auto(file_path)
+        transcription_response = await groq_service.transcribe_auto(file_path)
         if transcription_response["status"] == "error":
             return transcription_response
 
         query = transcription_response["message"]
-        print(f"voice to query : {query}")
+        logging.info(f"Transcribed audio query: {query}")
         
-        translation_result = deepl_services.detect_and_translate_query(query)
+        translation_result = await deepl_service.detect_and_translate_query(query)
         
           
         if translation_result.get("status") != "success":
@@ -122,16 +239,17 @@ async def process_audio_query(request: AudioQuerySchema):
         
         processed_query =  translation_result["processed_query"]
         detected_lang =  translation_result["detected_language"]
+        required_sources = translation_result.get("required_sources")
         
         
         #query to llm
-        llm_response = langgraph_service.query(processed_query, detected_lang)
+        llm_response = await get_langgraph_service().query(processed_query, detected_lang, required_sources=required_sources, filters=translation_result.get("filters"))
         
         if not llm_response:
             raise HTTPException(status_code=500, detail="Failed to generate LLM response.")
         
            
-        final_response = deepl_services.translate_response(llm_response, detected_lang)
+        final_response = await deepl_service.translate_response(llm_response, detected_lang)
 
         return {
             "status": "success",
@@ -0,0 +1,356 @@
+"""
+Local stand-ins for every external dependency of the pipeline, registered through
+core.clients.override_client so the application code runs unchanged:
+
+- OpenAI (chat, structured output, streaming, embeddings) and Groq: an httpx MockTransport
+  behind the shared HTTP client; transcription returns the text stored in the uploaded file
+- DeepL and Tavily: fake SDK clients
+- Qdrant: in-process local mode (":memory:") seeded with synthetic documents
+- CrossEncoder: a lexical-overlap scorer
+
+Each fake sleeps for a configurable latency so the harness measures the pipeline's own
+overhead and concurrency behaviour, not just the fakes.
+"""
+
+import os
+import re
+import json
+import time
+import email.policy
+import base64
+import asyncio
+import hashlib
+import tempfile
+import functools
+from dataclasses import dataclass
+from email.parser import BytesParser
+
+import httpx
+import numpy as np
+
+
+EMBEDDING_DIM = 1536  # text-embedding-3-small
+
+_REQUIRED_SETTINGS = [
+    "DEEPL_API_KEY", "GROQ_API_KEY", "TAVILY_API_KEY", "OPENAI_API_KEY", "GEMINI_API_KEY",
+    "QURAN_QDRANT_API_KEY", "HADITH_QDRANT_API_KEY", "TAFSEER_QDRANT_API_KEY", "GENERAL_ISLAMIC_INFO_KEY",
+]
+_QDRANT_URLS = {
+    "QURAN_QDRANT_URL": "http://quran.qdrant.bench",
+    "HADITH_QDRANT_URL": "http://hadith.qdrant.bench",
+    "TAFSEER_QDRANT_URL": "http://tafseer.qdrant.bench",
+    "GENERAL_ISLAMIC_INFO_URL": "http://general.qdrant.bench",
+}
+
+_CYRILLIC = re.compile(r"[Ѐ-ӿ]")
+_WORD = re.compile(r"\w+", re.UNICODE)
+
+_WORDS = (
+    "allah mercy patience prayer fasting charity prophet companions revelation guidance faith "
+    "believers righteousness forgiveness knowledge family parents justice honesty gratitude "
+    "remembrance paradise reward deeds intention community mosque pilgrimage repentance worship"
+).split()
+
+
+@dataclass
+class BenchmarkLatencies:
+    """Simulated service latencies in milliseconds"""
+    llm_ms: float = 400.0
+    llm_token_ms: float = 0.0
+    embed_ms: float = 30.0
+    deepl_ms: float = 80.0
+    web_ms: float = 600.0
+    rerank_pair_ms: float = 0.5
+
+
+def prepare_environment(workdir: str = None) -> str:
+    """
+    Provide every required setting before core.config is imported and point the caches
+    and logs at a scratch directory, so a benchmark run never touches real services or state
+    """
+    workdir = workdir or tempfile.mkdtemp(prefix="rag-bench-")
+    for key in _REQUIRED_SETTINGS:
+        os.environ.setdefault(key, "bench")
+    for key, url in _QDRANT_URLS.items():
+        os.environ.setdefault(key, url)
+
+    os.environ["LOGGING_DIR"] = os.path.join(workdir, "logs")
+    os.environ["ROUTER_EXAMPLES_PATH"] = os.path.join(workdir, "router_examples.jsonl")
+    os.environ["TRANSLATION_MEMORY_PATH"] = os.path.join(workdir, "translation_memory.sqlite3")
+    return workdir
+
+
+@functools.lru_cache(maxsize=4096)
+def _random_unit_vector(key: str) -> np.ndarray:
+    seed = int.from_bytes(hashlib.sha1(key.encode("utf-8")).digest()[:8], "little")
+    vector = np.random.default_rng(seed).standard_normal(EMBEDDING_DIM).astype(np.float32)
+    return vector / np.linalg.norm(vector)
+
+
+def fake_embedding(text) -> np.ndarray:
+    """
+    Deterministic unit vector per input. Text is embedded as a bag of per-word vectors, so texts
+    sharing words are closer and vector scores spread like real ones do; token ids get one random vector.
+    """
+    if not isinstance(text, str):
+        return _random_unit_vector(json.dumps(text))
+
+    words = _WORD.findall(text.lower())
+    if not words:
+        return _random_unit_vector(text)
+    vector = np.sum([_random_unit_vector(word) for word in words], axis=0)
+    return vector / np.linalg.norm(vector)
+
+
+def _sources_for(query: str) -> list:
+    lowered = query.lower()
+    sources = []
+    if re.search(r"quran|surah|ayah|verse|коран|сура|аят|сур", lowered):
+        sources.append("quran")
+    if re.search(r"tafsir|tafseer|explain|тафсир|объясни|поясни", lowered):
+        sources.append("tafseer")
+    if re.search(r"hadith|prophet|sunnah|хадис|пророк", lowered):
+        sources.append("hadith")
+    return sources or ["islamic_info"]
+
+
+def _uploaded_text(request: httpx.Request) -> str:
+    """The "recording" of a transcription request: write_recordings() stores the query text as the file"""
+    message = BytesParser(policy=email.policy.default).parsebytes(
+        b"Content-Type: " + request.headers["content-type"].encode() + b"\r\n\r\n" + request.read()
+    )
+    upload = next(part for part in message.iter_parts() if part.get_filename())
+    return upload.get_payload(decode=True).decode("utf-8")
+
+
+def write_recordings(queries: list, workdir: str) -> dict:
+    """One stand-in audio file per query for /audio_query; returns {query: file path}"""
+    directory = os.path.join(workdir, "recordings")
+    os.makedirs(directory, exist_ok=True)
+
+    paths = {}
+    for i, query in enumerate(dict.fromkeys(queries)):
+        paths[query] = os.path.join(directory, f"query_{i}.wav")
+        with open(paths[query], "w", encoding="utf-8") as f:
+            f.write(query)
+    return paths
+
+
+class FakeOpenAI:
+    """httpx handler answering the OpenAI (and Groq) endpoints the services call"""
+
+    def __init__(self, latencies: BenchmarkLatencies, answer_words: int = 120):
+        self.latencies = latencies
+        self.answer_words = answer_words
+
+
+    async def __call__(self, request: httpx.Request) -> httpx.Response:
+        path = request.url.path
+        if path.endswith("/embeddings"):
+            return await self._embeddings(json.loads(request.content))
+        if path.endswith("/chat/completions"):
+            return await self._chat(json.loads(request.content))
+        if path.endswith("/audio/transcriptions"):
+            await asyncio.sleep(self.latencies.llm_ms / 1000)
+            return httpx.Response(200, text=_uploaded_text(request))
+        return httpx.Response(404, json={"error": {"message": f"No fake for {path}"}})
+
+
+    async def _embeddings(self, body: dict) -> httpx.Response:
+        await asyncio.sleep(self.latencies.embed_ms / 1000)
+        inputs = body["input"] if isinstance(body["input"], list) and not isinstance(body["input"][0], int) else [body["input"]]
+
+        data = []
+        for i, item in enumerate(inputs):
+            vector = fake_embedding(item)
+            embedding = base64.b64encode(vector.tobytes()).decode() if body.get("encoding_format") == "base64" else vector.tolist()
+            data.append({"object": "embedding", "index": i, "embedding": embedding})
+
+        return httpx.Response(200, json={
+            "object": "list", "data": data, "model": body.get("model"),
+            "usage": {"prompt_tokens": 0, "total_tokens": 0},
+        })
+
+
+    def _structured_reply(self, schema_name: str, query: str) -> dict:
+        reply = {"required_sources": _sources_for(query), "reasoning": "benchmark"}
+        if schema_name == "QueryPreprocessingSchema":
+            reply.update(language="RU" if _CYRILLIC.search(query) else "EN", english_query=query)
+        return reply
+
+
+    def _answer(self, system_prompt: str, query: str) -> str:
+        if "Reply only 'yes'" in system_prompt:
+            return "no" if _CYRILLIC.search(query) else "yes"
+        return " ".join(_WORDS[i % len(_WORDS)] for i in range(self.answer_words))
+
+
+    async def _chat(self, body: dict) -> httpx.Response:
+        await asyncio.sleep(self.latencies.llm_ms / 1000)
+
+        messages = body.get("messages", [])
+        system_prompt = next((m["content"] for m in messages if m["role"] == "system"), "")
+        query = next((m["content"] for m in reversed(messages) if m["role"] == "user"), "")
+
+        response_format = body.get("response_format") or {}
+        tools = body.get("tools") or []
+        schema_name = (response_format.get("json_schema") or {}).get("name") or (tools[0]["function"]["name"] if tools else None)
+
+        completion = {"id": "chatcmpl-bench", "created": int(time.time()), "model": body.get("model")}
+
+        if body.get("stream"):
+            return httpx.Response(200, headers={"content-type": "text/event-stream"}, content=self._stream(completion, system_prompt, query))
+
+        if schema_name:
+            arguments = json.dumps(self._structured_reply(schema_name, query))
+            if tools:
+                message = {"role": "assistant", "content": None, "tool_calls": [
+                    {"id": "call_bench", "type": "function", "function": {"name": schema_name, "arguments": arguments}}
+                ]}
+                finish_reason = "tool_calls"
+            else:
+                message, finish_reason = {"role": "assistant", "content": arguments, "refusal": None}, "stop"
+        else:
+            message, finish_reason = {"role": "assistant", "content": self._answer(system_prompt, query), "refusal": None}, "stop"
+
+        return httpx.Response(200, json={
+            **completion, "object": "chat.completion",
+            "choices": [{"index": 0, "message": message, "finish_reason": finish_reason, "logprobs": None}],
+            "usage": {"prompt_tokens": 0, "completion_tokens": 0, "total_tokens": 0},
+        })
+
+
+    async def _stream(self, completion: dict, system_prompt: str, query: str):
+        for word in self._answer(system_prompt, query).split():
+            if self.latencies.llm_token_ms:
+                await asyncio.sleep(self.latencies.llm_token_ms / 1000)
+            chunk = {**completion, "object": "chat.completion.chunk",
+                     "choices": [{"index": 0, "delta": {"content": word + " "}, "finish_reason": None}]}
+            yield f"data: {json.dumps(chunk)}\n\n".encode()
+
+        last = {**completion, "object": "chat.completion.chunk", "choices": [{"index": 0, "delta": {}, "finish_reason": "stop"}]}
+        yield f"data: {json.dumps(last)}\n\ndata: [DONE]\n\n".encode()
+
+
+@dataclass
+class FakeTextResult:
+    text: str
+    detected_source_lang: str
+
+
+class FakeDeepLTranslator:
+    """Blocking like deepl.Translator, so the service's thread offloading is exercised"""
+
+    def __init__(self, latencies: BenchmarkLatencies):
+        self.latencies = latencies
+
+
+    def _translate(self, text: str, target_lang: str) -> FakeTextResult:
+        source = "RU" if _CYRILLIC.search(text) else "EN"
+        return FakeTextResult(f"[{target_lang}] {text}", source)
+
+
+    def translate_text(self, text, source_lang=None, target_lang="EN-US", **kwargs):
+        time.sleep(self.latencies.deepl_ms / 1000)
+        if isinstance(text, list):
+            return [self._translate(item, target_lang) for item in text]
+        return self._translate(text, target_lang)
+
+
+class FakeTavilyClient:
+
+    def __init__(self, latencies: BenchmarkLatencies):
+        self.latencies = latencies
+
+
+    async def search(self, query: str, max_results: int = 1, **kwargs) -> dict:
+        await asyncio.sleep(self.latencies.web_ms / 1000)
+        return {"results": [
+            {
+                "title": f"Web result {i} for {query}",
+                "url": f"https://example.org/{hashlib.sha1(query.encode()).hexdigest()[:8]}/{i}",
+                "content": " ".join(_WORDS[(i + j) % len(_WORDS)] for j in range(80)),
+                "score": 0.8 - i * 0.1,
+            }
+            for i in range(max_results)
+        ]}
+
+
+class FakeCrossEncoder:
+    """Word-overlap scores with a per-pair cost, standing in for CrossEncoder.predict"""
+
+    def __init__(self, latencies: BenchmarkLatencies):
+        self.latencies = latencies
+
+
+    def predict(self, pairs, batch_size: int = 32, **kwargs) -> np.ndarray:
+        time.sleep(self.latencies.rerank_pair_ms * len(pairs) / 1000)
+        scores = []
+        for query, document in pairs:
+            query_words = set(_WORD.findall(query.lower()))
+            document_words = set(_WORD.findall(document.lower()))
+            scores.append(len(query_words & document_words) / (len(query_words) or 1))
+        return np.array(scores, dtype=np.float32)
+
+
+def _text(rng: np.random.Generator, words: int, topic=()) -> str:
+    # Half the words come from the document's topic, so some documents clearly match a query and others do not
+    if not len(topic):
+        return " ".join(rng.choice(_WORDS, size=words))
+    return " ".join(rng.choice(topic) if rng.random() < 0.5 else rng.choice(_WORDS) for _ in range(words))
+
+
+def _payload(content_type: str, i: int, rng: np.random.Generator) -> dict:
+    topic = rng.choice(_WORDS, size=2, replace=False)
+    if content_type == "quran":
+        return {"page_content": _text(rng, 40, topic), "metadata": {
+            "surah_number": i % 114 + 1, "ayah_number": i % 50 + 1, "surah_name": f"Surah {i % 114 + 1}",
+            "ru_translation": _text(rng, 40), "Tafsir": _text(rng, 300),
+        }}
+    if content_type == "tafseer":
+        return {"page_content": _text(rng, 200, topic), "metadata": {
+            "surah_number": i % 114 + 1, "ayah": i % 50 + 1, "ayah_translation": _text(rng, 40),
+            "En_tafsir_source": "Ibn Kathir", "En_source_url": "https://example.org/tafsir",
+            "As_Saadi_Tafseer": _text(rng, 300), "abu_Adil_tafsir": _text(rng, 300),
+            "Ibni_kathir_quran_tafsir": _text(rng, 300),
+        }}
+    if content_type == "hadith":
+        return {"page_content": _text(rng, 80, topic), "ru_page_content": _text(rng, 80), "metadata": {
+            "collection": "Sahih al-Bukhari", "hadith_number": i + 1, "grading": "Sahih",
+        }}
+    return {"page_content": _text(rng, 120, topic), "metadata": {"title": f"Article {i}", "url": f"https://example.org/article/{i}"}}
+
+
+async def seed_qdrant(qdrant_configs: dict, documents_per_collection: int, seed: int = 0) -> None:
+    """Create every configured collection in the local-mode clients and fill it with synthetic points"""
+    from qdrant_client import models
+    from core.clients import get_qdrant_client
+
+    rng = np.random.default_rng(seed)
+    for content_type, config in qdrant_configs.items():
+        client = get_qdrant_client(config["url"], config["api_key"])
+        await client.create_collection(
+            collection_name=config["collection"],
+            vectors_config=models.VectorParams(size=EMBEDDING_DIM, distance=models.Distance.COSINE),
+        )
+
+        points = []
+        for i in range(documents_per_collection):
+            payload = _payload(content_type, i, rng)
+            points.append(models.PointStruct(id=i, vector=fake_embedding(payload["page_content"]).tolist(), payload=payload))
+        await client.upsert(collection_name=config["collection"], points=points)
+
+
+def install_fakes(latencies: BenchmarkLatencies) -> None:
+    """Register the stand-ins before any service module (and its singletons) is imported"""
+    from qdrant_client import AsyncQdrantClient
+    from core.config import settings, qdrant_configs
+    from core.clients import override_client
+
+    override_client("http", httpx.AsyncClient(transport=httpx.MockTransport(FakeOpenAI(latencies))))
+    override_client("deepl", FakeDeepLTranslator(latencies))
+    override_client("tavily", FakeTavilyClient(latencies))
+    override_client(("cross_encoder", settings.RERANKER_MODEL), FakeCrossEncoder(latencies))
+
+    for config in qdrant_configs.values():
+        override_client(("qdrant", config["url"], config["api_key"]), AsyncQdrantClient(location=":memory:"))
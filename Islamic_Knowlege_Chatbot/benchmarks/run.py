@@ -0,0 +1,198 @@
+"""
+Offline benchmark / load test: drives the text, streaming and audio endpoints in-process with a recorded corpus of
+EN/RU/UK queries, with every external service replaced by the local stand-ins in benchmarks.fakes.
+Reports p50/p95/p99 per endpoint, requests/second and the per-stage breakdown from the tracer.
+
+Usage (from the Islamic_Knowlege_Chatbot directory):
+    python -m benchmarks.run
+    python -m benchmarks.run --concurrency 32 --requests 500 --endpoints text --llm-latency-ms 800
+    python -m benchmarks.run --output bench.json
+
+tiktoken needs its encoding files cached (TIKTOKEN_CACHE_DIR) for a fully offline run.
+"""
+
+import os
+import json
+import time
+import asyncio
+import argparse
+from collections import defaultdict
+
+import httpx
+import numpy as np
+
+from benchmarks.fakes import BenchmarkLatencies, prepare_environment, install_fakes, seed_qdrant, write_recordings
+
+
+ENDPOINTS = {
+    "text": "/text_query",
+    "stream": "/text_query/stream",
+    "audio": "/audio_query",
+}
+
+DEFAULT_CORPUS = os.path.join(os.path.dirname(__file__), "queries.jsonl")
+
+
+def load_corpus(path: str) -> list:
+    with open(path, encoding="utf-8") as f:
+        return [json.loads(line)["query"] for line in f if line.strip()]
+
+
+def _succeeded(path: str, response: httpx.Response) -> bool:
+    if response.status_code != 200:
+        return False
+    if path == ENDPOINTS["stream"]:
+        return "event: error" not in response.text
+    return response.json().get("status") == "success"
+
+
+async def run_load(client: httpx.AsyncClient, jobs: list, concurrency: int) -> list:
+    """Send (path, body) jobs with at most `concurrency` in flight; returns (path, seconds, ok) samples"""
+    samples = []
+    queue = iter(jobs)
+
+    async def worker():
+        for path, body in queue:
+            started = time.perf_counter()
+            try:
+                response = await client.post(path, json=body)
+                ok = _succeeded(path, response)
+            except Exception:
+                ok = False
+            samples.append((path, time.perf_counter() - started, ok))
+
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return samples
+
+
+def summarize(samples: list, wall_seconds: float) -> dict:
+    by_endpoint = defaultdict(list)
+    errors = defaultdict(int)
+    for path, seconds, ok in samples:
+        by_endpoint[path].append(seconds)
+        errors[path] += not ok
+
+    endpoints = {}
+    for path, latencies in sorted(by_endpoint.items()):
+        latencies_ms = np.array(latencies) * 1000
+        endpoints[path] = {
+            "requests": len(latencies),
+            "errors": errors[path],
+            "mean_ms": float(latencies_ms.mean()),
+            "p50_ms": float(np.percentile(latencies_ms, 50)),
+            "p95_ms": float(np.percentile(latencies_ms, 95)),
+            "p99_ms": float(np.percentile(latencies_ms, 99)),
+        }
+
+    return {
+        "requests": len(samples),
+        "wall_seconds": wall_seconds,
+        "rps": len(samples) / wall_seconds if wall_seconds else 0.0,
+        "endpoints": endpoints,
+    }
+
+
+def print_report(report: dict) -> None:
+    print(f"\n{report['requests']} requests in {report['wall_seconds']:.2f}s -> {report['rps']:.1f} req/s "
+          f"(concurrency {report['config']['concurrency']})\n")
+
+    print(f"{'endpoint':<24}{'n':>6}{'err':>6}{'mean':>10}{'p50':>10}{'p95':>10}{'p99':>10}")
+    for path, stats in report["endpoints"].items():
+        print(f"{path:<24}{stats['requests']:>6}{stats['errors']:>6}"
+              f"{stats['mean_ms']:>10.1f}{stats['p50_ms']:>10.1f}{stats['p95_ms']:>10.1f}{stats['p99_ms']:>10.1f}")
+
+    print(f"\n{'stage':<40}{'n':>6}{'err':>6}{'mean':>10}{'~p50':>10}{'~p95':>10}")
+    for stage, stats in sorted(report["stages"].items(), key=lambda item: -item[1]["mean_ms"] * item[1]["count"]):
+        print(f"{stage:<40}{stats['count']:>6}{stats['errors']:>6}"
+              f"{stats['mean_ms']:>10.1f}{stats['p50_ms']:>10.1f}{stats['p95_ms']:>10.1f}")
+    retrieval = report["retrieval"]
+    decisions = ", ".join(f"{action}={retrieval.get(action, 0)}" for action in ("early_stop", "full", "expand", "fixed"))
+    print(f"\nRetrieval depth: {decisions}; reranked {retrieval['pairs_reranked']} pairs vs "
+          f"{retrieval['pairs_fixed']} with limit*2 ({retrieval['pairs_saved_rate']:.0%} saved)")
+    print("\nLatencies in ms; stage quantiles are histogram bucket bounds.")
+
+
+async def main_async(args) -> dict:
+    workdir = prepare_environment()
+    os.environ["SEMANTIC_CACHE_ENABLED"] = str(args.semantic_cache).lower()
+    os.environ["ADAPTIVE_RETRIEVAL"] = str(not args.fixed_depth).lower()
+
+    latencies = BenchmarkLatencies(
+        llm_ms=args.llm_latency_ms,
+        llm_token_ms=args.llm_token_latency_ms,
+        embed_ms=args.embed_latency_ms,
+        deepl_ms=args.deepl_latency_ms,
+        web_ms=args.web_latency_ms,
+        rerank_pair_ms=args.rerank_pair_latency_ms,
+    )
+    install_fakes(latencies)
+
+    # Imported only now, so the service singletons are built on top of the fakes
+    from core.config import qdrant_configs
+    from application import application, warm_up, get_langgraph_service
+    from services.tracing import tracer
+    from services.open_ai_service import openai_service
+
+    # LangChain pre-tokenizes embedding inputs with tiktoken, whose BPE file is a download; send plain text
+    openai_service.embeddings.check_embedding_ctx_length = False
+
+    await seed_qdrant(qdrant_configs, args.documents)
+    # ASGITransport does not run the lifespan, warm up explicitly like a server start would
+    await warm_up()
+
+    corpus = load_corpus(args.corpus)
+    recordings = write_recordings(corpus, workdir)
+    paths = [ENDPOINTS[name] for name in args.endpoints]
+
+    def job(i: int) -> tuple:
+        # Every query goes to every endpoint in turn; the audio endpoint gets its recording
+        path, query = paths[i % len(paths)], corpus[(i // len(paths)) % len(corpus)]
+        return path, {"file_path": recordings[query]} if path == ENDPOINTS["audio"] else {"query": query}
+
+    transport = httpx.ASGITransport(app=application)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as client:
+        await run_load(client, [job(i) for i in range(args.warmup)], args.concurrency)
+        tracer.reset()
+        get_langgraph_service().qdrant_service.depth_policy.reset()
+
+        measured = [job(i) for i in range(args.warmup, args.warmup + args.requests)]
+        started = time.perf_counter()
+        samples = await run_load(client, measured, args.concurrency)
+        wall_seconds = time.perf_counter() - started
+
+    report = summarize(samples, wall_seconds)
+    report["stages"] = tracer.snapshot()
+    report["retrieval"] = get_langgraph_service().qdrant_service.depth_policy.stats()
+    report["config"] = {**vars(args), "workdir": workdir}
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the chatbot endpoints against local stand-ins")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--requests", type=int, default=200, help="Measured requests (after warm-up)")
+    parser.add_argument("--warmup", type=int, default=10)
+    parser.add_argument("--endpoints", nargs="+", default=list(ENDPOINTS), choices=sorted(ENDPOINTS))
+    parser.add_argument("--corpus", default=DEFAULT_CORPUS, help="JSONL file with one {\"query\": ...} per line")
+    parser.add_argument("--documents", type=int, default=300, help="Synthetic points per collection")
+    parser.add_argument("--semantic-cache", action="store_true", help="Keep the semantic answer cache on (repeated corpus queries then hit it)")
+    parser.add_argument("--fixed-depth", action="store_true", help="Rerank the whole limit*2 pool (ADAPTIVE_RETRIEVAL off) as a baseline")
+    parser.add_argument("--llm-latency-ms", type=float, default=400.0)
+    parser.add_argument("--llm-token-latency-ms", type=float, default=0.0, help="Delay between streamed tokens")
+    parser.add_argument("--embed-latency-ms", type=float, default=30.0)
+    parser.add_argument("--deepl-latency-ms", type=float, default=80.0)
+    parser.add_argument("--web-latency-ms", type=float, default=600.0)
+    parser.add_argument("--rerank-pair-latency-ms", type=float, default=0.5)
+    parser.add_argument("--output", help="Write the full report as JSON")
+    args = parser.parse_args()
+
+    report = asyncio.run(main_async(args))
+    print_report(report)
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2, ensure_ascii=False)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,21 +1,80 @@
 
 import os
+import queue
+import atexit
+import random
 import logging
+import logging.handlers
 
 from core.config import settings
+from services.tracing import request_id_var
+
+
+_listener = None
+
+
+class RequestIdFilter(logging.Filter):
+    """Stamp every record with the id of the request being served"""
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        record.request_id = request_id_var.get()
+        return True
 
 
 def configure_logging():
-    """Logging File Configuration"""
+    """
+    Logging configuration: callers only put records on an in-memory queue, a background
+    listener thread formats them and writes to the rotating log file (and the console when enabled).
+    """
+    global _listener
+    if _listener is not None:
+        return
 
     os.makedirs(settings.LOGGING_DIR, exist_ok=True)
 
-    logging.basicConfig(
-        filename="./logs/app.log",
-        level=logging.INFO,
+    formatter = logging.Formatter("%(asctime)s - %(levelname)s - %(request_id)s - %(name)s - %(message)s")
 
-        # Format log messages
-        format="%(asctime)s - %(levelname)s - %(message)s"
+    file_handler = logging.handlers.RotatingFileHandler(
+        os.path.join(settings.LOGGING_DIR, "app.log"),
+        maxBytes=settings.LOG_MAX_BYTES,
+        backupCount=settings.LOG_BACKUP_COUNT,
+        encoding="utf-8"
     )
+    handlers = [file_handler]
+    if settings.LOG_TO_CONSOLE:
+        handlers.append(logging.StreamHandler())
+    for handler in handlers:
+        handler.setFormatter(formatter)
+
+    # Unbounded queue, so logging never blocks the event loop
+    log_queue = queue.SimpleQueue()
+    queue_handler = logging.handlers.QueueHandler(log_queue)
+    queue_handler.addFilter(RequestIdFilter())
+
+    root = logging.getLogger()
+    root.handlers = [queue_handler]
+    root.setLevel(logging.DEBUG if settings.DEBUG else settings.LOG_LEVEL.upper())
+
+    # Third-party clients are chatty at DEBUG (every HTTP request and header)
+    for name in ("httpx", "httpcore", "openai", "urllib3", "hpack"):
+        logging.getLogger(name).setLevel(logging.WARNING)
+
+    _listener = logging.handlers.QueueListener(log_queue, *handlers, respect_handler_level=True)
+    _listener.start()
+    atexit.register(_listener.stop)
+
+
+def log_payload(logger: logging.Logger, message: str, payload) -> None:
+    """
+    Log a large payload (documents, contexts, LLM responses). Always logged when DEBUG is on,
+    otherwise only for LOG_PAYLOAD_SAMPLE_RATE of calls, and cut to LOG_PAYLOAD_MAX_CHARS.
+    The payload is only formatted when it is actually logged.
+    """
+    if not settings.DEBUG and random.random() >= settings.LOG_PAYLOAD_SAMPLE_RATE:
+        return
 
+    text = str(payload)
+    if len(text) > settings.LOG_PAYLOAD_MAX_CHARS:
+        text = f"{text[:settings.LOG_PAYLOAD_MAX_CHARS]}... ({len(text)} chars)"
 
+    logger.info(f"{message}: {text}")
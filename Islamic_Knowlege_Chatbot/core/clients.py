@@ -0,0 +1,98 @@
+import threading
+from typing import Any, Callable, Dict, Hashable
+
+import httpx
+import deepl
+from groq import AsyncGroq
+from openai import AsyncOpenAI
+from tavily import AsyncTavilyClient
+from qdrant_client import AsyncQdrantClient
+
+from core.config import settings
+
+
+# Central registry so every external client is built once per process and shares one
+# keep-alive connection pool instead of each service opening its own sockets.
+_clients: Dict[Hashable, Any] = {}
+# Reentrant: factories build their dependencies (e.g. the shared HTTP pool) through the registry too
+_lock = threading.RLock()
+
+
+def _get_or_create(key: Hashable, factory: Callable[[], Any]) -> Any:
+    with _lock:
+        if key not in _clients:
+            _clients[key] = factory()
+        return _clients[key]
+
+
+def override_client(key: Hashable, client: Any) -> None:
+    """Replace a registered client (e.g. with a local stand-in) before services are built"""
+    with _lock:
+        _clients[key] = client
+
+
+def get_http_client() -> httpx.AsyncClient:
+    """Shared HTTP/2 connection pool for the OpenAI and Groq SDKs"""
+    return _get_or_create("http", lambda: httpx.AsyncClient(
+        http2=True,
+        timeout=httpx.Timeout(settings.HTTP_TIMEOUT_SECONDS, connect=10.0),
+        limits=httpx.Limits(
+            max_connections=settings.HTTP_MAX_CONNECTIONS,
+            max_keepalive_connections=settings.HTTP_MAX_KEEPALIVE_CONNECTIONS,
+        ),
+    ))
+
+
+def get_openai_client() -> AsyncOpenAI:
+    return _get_or_create("openai", lambda: AsyncOpenAI(
+        api_key=settings.OPENAI_API_KEY,
+        http_client=get_http_client(),
+    ))
+
+
+def get_groq_client() -> AsyncGroq:
+    return _get_or_create("groq", lambda: AsyncGroq(
+        api_key=settings.GROQ_API_KEY,
+        http_client=get_http_client(),
+    ))
+
+
+def get_tavily_client() -> AsyncTavilyClient:
+    return _get_or_create("tavily", lambda: AsyncTavilyClient(api_key=settings.TAVILY_API_KEY))
+
+
+def get_deepl_translator() -> deepl.Translator:
+    return _get_or_create("deepl", lambda: deepl.Translator(auth_key=settings.DEEPL_API_KEY))
+
+
+def load_cross_encoder(model_name: str, **model_kwargs):
+    """Load the CrossEncoder in this process; sentence-transformers (and torch) is only imported here"""
+    from sentence_transformers import CrossEncoder
+    return CrossEncoder(model_name, **model_kwargs)
+
+
+def get_cross_encoder(model_name: str, **model_kwargs):
+    """
+    CrossEncoder reranking model. With RERANKER_SOCKET set, workers talk to the one shared
+    reranker process instead of each loading their own copy of the weights.
+    """
+    def factory():
+        if settings.RERANKER_SOCKET:
+            from services.reranker_server import RemoteCrossEncoder
+            return RemoteCrossEncoder(
+                settings.RERANKER_SOCKET,
+                timeout=settings.RERANKER_SOCKET_TIMEOUT,
+                connect_timeout=settings.RERANKER_SOCKET_CONNECT_TIMEOUT,
+            )
+        return load_cross_encoder(model_name, **model_kwargs)
+    return _get_or_create(("cross_encoder", model_name), factory)
+
+
+def get_qdrant_client(url: str, api_key: str) -> AsyncQdrantClient:
+    """One client (and gRPC channel when QDRANT_PREFER_GRPC) per Qdrant endpoint, shared by every content type stored there"""
+    return _get_or_create(("qdrant", url, api_key), lambda: AsyncQdrantClient(
+        url=url,
+        api_key=api_key,
+        prefer_grpc=settings.QDRANT_PREFER_GRPC,
+        grpc_port=settings.QDRANT_GRPC_PORT,
+    ))
@@ -2,13 +2,85 @@
 from pydantic_settings import BaseSettings
 
 from pathlib import Path
+from typing import Any, Dict, List, Optional
 
 class Settings(BaseSettings):
     VERSION: str = "1.3"
     LOGGING_DIR: str = "logs"
+    DEBUG: bool = False                                         # DEBUG level and every large payload logged
+    LOG_LEVEL: str = "INFO"
+    LOG_TO_CONSOLE: bool = False
+    LOG_MAX_BYTES: int = 20_000_000                             # rotate logs/app.log at this size
+    LOG_BACKUP_COUNT: int = 5
+    LOG_PAYLOAD_SAMPLE_RATE: float = 0.01                       # share of large payloads (documents, contexts, LLM replies) logged outside DEBUG
+    LOG_PAYLOAD_MAX_CHARS: int = 2000
     LLM_MODEL: str = "gpt-4.1-nano" 
     # LLM_MODEL: str = "gpt-4o"
     EMBEDDING_MODEL: str = "text-embedding-3-small"             #new added
+    EMBEDDING_CACHE_SIZE: int = 1024                            # max cached query embeddings (0 disables)
+    RERANK_WORKERS: int = 2                                     # threads running CrossEncoder.predict off the event loop
+    RERANKER_MODEL: str = "cross-encoder/ms-marco-MiniLM-L-6-v2"
+    RERANKER_BACKEND: str = "torch"                             # torch | onnx | openvino
+    RERANKER_MODEL_FILE: Optional[str] = None                   # e.g. "onnx/model_qint8_avx512_vnni.onnx" for a quantized model
+    RERANKER_BATCH_SIZE: int = 64
+    RERANKER_MAX_WAIT_MS: float = 5.0                           # micro-batching window for coalescing rerank pairs
+    RERANKER_CACHE_SIZE: int = 20000                            # cached (query, point id) scores
+    RERANKER_SOCKET: Optional[str] = None                       # Unix socket of the shared reranker process (multi-worker mode)
+    RERANKER_SOCKET_TIMEOUT: float = 30.0                       # per request to the shared reranker
+    RERANKER_SOCKET_CONNECT_TIMEOUT: float = 120.0              # how long workers wait for the reranker process to come up
+    MODEL_CACHE_DIR: str = "cache/models"                       # local Hugging Face artifacts for the reranker
+    MODEL_LOCAL_FILES_ONLY: bool = False                        # skip hub lookups when the artifacts are baked into the image
+    WARM_UP_ON_STARTUP: bool = True                             # load models and open connections before serving
+    SEMANTIC_CACHE_ENABLED: bool = True
+    SEMANTIC_CACHE_THRESHOLD: float = 0.92                      # min cosine similarity for a cache hit
+    SEMANTIC_CACHE_TTL_SECONDS: int = 86400
+    SEMANTIC_CACHE_MAX_ENTRIES: int = 2048
+    TRANSLATION_MEMORY_PATH: str = "cache/translation_memory.sqlite3"
+    QDRANT_PREFER_GRPC: bool = False                            # gRPC transport instead of REST
+    QDRANT_GRPC_PORT: int = 6334
+    QDRANT_SEARCH_PARAMS: Dict[str, Dict[str, Any]] = {}        # per content type, e.g. {"tafseer": {"hnsw_ef": 64}, "quran": {"exact": true}}
+    ADAPTIVE_RETRIEVAL: bool = True                             # rerank depth from the vector score distribution instead of a fixed limit*2
+    ADAPTIVE_SCORE_MARGIN: float = 0.05                         # candidates this far below the top vector score are not reranked
+    ADAPTIVE_FLAT_SPREAD: float = 0.02                          # pool spread under which scores are flat and more candidates are fetched
+    ADAPTIVE_EXPAND_MIN_SCORE: float = 0.3                      # only expand flat pools whose top match is at least this similar
+    ADAPTIVE_EXPAND_FACTOR: int = 2                             # extra candidates when flat, as a multiple of the content type limit
+    HYBRID_SEARCH_CONTENT_TYPES: List[str] = []                # dense + BM25 fused with RRF, once scripts/index_sparse_vectors.py ran, e.g. ["quran", "hadith"]
+    DENSE_VECTOR_NAME: Optional[str] = None                     # named dense vector, None for the default unnamed one
+    SPARSE_VECTOR_NAME: str = "bm25"
+    # Payload keys behind reference lookups and metadata filters, indexed by scripts/provision_payload_indexes.py.
+    # Assumed schema, not written by any ingestion code in this repo: only tafseer metadata.surah_number and
+    # metadata.En_tafsir_source are read elsewhere. The others are expected as
+    #   quran:   metadata.surah_number / metadata.ayah_number (int)
+    #   tafseer: metadata.ayah (int)
+    #   hadith:  metadata.collection (canonical name, see HADITH_COLLECTIONS), metadata.hadith_number (int),
+    #            metadata.grading ("Sahih" | "Hasan" | "Daif")
+    # Override with the real keys (PAYLOAD_FIELDS='{"hadith": {...}}') and run the provisioning script with
+    # --dry-run, which warns about keys no sampled point has. A missing key makes filters match nothing; the
+    # search then retries without them, and reference lookups fall back to retrieval.
+    PAYLOAD_FIELDS: Dict[str, Dict[str, str]] = {
+        "quran": {"surah": "metadata.surah_number", "ayah": "metadata.ayah_number"},
+        "tafseer": {"surah": "metadata.surah_number", "ayah": "metadata.ayah", "tafsir_source": "metadata.En_tafsir_source"},
+        "hadith": {"collection": "metadata.collection", "number": "metadata.hadith_number", "grading": "metadata.grading"},
+    }
+    HTTP_MAX_CONNECTIONS: int = 200                             # shared HTTP/2 pool for OpenAI/Groq
+    HTTP_MAX_KEEPALIVE_CONNECTIONS: int = 50
+    HTTP_TIMEOUT_SECONDS: float = 60.0
+    DEEPL_MAX_CONCURRENCY: int = 4                              # parallel DeepL requests per worker
+    COMBINED_QUERY_PREPROCESSING: bool = True                   # one LLM call for language + translation + sources on non-English input
+    ROUTER_EXAMPLES_PATH: str = "cache/router_examples.jsonl"   # labelled classifications used by the local router
+    ROUTER_CACHE_THRESHOLD: float = 0.95                        # reuse a past classification above this similarity
+    ROUTER_CONFIDENCE_THRESHOLD: float = 0.6                    # below this the LLM classifies
+    ROUTER_MIN_SIMILARITY: float = 0.7                          # nearest labelled query must be at least this similar
+    ROUTER_MIN_EXAMPLES: int = 50
+    WEB_SEARCH_ENABLED: bool = True
+    WEB_SEARCH_DEPTH: str = "advanced"                          # Tavily search_depth: basic | advanced
+    WEB_SEARCH_TIMEOUT_SECONDS: float = 4.0                     # hard deadline, answer is generated without web results after it
+    CONTEXT_MAX_TOKENS: int = 6000                              # prompt context budget across all sources
+    CONTEXT_SOURCE_WEIGHTS: Dict[str, float] = {                # relative share of the budget per source
+        "quran": 1.0, "tafseer": 1.5, "hadith": 1.0, "general_islamic_info": 1.0, "web_search": 0.75,
+    }
+    CONTEXT_MIN_DOC_TOKENS: int = 48                            # drop a passage instead of truncating it below this
+    CONTEXT_DEDUP_THRESHOLD: float = 0.85                       # word 5-gram Jaccard similarity treated as a duplicate
     QURAN_COLLECTION_NAME: str = "English_Russain_quran_translation"        #updated
     HADITH_COLLECTION_NAME: str = "hadith_collection"
     TAFSEER_COLLECTION_NAME: str = "tafseer_collection"
@@ -35,10 +107,27 @@ class Settings(BaseSettings):
 
 
 settings = Settings()
-print(f'openai api key is {settings.OPENAI_API_KEY}')
-print(f'DEEPL api key is {settings.DEEPL_API_KEY}')
 
-import os
 
-key = os.getenv("OPENAI_API_KEY")
-print("Key from os.environ:", key)
+qdrant_configs = {
+    "quran": {
+        "url": settings.QURAN_QDRANT_URL,
+        "api_key": settings.QURAN_QDRANT_API_KEY,
+        "collection": settings.QURAN_COLLECTION_NAME
+    },
+    "hadith": {
+        "url": settings.HADITH_QDRANT_URL,
+        "api_key": settings.HADITH_QDRANT_API_KEY,
+        "collection": settings.HADITH_COLLECTION_NAME
+    },
+    "tafseer": {
+        "url": settings.TAFSEER_QDRANT_URL,
+        "api_key": settings.TAFSEER_QDRANT_API_KEY,
+        "collection": settings.TAFSEER_COLLECTION_NAME
+    },
+    "general_islamic_info": {
+        "url": settings.GENERAL_ISLAMIC_INFO_URL,
+        "api_key": settings.GENERAL_ISLAMIC_INFO_KEY,
+        "collection": settings.ISLAMIC_INFO_COLLECTION_NAME
+    }
+}
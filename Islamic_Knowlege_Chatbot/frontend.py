@@ -1,13 +1,19 @@
 import os
-import asyncio
+import json
 from datetime import datetime
 
+import httpx
 import streamlit as st
 from audio_recorder_streamlit import audio_recorder
 
 from schemas.routes.text_query import TextQuerySchema
 from schemas.routes.audio_query import AudioQuerySchema 
-from application import process_text_query, process_audio_query
+
+
+# The UI talks to the API over HTTP: every Streamlit rerun is a fresh script run, while the
+# pipeline's async clients are process-wide and bound to the event loop of the server
+API_URL = os.getenv("CHATBOT_API_URL", "http://localhost:8000")
+REQUEST_TIMEOUT = httpx.Timeout(120.0, connect=5.0)
 
 
 hide_streamlit_style = """
@@ -191,17 +197,35 @@ st.markdown("""
 </style>
 """, unsafe_allow_html=True)
 
-async def send_query(query):
-    """Send query to FastAPI backend"""
+def send_query(query, placeholder):
+    """Send query to FastAPI backend and render the answer as tokens arrive"""
+    response = ""
     try:
-        data = TextQuerySchema(query=query)
-        
-        response = await process_text_query(data)
+        data = TextQuerySchema(query=query.strip())
+
+        # Server-Sent Events: "data: {token}" lines, an "event: error" before a failure, "event: done" at the end
+        event = "message"
+        with httpx.stream("POST", f"{API_URL}/text_query/stream", json=data.model_dump(), timeout=REQUEST_TIMEOUT) as stream:
+            stream.raise_for_status()
+            for line in stream.iter_lines():
+                if line.startswith("event:"):
+                    event = line[len("event:"):].strip()
+                elif line.startswith("data:"):
+                    payload = json.loads(line[len("data:"):])
+                    if event == "error":
+                        response = payload.get("message", "")
+                    elif event == "message":
+                        response += payload.get("token", "")
+                    placeholder.markdown(response + "▌")
+                elif not line:
+                    event = "message"
 
-        return response['message']
+        placeholder.markdown(response)
+        return response
 
     except Exception as e:
-        return f"Connection error: {str(e)}"
+        placeholder.markdown(f"Connection error: {str(e)}")
+        return response
 
 
 #helper funtion to save audio.wav
@@ -226,20 +250,22 @@ def save_audio_as_wav(audio_bytes: bytes, dir_path: str = "recordings") -> str |
         return None
 
 
-async def send_voice(file_path):
+def send_voice(file_path):
     """Send audio file to FastAPI backend"""
     try:
-        data = AudioQuerySchema(file_path=file_path)
+        # The backend reads the recording from disk, so it must run on the same host
+        data = AudioQuerySchema(file_path=os.path.abspath(file_path))
         
-        response = await process_audio_query(data)
+        response = httpx.post(f"{API_URL}/audio_query", json=data.model_dump(), timeout=REQUEST_TIMEOUT)
+        response.raise_for_status()
         
-        return response['message']
+        return response.json()['message']
 
     except Exception as e:
         return f"Error processing audio: {str(e)}"
 
 # Main App
-async def main():
+def main():
     st.markdown("""
     <div class="header-container">
         <h1>🕌 Islamic Knowledge Chatbot</h1>
@@ -276,7 +302,7 @@ async def main():
         with st.spinner("Processing voice input..."):
             path = save_audio_as_wav(audio_bytes)
             if path:
-                response = await send_voice(path)
+                response = send_voice(path)
                 st.success("✅ Voice input processed!")
                 st.markdown("#### Voice Response:")
                 st.markdown(response)
@@ -287,12 +313,10 @@ async def main():
 
     if st.button("Send", type="primary"):
         if st.session_state.user_input.strip():
-            with st.spinner("Getting response..."):
-                bot_response = await send_query(st.session_state.user_input)
             st.markdown("#### Your Question:")
             st.write(st.session_state.user_input)
             st.markdown("#### Response:")
-            st.markdown(bot_response)
+            send_query(st.session_state.user_input, st.empty())
         else:
             st.warning("Please enter a question or use voice input.")
 
@@ -308,4 +332,4 @@ async def main():
 
 # Entry point
 if __name__ == "__main__":
-    asyncio.run(main())
\ No newline at end of file
+    main()
\ No newline at end of file
@@ -0,0 +1,80 @@
+"""
+Multi-worker serving: gunicorn with uvicorn workers and one shared reranker process.
+
+    RERANKER_SOCKET=/tmp/islamic-chatbot-reranker.sock WEB_CONCURRENCY=8 gunicorn application:application
+
+With RERANKER_SOCKET set, the master starts `services.reranker_server` before forking the
+workers, so the CrossEncoder weights live in one process instead of one copy per worker, and
+restarts it if it exits; /ready reports 503 while it is down.
+Without it every worker loads its own model, as with plain uvicorn.
+"""
+
+import os
+import sys
+import time
+import threading
+import subprocess
+
+from core.config import settings
+
+
+bind = os.getenv("BIND", "0.0.0.0:8000")
+workers = int(os.getenv("WEB_CONCURRENCY", "4"))
+worker_class = "uvicorn.workers.UvicornWorker"
+timeout = 120
+graceful_timeout = 30
+
+# Workers build the pipeline and warm up in their own lifespan, nothing heavy to share by preloading
+preload_app = False
+
+
+_reranker_process = None
+_stopping = threading.Event()
+
+# Wait before restarting a reranker that exits, growing up to the maximum while it keeps crashing
+RESTART_DELAY_SECONDS = 1.0
+MAX_RESTART_DELAY_SECONDS = 30.0
+
+
+def _start_reranker(server):
+    global _reranker_process
+    _reranker_process = subprocess.Popen(
+        [sys.executable, "-m", "services.reranker_server", "--socket", settings.RERANKER_SOCKET],
+        cwd=os.path.dirname(os.path.abspath(__file__)),
+    )
+    server.log.info(f"Started shared reranker (pid {_reranker_process.pid}) on {settings.RERANKER_SOCKET}")
+
+
+def _supervise_reranker(server):
+    """Restart the reranker whenever it exits; workers reconnect on their next request"""
+    delay = RESTART_DELAY_SECONDS
+    while not _stopping.is_set():
+        started = time.monotonic()
+        returncode = _reranker_process.wait()
+        if _stopping.is_set():
+            return
+
+        # A process that ran for a while gets restarted promptly again
+        if time.monotonic() - started > MAX_RESTART_DELAY_SECONDS:
+            delay = RESTART_DELAY_SECONDS
+        server.log.error(f"Shared reranker exited with code {returncode}, restarting in {delay:.1f}s")
+        if _stopping.wait(delay):
+            return
+        delay = min(delay * 2, MAX_RESTART_DELAY_SECONDS)
+        _start_reranker(server)
+
+
+def on_starting(server):
+    if settings.RERANKER_SOCKET:
+        _start_reranker(server)
+        threading.Thread(target=_supervise_reranker, args=(server,), name="reranker-supervisor", daemon=True).start()
+
+
+def on_exit(server):
+    _stopping.set()
+    if _reranker_process is not None and _reranker_process.poll() is None:
+        _reranker_process.terminate()
+        try:
+            _reranker_process.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            _reranker_process.kill()
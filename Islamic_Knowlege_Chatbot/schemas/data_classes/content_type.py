@@ -1,5 +1,6 @@
 
 from enum import Enum
+from typing import Optional
 
 
 class ContentType(Enum):
@@ -7,3 +8,14 @@ class ContentType(Enum):
     HADITH = "hadith"
     TAFSEER = "tafseer"
     GENERAL = "general_islamic_info"
+
+    @classmethod
+    def from_label(cls, label: str) -> Optional["ContentType"]:
+        """Map a classifier label (e.g. 'islamic_info') to a content type"""
+        label = label.lower().strip()
+        if label == "islamic_info":
+            return cls.GENERAL
+        try:
+            return cls(label)
+        except ValueError:
+            return None
@@ -3,6 +3,8 @@ from dataclasses import dataclass, field
 from typing import List, Optional, Set, Dict, Any
 
 from schemas.data_classes.content_type import ContentType
+from schemas.data_classes.scripture_reference import ScriptureReference
+from schemas.structured_outputs.retrieval_filters import RetrievalFiltersSchema
 
 
 
@@ -11,6 +13,7 @@ class LangraphState:
     user_query: str
     base_prompt: str
     final_response: str = ""
+    context: str = ""  # assembled prompt context, filled by the build_context node
     current_source_index: int = 0
     error_message: Optional[str] = None
     web_search_results: List[Dict] = field(default_factory=list)
@@ -18,3 +21,7 @@ class LangraphState:
     required_sources: List[ContentType] = field(default_factory=list)
     retrieved_documents: Dict[str, List[Dict[str, Any]]] = field(default_factory=dict)
     detected_language: Optional[str] = None  # <-- add this field
+    query_embedding: Optional[List[float]] = None  # computed once per request, shared by every retrieval
+    request_id: str = "-"  # correlates log lines and latency spans of one request
+    reference: Optional[ScriptureReference] = None  # verse/hadith named in the query, fetched by payload filter
+    filters: Optional[RetrievalFiltersSchema] = None  # surah/collection/grading/tafsir source pushed down to Qdrant
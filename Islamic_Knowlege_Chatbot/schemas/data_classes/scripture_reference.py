@@ -0,0 +1,25 @@
+
+from dataclasses import dataclass
+from typing import List, Optional
+
+from schemas.data_classes.content_type import ContentType
+
+
+
+@dataclass
+class ScriptureReference:
+    """An exact Quran verse (range) or hadith number named in the query"""
+    content_type: ContentType  # QURAN or HADITH
+    surah: Optional[int] = None
+    ayah_start: Optional[int] = None
+    ayah_end: Optional[int] = None  # inclusive, equal to ayah_start for a single verse
+    collection: Optional[str] = None  # canonical hadith collection name
+    hadith_number: Optional[int] = None
+    exact: bool = True  # False for a bare "2:30": only a hint, looked up alongside vector retrieval
+
+    @property
+    def sources(self) -> List[ContentType]:
+        """Collections that hold the referenced text; a verse is answered with its tafseer too"""
+        if self.content_type == ContentType.QURAN:
+            return [ContentType.QURAN, ContentType.TAFSEER]
+        return [ContentType.HADITH]
@@ -1,8 +1,10 @@
 
-from typing import Literal, List
+from typing import Literal, List, Optional
 
 from pydantic import BaseModel, Field
 
+from schemas.structured_outputs.retrieval_filters import RetrievalFiltersSchema
+
 
 class QueryClassificationSchema(BaseModel):
     """Structured output for query classification"""
@@ -12,3 +14,6 @@ class QueryClassificationSchema(BaseModel):
     reasoning: str = Field(
         description="Brief explanation of why these sources were selected"
     )
+    filters: Optional[RetrievalFiltersSchema] = Field(
+        default=None, description="Surah, hadith collection, grading or tafsir source the question explicitly restricts to"
+    )
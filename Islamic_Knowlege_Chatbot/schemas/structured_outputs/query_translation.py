@@ -1,9 +1,21 @@
+from typing import List, Literal, Optional
 
 from pydantic import BaseModel, Field
 
+from schemas.structured_outputs.retrieval_filters import RetrievalFiltersSchema
 
-class TranslateQuerySchema(BaseModel):
-    """Schema for translating text."""
 
-    text: str = Field(description="Text in English")
-    is_russian: bool = Field(default=False, description="True if the original query is in Russian, False otherwise")
+class QueryPreprocessingSchema(BaseModel):
+    """Structured output for detecting the query language, translating it and classifying it in one call."""
+
+    language: str = Field(description="ISO 639-1 code of the query's primary language in uppercase, e.g. EN, RU, UK")
+    english_query: str = Field(description="The query rendered in English (unchanged if it is already English)")
+    required_sources: List[Literal['quran', 'hadith', 'tafseer', 'islamic_info']] = Field(
+        description="List of required sources from: quran, hadith, tafseer, islamic_info"
+    )
+    reasoning: str = Field(
+        description="Brief explanation of why these sources were selected"
+    )
+    filters: Optional[RetrievalFiltersSchema] = Field(
+        default=None, description="Surah, hadith collection, grading or tafsir source the question explicitly restricts to"
+    )
@@ -0,0 +1,29 @@
+from typing import Literal, Optional
+
+from pydantic import BaseModel, Field
+
+
+# Canonical names as stored in the hadith payload (metadata.collection)
+HADITH_COLLECTIONS = (
+    "Sahih al-Bukhari", "Sahih Muslim", "Sunan Abi Dawud", "Jami at-Tirmidhi", "Sunan an-Nasai",
+    "Sunan Ibn Majah", "Muwatta Malik", "Musnad Ahmad", "Riyad as-Salihin", "40 Hadith Nawawi",
+)
+
+
+class RetrievalFiltersSchema(BaseModel):
+    """Metadata constraints named in the query, pushed down to Qdrant as payload filters"""
+    surah: Optional[int] = Field(
+        default=None, ge=1, le=114, description="Surah number when the question is about one specific surah"
+    )
+    collection: Optional[Literal[HADITH_COLLECTIONS]] = Field(
+        default=None, description="Hadith collection when the question names one"
+    )
+    grading: Optional[Literal['Sahih', 'Hasan', 'Daif']] = Field(
+        default=None, description="Hadith grading when the question asks for e.g. only authentic (Sahih) hadith"
+    )
+    tafsir_source: Optional[str] = Field(
+        default=None, description="Tafsir work when the question names one, e.g. Ibn Kathir, Al-Jalalayn, Ibn Abbas"
+    )
+
+    def is_empty(self) -> bool:
+        return not any(self.model_dump().values())
@@ -0,0 +1,123 @@
+"""
+Offline job: add BM25 sparse vectors (`SPARSE_VECTOR_NAME`) to collections so they can be
+listed in HYBRID_SEARCH_CONTENT_TYPES.
+
+Qdrant cannot add a new vector to an existing collection, so when the sparse vector is missing
+the points are copied into `<collection><suffix>` with both vectors; point the *_COLLECTION_NAME
+setting at the new collection afterwards. Collections that already have it are updated in place.
+
+Usage (from the Islamic_Knowlege_Chatbot directory):
+    python -m scripts.index_sparse_vectors --collections quran hadith
+    python -m scripts.index_sparse_vectors --collections tafseer --suffix _v2 --batch-size 64
+"""
+
+import argparse
+import logging
+
+from qdrant_client import QdrantClient, models
+
+from core.config import settings, qdrant_configs
+from services.sparse_encoder import SparseEncoder
+
+logger = logging.getLogger(__name__)
+
+
+def _scroll(client: QdrantClient, collection_name: str, batch_size: int, with_vectors: bool):
+    offset = None
+    while True:
+        points, offset = client.scroll(
+            collection_name=collection_name,
+            limit=batch_size,
+            offset=offset,
+            with_payload=True,
+            with_vectors=with_vectors,
+        )
+        yield points
+        if offset is None:
+            return
+
+
+def average_length(client: QdrantClient, collection_name: str, batch_size: int) -> float:
+    """Mean token count of page_content, the BM25 length normalisation constant"""
+    total = count = 0
+    for points in _scroll(client, collection_name, batch_size, with_vectors=False):
+        for point in points:
+            total += len(SparseEncoder.tokenize(point.payload.get("page_content", "")))
+            count += 1
+    return total / count if count else 1.0
+
+
+def index_collection(client: QdrantClient, collection_name: str, encoder: SparseEncoder, batch_size: int, suffix: str) -> str:
+    """Write sparse vectors for every point; returns the collection that now holds them"""
+
+    params = client.get_collection(collection_name).config.params
+    in_place = bool(params.sparse_vectors and settings.SPARSE_VECTOR_NAME in params.sparse_vectors)
+    target = collection_name if in_place else collection_name + suffix
+
+    if not in_place:
+        client.create_collection(
+            collection_name=target,
+            vectors_config=params.vectors,
+            sparse_vectors_config={
+                **(params.sparse_vectors or {}),
+                settings.SPARSE_VECTOR_NAME: models.SparseVectorParams(modifier=models.Modifier.IDF),
+            },
+        )
+
+    written = 0
+    for points in _scroll(client, collection_name, batch_size, with_vectors=not in_place):
+        sparse = [encoder.encode_document(point.payload.get("page_content", "")) for point in points]
+
+        if in_place:
+            client.update_vectors(
+                collection_name=target,
+                points=[
+                    models.PointVectors(id=point.id, vector={settings.SPARSE_VECTOR_NAME: vector})
+                    for point, vector in zip(points, sparse)
+                ],
+                wait=False,
+            )
+        else:
+            client.upsert(
+                collection_name=target,
+                points=[
+                    models.PointStruct(
+                        id=point.id,
+                        payload=point.payload,
+                        # An unnamed dense vector is addressed as ""
+                        vector={
+                            **(point.vector if isinstance(point.vector, dict) else {"": point.vector}),
+                            settings.SPARSE_VECTOR_NAME: vector,
+                        },
+                    )
+                    for point, vector in zip(points, sparse)
+                ],
+                wait=False,
+            )
+
+        written += len(points)
+        logger.info(f"{target}: {written} points indexed")
+
+    return target
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Index BM25 sparse vectors for hybrid search")
+    parser.add_argument("--collections", nargs="+", default=["quran", "hadith"], choices=sorted(qdrant_configs))
+    parser.add_argument("--batch-size", type=int, default=128)
+    parser.add_argument("--suffix", default="_hybrid", help="Name suffix of the copy when the sparse vector must be added")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+
+    for content_type in args.collections:
+        config = qdrant_configs[content_type]
+        client = QdrantClient(url=config["url"], api_key=config["api_key"])
+
+        encoder = SparseEncoder(avg_doc_length=average_length(client, config["collection"], args.batch_size))
+        target = index_collection(client, config["collection"], encoder, args.batch_size, args.suffix)
+        logger.info(f"Finished {content_type}: sparse vectors in {target} (avg length {encoder.avg_doc_length:.0f} tokens)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,110 @@
+"""
+Offline job: translate hadith and general Islamic info passages to Russian once and store them
+in each point's payload (`ru_page_content`), so RU/UK queries read them directly instead of
+calling DeepL on the request path.
+
+Usage (from the Islamic_Knowlege_Chatbot directory):
+    python -m scripts.pretranslate_payloads
+    python -m scripts.pretranslate_payloads --collections hadith --batch-size 25 --overwrite
+"""
+
+import argparse
+import logging
+
+import deepl
+from qdrant_client import QdrantClient, models
+
+from core.config import settings, qdrant_configs
+from core.clients import get_deepl_translator
+from services.translation_memory import TranslationMemory
+
+logger = logging.getLogger(__name__)
+
+
+RU_PAYLOAD_KEY = "ru_page_content"
+TARGET_LANG = "RU"
+
+
+def pretranslate_collection(
+    client: QdrantClient,
+    collection_name: str,
+    translator: deepl.Translator,
+    translation_memory: TranslationMemory,
+    batch_size: int,
+    overwrite: bool,
+) -> int:
+    """Translate every point of a collection that has no Russian payload yet; returns the number of points updated"""
+
+    updated = 0
+    offset = None
+
+    while True:
+        points, offset = client.scroll(
+            collection_name=collection_name,
+            limit=batch_size,
+            offset=offset,
+            with_payload=["page_content", RU_PAYLOAD_KEY],
+            with_vectors=False,
+        )
+
+        todo = [
+            point for point in points
+            if point.payload.get("page_content") and (overwrite or not point.payload.get(RU_PAYLOAD_KEY))
+        ]
+
+        if todo:
+            texts = [point.payload["page_content"] for point in todo]
+
+            # Reuse anything the live service already translated
+            known = translation_memory.get_many(texts, TARGET_LANG)
+            missing = list(dict.fromkeys(text for text in texts if text not in known))
+            if missing:
+                results = translator.translate_text(missing, target_lang=TARGET_LANG)
+                translated = {source: result.text for source, result in zip(missing, results)}
+                translation_memory.put_many(translated, TARGET_LANG)
+                known.update(translated)
+
+            # One RPC per scroll batch; points with the same passage share one operation
+            point_ids = {}
+            for point, text in zip(todo, texts):
+                point_ids.setdefault(text, []).append(point.id)
+
+            client.batch_update_points(
+                collection_name=collection_name,
+                update_operations=[
+                    models.SetPayloadOperation(set_payload=models.SetPayload(payload={RU_PAYLOAD_KEY: known[text]}, points=ids))
+                    for text, ids in point_ids.items()
+                ],
+                wait=False,
+            )
+
+            updated += len(todo)
+            logger.info(f"{collection_name}: {updated} points translated ({len(missing)} DeepL passages in last batch)")
+
+        if offset is None:
+            return updated
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Store Russian translations in Qdrant payloads")
+    parser.add_argument("--collections", nargs="+", default=["hadith", "general_islamic_info"], choices=sorted(qdrant_configs))
+    parser.add_argument("--batch-size", type=int, default=50)
+    parser.add_argument("--overwrite", action="store_true", help="Re-translate points that already have a Russian payload")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+
+    translator = get_deepl_translator()
+    translation_memory = TranslationMemory(settings.TRANSLATION_MEMORY_PATH)
+
+    for content_type in args.collections:
+        config = qdrant_configs[content_type]
+        client = QdrantClient(url=config["url"], api_key=config["api_key"])
+        updated = pretranslate_collection(
+            client, config["collection"], translator, translation_memory, args.batch_size, args.overwrite
+        )
+        logger.info(f"Finished {content_type}: {updated} points updated")
+
+
+if __name__ == "__main__":
+    main()
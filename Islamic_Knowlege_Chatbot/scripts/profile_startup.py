@@ -0,0 +1,94 @@
+"""
+Startup profile: where a new worker spends its time before it can serve.
+
+1. `python -X importtime -c "import application"` in a fresh interpreter, reporting the
+   slowest modules by cumulative import time.
+2. In-process timings of importing the application, building the pipeline and warming it up.
+
+Usage (from the Islamic_Knowlege_Chatbot directory):
+    python -m scripts.profile_startup
+    python -m scripts.profile_startup --top 40 --fakes    # offline, external clients replaced by local stand-ins
+"""
+
+import os
+import re
+import sys
+import time
+import asyncio
+import argparse
+import subprocess
+
+
+_IMPORTTIME_LINE = re.compile(r"import time:\s+(\d+)\s+\|\s+(\d+)\s+\|(\s*)(\S+)")
+
+
+def profile_imports(module: str, env: dict) -> list:
+    """Return (cumulative_us, self_us, module) for every import of a fresh `import module`"""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+        env=env,
+        capture_output=True,
+        text=True,
+    )
+    if result.returncode != 0:
+        print(result.stderr[-2000:], file=sys.stderr)
+
+    imports = []
+    for line in result.stderr.splitlines():
+        match = _IMPORTTIME_LINE.match(line)
+        if match:
+            imports.append((int(match.group(2)), int(match.group(1)), match.group(4)))
+    return imports
+
+
+def print_imports(imports: list, top: int) -> None:
+    total = max((cumulative for cumulative, _, _ in imports), default=0)
+    print(f"\nImport of application: {total / 1e6:.2f}s cumulative\n")
+    print(f"{'cumulative':>12}{'self':>10}  module")
+    for cumulative, self_time, module in sorted(imports, reverse=True)[:top]:
+        print(f"{cumulative / 1e3:>10.0f}ms{self_time / 1e3:>8.0f}ms  {module}")
+
+
+async def profile_startup() -> dict:
+    timings = {}
+
+    started = time.perf_counter()
+    import application
+    timings["import application"] = time.perf_counter() - started
+
+    started = time.perf_counter()
+    application.get_langgraph_service()
+    timings["build pipeline"] = time.perf_counter() - started
+
+    started = time.perf_counter()
+    await application.warm_up()
+    timings["warm up"] = time.perf_counter() - started
+
+    return timings
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Profile application import, pipeline construction and warm-up")
+    parser.add_argument("--top", type=int, default=25, help="Number of slowest imports to show")
+    parser.add_argument("--fakes", action="store_true", help="Replace external clients with the benchmark stand-ins")
+    args = parser.parse_args()
+
+    if args.fakes:
+        from benchmarks.fakes import BenchmarkLatencies, prepare_environment, install_fakes
+        prepare_environment()
+
+    print_imports(profile_imports("application", dict(os.environ)), args.top)
+
+    if args.fakes:
+        install_fakes(BenchmarkLatencies())
+
+    timings = asyncio.run(profile_startup())
+    print()
+    for step, seconds in timings.items():
+        print(f"{step:<20}{seconds:>8.2f}s")
+    print(f"{'total':<20}{sum(timings.values()):>8.2f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,122 @@
+"""
+Provisioning: create the Qdrant payload indexes behind metadata filters and exact reference
+lookups (the PAYLOAD_FIELDS setting). Without them every filtered search and reference lookup
+scans payloads instead of using the index, and filtered HNSW search degrades.
+
+Safe to re-run; indexes that already exist are skipped. PAYLOAD_FIELDS describes an assumed
+payload schema (see core/config.py), so every key is first checked against a sample of points:
+a key that no sampled point has, or whose values do not fit the index type, is reported, since
+filtering on it would match nothing. Run with --dry-run to only check.
+
+Usage (from the Islamic_Knowlege_Chatbot directory):
+    python -m scripts.provision_payload_indexes
+    python -m scripts.provision_payload_indexes --collections hadith --dry-run
+"""
+
+import argparse
+import logging
+
+from qdrant_client import QdrantClient, models
+
+from core.config import settings, qdrant_configs
+
+logger = logging.getLogger(__name__)
+
+
+# Index type per logical PAYLOAD_FIELDS key
+INDEX_SCHEMAS = {
+    "surah": models.IntegerIndexParams(type=models.IntegerIndexType.INTEGER, lookup=True, range=False),
+    "ayah": models.IntegerIndexParams(type=models.IntegerIndexType.INTEGER, lookup=True, range=True),  # ayah ranges
+    "number": models.IntegerIndexParams(type=models.IntegerIndexType.INTEGER, lookup=True, range=False),
+    "collection": models.PayloadSchemaType.KEYWORD,
+    "grading": models.PayloadSchemaType.KEYWORD,
+    "tafsir_source": models.PayloadSchemaType.KEYWORD,
+}
+
+
+_MISSING = object()
+
+
+def _payload_value(payload: dict, key: str):
+    """Value at a dotted payload path such as metadata.surah_number"""
+    value = payload
+    for part in key.split("."):
+        if not isinstance(value, dict) or part not in value:
+            return _MISSING
+        value = value[part]
+    return value
+
+
+def check_fields(client: QdrantClient, collection_name: str, fields: dict, sample_size: int) -> None:
+    """Warn about configured keys that sampled points lack or that hold values the index type cannot match"""
+
+    points, _ = client.scroll(collection_name=collection_name, limit=sample_size, with_payload=True, with_vectors=False)
+    if not points:
+        logger.warning(f"{collection_name}: empty collection, payload keys not checked")
+        return
+
+    for name, key in fields.items():
+        values = [value for value in (_payload_value(point.payload or {}, key) for point in points) if value is not _MISSING]
+        if not values:
+            logger.warning(
+                f"{collection_name}: none of {len(points)} sampled points has '{key}' ({name}); "
+                f"filters on it will match nothing, check PAYLOAD_FIELDS"
+            )
+            continue
+
+        if isinstance(INDEX_SCHEMAS.get(name), models.IntegerIndexParams):
+            not_integers = sum(1 for value in values if isinstance(value, bool) or not isinstance(value, int))
+            if not_integers:
+                logger.warning(f"{collection_name}: {not_integers} of {len(values)} sampled '{key}' values are not integers")
+
+        logger.info(f"{collection_name}: '{key}' present in {len(values)} of {len(points)} sampled points")
+
+
+def provision_collection(client: QdrantClient, collection_name: str, fields: dict, dry_run: bool) -> int:
+    """Create the missing payload indexes of one collection; returns how many were created"""
+
+    existing = client.get_collection(collection_name).payload_schema or {}
+    created = 0
+
+    for name, key in fields.items():
+        if key in existing:
+            logger.info(f"{collection_name}: {key} already indexed as {existing[key].data_type}")
+            continue
+
+        schema = INDEX_SCHEMAS.get(name)
+        if schema is None:
+            logger.warning(f"{collection_name}: no index type known for field '{name}' ({key}), skipped")
+            continue
+
+        logger.info(f"{collection_name}: creating index on {key}{' (dry run)' if dry_run else ''}")
+        if not dry_run:
+            client.create_payload_index(collection_name=collection_name, field_name=key, field_schema=schema, wait=True)
+        created += 1
+
+    return created
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Create the Qdrant payload indexes used by filters and reference lookups")
+    parser.add_argument("--collections", nargs="+", default=sorted(settings.PAYLOAD_FIELDS), choices=sorted(qdrant_configs))
+    parser.add_argument("--dry-run", action="store_true", help="Only check the keys and report the indexes that would be created")
+    parser.add_argument("--sample-size", type=int, default=200, help="Points sampled to check that the payload keys exist")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+
+    for content_type in args.collections:
+        fields = settings.PAYLOAD_FIELDS.get(content_type, {})
+        if not fields:
+            logger.info(f"No payload fields configured for {content_type}")
+            continue
+
+        config = qdrant_configs[content_type]
+        client = QdrantClient(url=config["url"], api_key=config["api_key"])
+        check_fields(client, config["collection"], fields, args.sample_size)
+        created = provision_collection(client, config["collection"], fields, args.dry_run)
+        logger.info(f"Finished {content_type}: {created} indexes created")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,212 @@
+import copy
+import logging
+import re
+from typing import Callable, Dict, List, Optional
+
+import tiktoken
+
+logger = logging.getLogger(__name__)
+
+
+_WORD = re.compile(r"\w+", re.UNICODE)
+
+
+class _ApproximateEncoding:
+    """Stand-in when the BPE file cannot be loaded (offline host): ~4 characters per token, lossless decode"""
+
+    _PIECE = re.compile(r"\s*(?:\w{1,4}|[^\w\s])|\s+", re.UNICODE)
+
+    def encode(self, text: str, **kwargs) -> List[str]:
+        return self._PIECE.findall(text)
+
+    def decode(self, tokens: List[str]) -> str:
+        return "".join(tokens)
+
+
+class ContextBudget:
+    """
+    Token budget for the prompt context.
+
+    Documents are grouped by source ("quran", "hadith", ..., "web_search"). Near-duplicate passages
+    are dropped across sources, the total budget is split between sources by weight (a source that
+    needs less than its share hands the rest to the others), and each source is filled from the
+    highest rerank score down, so the lowest-scored content is truncated or dropped first.
+    """
+
+    def __init__(
+        self,
+        model: str,
+        max_tokens: int = 6000,
+        source_weights: Optional[Dict[str, float]] = None,
+        min_doc_tokens: int = 48,
+        dedup_threshold: float = 0.85,
+    ):
+
+        self.model = model
+        self._encoding = None
+        self.max_tokens = max_tokens
+        self.source_weights = source_weights or {}
+        self.min_doc_tokens = min_doc_tokens
+        self.dedup_threshold = dedup_threshold
+
+
+    @property
+    def encoding(self):
+        """Load the tokenizer on first use; tiktoken reads (or downloads) its BPE file here"""
+        if self._encoding is None:
+            try:
+                try:
+                    self._encoding = tiktoken.encoding_for_model(self.model)
+                except KeyError:
+                    self._encoding = tiktoken.get_encoding("o200k_base")
+            except Exception as e:
+                # Point TIKTOKEN_CACHE_DIR at a pre-fetched BPE file to get exact counts offline
+                logger.warning(f"Tokenizer for {self.model} unavailable ({e}), approximating token counts")
+                self._encoding = _ApproximateEncoding()
+        return self._encoding
+
+
+    def count(self, text: str) -> int:
+        return len(self.encoding.encode(text, disallowed_special=()))
+
+
+    def truncate(self, text: str, max_tokens: int) -> str:
+        tokens = self.encoding.encode(text, disallowed_special=())
+        if len(tokens) <= max_tokens:
+            return text
+        return self.encoding.decode(tokens[:max(max_tokens, 0)]).rstrip() + " ..."
+
+
+    @staticmethod
+    def _score(doc: dict) -> float:
+        # Qdrant documents carry the cross-encoder score, web results Tavily's own score
+        return float(doc.get('rerank_score', doc.get('score', 0.0)) or 0.0)
+
+
+    @staticmethod
+    def _get_field(doc: dict, path: str):
+        value = doc
+        for key in path.split("."):
+            if not isinstance(value, dict):
+                return None
+            value = value.get(key)
+        return value
+
+
+    @staticmethod
+    def _set_field(doc: dict, path: str, text: str) -> None:
+        *parents, last = path.split(".")
+        target = doc
+        for key in parents:
+            target = target[key]
+        target[last] = text
+
+
+    @staticmethod
+    def _shingles(text: str) -> set:
+        words = _WORD.findall(text.lower())
+        if len(words) < 5:
+            return {" ".join(words)}
+        return {" ".join(words[i:i + 5]) for i in range(len(words) - 4)}
+
+
+    def _deduplicate(self, documents: Dict[str, List[dict]], body_fields: Callable[[str, dict], List[str]]) -> Dict[str, List[dict]]:
+        """Drop passages that repeat an earlier one; sources listed first (the knowledge base) win over later ones (web)"""
+        seen: List[set] = []
+        unique = {}
+        dropped = 0
+
+        for source, docs in documents.items():
+            unique[source] = []
+            for doc in docs:
+                text = " ".join(str(self._get_field(doc, path) or "") for path in body_fields(source, doc))
+                shingles = self._shingles(text)
+                duplicate = shingles and any(
+                    len(shingles & other) / len(shingles | other) >= self.dedup_threshold for other in seen
+                )
+                if duplicate:
+                    dropped += 1
+                    continue
+                if shingles:
+                    seen.append(shingles)
+                unique[source].append(doc)
+
+        if dropped:
+            logger.info(f"Context dedup dropped {dropped} duplicate passages")
+        return unique
+
+
+    def _allocate(self, needs: Dict[str, int]) -> Dict[str, int]:
+        """Split max_tokens between sources by weight, redistributing what small sources do not use"""
+        budgets = {}
+        remaining = {source for source, need in needs.items() if need}
+        tokens_left = self.max_tokens
+
+        while remaining:
+            total_weight = sum(self.source_weights.get(source, 1.0) for source in remaining)
+            shares = {source: tokens_left * self.source_weights.get(source, 1.0) / total_weight for source in remaining}
+            satisfied = [source for source in remaining if needs[source] <= shares[source]]
+
+            if not satisfied:
+                budgets.update({source: int(share) for source, share in shares.items()})
+                break
+
+            for source in satisfied:
+                budgets[source] = needs[source]
+                tokens_left -= needs[source]
+                remaining.remove(source)
+
+        return budgets
+
+
+    def fit(
+        self,
+        documents: Dict[str, List[dict]],
+        render: Callable[[str, dict], str],
+        body_fields: Callable[[str, dict], List[str]],
+    ) -> Dict[str, List[dict]]:
+        """
+        Return copies of `documents` that fit the budget.
+        `render` gives the text a document contributes to the prompt (used for counting) and
+        `body_fields` the dotted paths of its passage text, which is what gets truncated.
+        """
+        documents = self._deduplicate(documents, body_fields)
+
+        ranked = {source: sorted(docs, key=self._score, reverse=True) for source, docs in documents.items()}
+        costs = {source: [self.count(render(source, doc)) for doc in docs] for source, docs in ranked.items()}
+        budgets = self._allocate({source: sum(source_costs) for source, source_costs in costs.items()})
+
+        fitted = {}
+        truncated = dropped = 0
+        for source, docs in ranked.items():
+            tokens_left = budgets.get(source, 0)
+            fitted[source] = []
+
+            for i, (doc, cost) in enumerate(zip(docs, costs[source])):
+                if cost <= tokens_left:
+                    fitted[source].append(doc)
+                    tokens_left -= cost
+                    continue
+
+                # Shrink the passage text of the first document that does not fit, drop everything below it
+                paths = [path for path in body_fields(source, doc) if self._get_field(doc, path)]
+                body_tokens = [self.count(str(self._get_field(doc, path))) for path in paths]
+                allowed = tokens_left - (cost - sum(body_tokens))
+
+                if allowed >= self.min_doc_tokens:
+                    doc = copy.deepcopy(doc)
+                    for path, tokens in zip(paths, body_tokens):
+                        text = str(self._get_field(doc, path))
+                        self._set_field(doc, path, self.truncate(text, allowed) if allowed > 0 else "")
+                        allowed = max(allowed - tokens, 0)
+                    fitted[source].append(doc)
+                    truncated += 1
+                    dropped += len(docs) - i - 1
+                else:
+                    dropped += len(docs) - i
+                break
+
+        total = sum(sum(source_costs) for source_costs in costs.values())
+        if truncated or dropped:
+            logger.info(f"Context budget: {total} tokens over {self.max_tokens}, truncated {truncated} and dropped {dropped} passages")
+        return fitted
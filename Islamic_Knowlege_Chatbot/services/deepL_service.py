@@ -1,6 +1,13 @@
+import asyncio
+from typing import List
+
 import deepl
 from core.config import settings
+from core.clients import get_deepl_translator
+from services.translation_memory import TranslationMemory
 from services.open_ai_service import openai_service
+from services.language_detection import language_detector
+from services.tracing import tracer
 
 import logging
 logger = logging.getLogger(__name__)
@@ -11,16 +18,80 @@ class Deepl_Service():
     
     def __init__(self):
         
-        self.translator = deepl.Translator(auth_key=settings.DEEPL_API_KEY)
+        self.translator = get_deepl_translator()
+        self.translation_memory = TranslationMemory(settings.TRANSLATION_MEMORY_PATH)
+        
+        # Bound in-flight DeepL requests to stay under the account's rate limit
+        self._request_slots = asyncio.Semaphore(settings.DEEPL_MAX_CONCURRENCY)
+        
+        
+        
+        
+    async def _translate_text(self, text, **kwargs):
+        """The DeepL SDK is blocking, run it on a worker thread so the event loop stays free."""
+        
+        async with self._request_slots:
+            with tracer.span("deepl"):
+                return await asyncio.to_thread(self.translator.translate_text, text, **kwargs)
+        
+        
+        
         
+    @tracer.traced("query_preprocessing")
+    async def _preprocess_with_llm(self, query: str, local_language):
+        """Combined language detection, translation and classification; None if the call failed."""
         
+        response = await openai_service.preprocess_query(query)
+        if response["status"] != "success":
+            logger.warning(f"Combined query pre-processing failed: {response['message']}")
+            return None
         
+        result = response["message"]
+        # A confident local decision wins over the model's language guess
+        detected_lang = local_language or result.language.upper()
+        logger.info(f"Combined pre-processing: language={detected_lang}, sources={result.required_sources}")
         
-    def detect_and_translate_query(self, query: str)-> dict:
+        return {
+            "status": "success",
+            "processed_query": result.english_query if detected_lang in ["RU", "UK"] else query,
+            "detected_language": detected_lang,
+            "required_sources": result.required_sources,
+            "filters": result.filters
+        }
+        
+        
+        
+        
+    async def detect_and_translate_query(self, query: str)-> dict:
         
         try: 
-            # First check if already in English
-            is_english = openai_service.is_english_with_llm(query)
+            # Decide EN/RU/UK locally, the LLM is only consulted for ambiguous input
+            with tracer.span("language_detection"):
+                detection = language_detector.detect(query)
+            logger.info(f"Local language detection: {detection}")
+            
+            if detection.language == "EN":
+                return {
+                    "status": "success", 
+                    "processed_query": query, 
+                    "detected_language": "EN",
+                    "translation_needed": False
+                }
+            
+            # One structured LLM call returns language, English rendering and sources together,
+            # replacing the separate language check, DeepL translation and classification calls
+            if settings.COMBINED_QUERY_PREPROCESSING:
+                preprocessed = await self._preprocess_with_llm(query, detection.language)
+                if preprocessed:
+                    return preprocessed
+            
+            if detection.language in ["RU", "UK"]:
+                translated_query = await self._translate_text(query, source_lang=detection.language, target_lang="EN-US")
+                logger.info(f"Translated from locally detected language {detection.language}")
+                return {"status": "success", "processed_query": translated_query.text, "detected_language": detection.language}
+            
+            # Ambiguous input: check with the LLM whether it is English
+            is_english = await openai_service.is_english_with_llm(query)
             logger.info(f"is_english_with_llm result: {is_english}")
             
             if is_english:
@@ -35,12 +106,9 @@ class Deepl_Service():
             
             
             logger.info("Non-English query detected, translating...")
-            translated_query = self.translator.translate_text(query, target_lang="EN-US")
+            translated_query = await self._translate_text(query, target_lang="EN-US")
             detected_lang = translated_query.detected_source_lang
             logger.info(f"Detected language: {detected_lang}")
-            
-            
-            print(f"Detected language: {detected_lang}")
                 
                 
             if detected_lang.upper() in ["RU", "UK"]:
@@ -79,14 +147,14 @@ class Deepl_Service():
         
         
         
-    def translate_response(self, response: str, detected_lang:str)-> str:
+    async def translate_response(self, response: str, detected_lang:str)-> str:
         
         logger.debug("Inside translate_response | Detected language: %s", detected_lang)
         
        
         if detected_lang.upper() != "EN":
             try:
-                translated = self.translator.translate_text(response, target_lang="RU")
+                translated = await self._translate_text(response, target_lang="RU")
                 logger.info("Translated response to RU successfully")
                 return translated.text
         
@@ -98,5 +166,47 @@ class Deepl_Service():
         logger.debug("No translation needed; returning original response.")
         return response
     
+    
+    
+    
+    async def translate_passages(self, passages: List[str], detected_lang: str, target_lang: str = "RU") -> List[str]:
+        """
+        Translate corpus passages, consulting the translation memory first.
+        Only passages never seen before are sent to DeepL, in a single request.
+        """
+        
+        if detected_lang.upper() == "EN" or not passages:
+            return list(passages)
+        
+        # SQLite I/O runs off the event loop so concurrent requests keep streaming
+        try:
+            known = await asyncio.to_thread(self.translation_memory.get_many, passages, target_lang)
+        except Exception as e:
+            logger.warning("Translation memory read failed: %s", e)
+            known = {}
+        missing = list(dict.fromkeys(p for p in passages if p not in known))
+        logger.info("Translation memory: %d hits, %d passages sent to DeepL", len(passages) - len(missing), len(missing))
+        
+        if missing:
+            try:
+                results = await self._translate_text(missing, target_lang=target_lang)
+                translated = {source: result.text for source, result in zip(missing, results)}
+                known.update(translated)
+            
+            except Exception as e:
+                logger.error("Translation error: %s", e)
+                translated = {}
+            
+            # A failed memory write (e.g. "database is locked") must not discard what DeepL returned
+            if translated:
+                try:
+                    await asyncio.to_thread(self.translation_memory.put_many, translated, target_lang)
+                except Exception as e:
+                    logger.warning("Translation memory write failed: %s", e)
+        
+        # Untranslatable passages fall back to the original text
+        return [known.get(passage, passage) for passage in passages]
+
 
 
+deepl_service = Deepl_Service()
@@ -0,0 +1,46 @@
+import threading
+from collections import OrderedDict
+from typing import List, Optional
+
+
+class EmbeddingCache:
+    """Bounded, thread-safe LRU cache for query embeddings keyed by normalized text and embedding model"""
+
+    def __init__(self, max_size: int = 1024):
+
+        self.max_size = max_size
+        self._entries: "OrderedDict[tuple, List[float]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+
+    @staticmethod
+    def _normalize(text: str) -> str:
+        """Collapse whitespace and case so trivially different spellings share one entry"""
+        return " ".join(text.lower().split())
+
+
+    def get(self, text: str, model: str) -> Optional[List[float]]:
+        key = (model, self._normalize(text))
+        with self._lock:
+            vector = self._entries.get(key)
+            if vector is None:
+                self.misses += 1
+                return None
+
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return vector
+
+
+    def put(self, text: str, model: str, vector: List[float]) -> None:
+        if self.max_size <= 0:
+            return
+
+        key = (model, self._normalize(text))
+        with self._lock:
+            self._entries[key] = vector
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
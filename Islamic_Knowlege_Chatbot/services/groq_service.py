@@ -1,17 +1,18 @@
 import os
+import logging
 
-from groq import Groq
-from core.config import settings
+import aiofiles
+from core.clients import get_groq_client
 
 
 
 class GroqService:
     def __init__(self):
 
-        self.client = Groq(api_key=settings.GROQ_API_KEY)
+        self.client = get_groq_client()
 
 
-    def transcribe_auto(
+    async def transcribe_auto(
         self,
         file_path: str,
         model: str = "whisper-large-v3"
@@ -20,12 +21,12 @@ class GroqService:
         Transcribe an audio file (English or Russian) using Open Ai's Whisper model.
         """
         try:
-            print(file_path)
-            with open(file_path, "rb") as f:
-                audio_bytes = f.read()
+            logging.info(f"Transcribing audio file: {file_path}")
+            async with aiofiles.open(file_path, "rb") as f:
+                audio_bytes = await f.read()
             
             
-            response = self.client.audio.transcriptions.create(
+            response = await self.client.audio.transcriptions.create(
                 file=(os.path.basename(file_path), audio_bytes),
                 response_format="text",
                 model=model,
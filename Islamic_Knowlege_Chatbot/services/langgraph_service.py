@@ -2,18 +2,24 @@
 import logging
 logger = logging.getLogger(__name__)
 
-from tavily import TavilyClient
-from langgraph.graph import StateGraph, END
+import time
+import asyncio
+
+from langgraph.graph import StateGraph, START, END
 
 from core.config import settings
-from services.qdrant_service import QdrantService
+from core.app_logging import log_payload
+from services.qdrant_service import QdrantService, RU_TAFSEER_FIELDS
+from services.context_budget import ContextBudget
+from services.reference_parser import parse_reference, parse_filters
+from services.semantic_cache import SemanticCache
+from services.query_router import QueryRouter
 from services.open_ai_service import openai_service
 from schemas.data_classes.content_type import ContentType
 from schemas.data_classes.langraph_state import LangraphState
-from services.deepL_service import Deepl_Service
-
-
-deepl_services = Deepl_Service()
+from services.deepL_service import deepl_service
+from core.clients import get_tavily_client
+from services.tracing import tracer, request_id_var
 
 
 class LanggraphService:
@@ -29,24 +35,80 @@ class LanggraphService:
 
         self.qdrant_service = QdrantService(qdrant_configs, self.embeddings)
         
-        self.tavily_client = TavilyClient(api_key=settings.TAVILY_API_KEY)
+        self.tavily_client = get_tavily_client()
+
+        self.query_router = QueryRouter(
+            examples_path=settings.ROUTER_EXAMPLES_PATH,
+            cache_threshold=settings.ROUTER_CACHE_THRESHOLD,
+            confidence_threshold=settings.ROUTER_CONFIDENCE_THRESHOLD,
+            min_similarity=settings.ROUTER_MIN_SIMILARITY,
+            min_examples=settings.ROUTER_MIN_EXAMPLES
+        )
+
+        self.semantic_cache = SemanticCache(
+            threshold=settings.SEMANTIC_CACHE_THRESHOLD,
+            ttl_seconds=settings.SEMANTIC_CACHE_TTL_SECONDS,
+            max_entries=settings.SEMANTIC_CACHE_MAX_ENTRIES
+        )
+
+        self.context_budget = ContextBudget(
+            model=settings.LLM_MODEL,
+            max_tokens=settings.CONTEXT_MAX_TOKENS,
+            source_weights=settings.CONTEXT_SOURCE_WEIGHTS,
+            min_doc_tokens=settings.CONTEXT_MIN_DOC_TOKENS,
+            dedup_threshold=settings.CONTEXT_DEDUP_THRESHOLD
+        )
 
         self.graph = self._create_graph()
 
-        self.deepl_services = Deepl_Service()
+        # Same pipeline minus the final LLM call, used by the streaming endpoint
+        self.context_graph = self._create_graph(include_generation=False)
+
+        self.deepl_services = deepl_service
         
         # self.is_english_query =
 
 
 
 
-    def _classify_multi_source_query(self, state: LangraphState) -> LangraphState:
+    async def warm_up(self) -> None:
+        """
+        Load the reranker and tokenizer and open the Qdrant connections, so the
+        first request does not pay for them
+        """
+        await asyncio.gather(
+            self.qdrant_service.warm_up(),
+            asyncio.to_thread(self.context_budget.count, "warm up")
+        )
+
+
+
+
+    @tracer.traced("classify")
+    async def _classify_multi_source_query(self, state: LangraphState) -> LangraphState:
         """
-        Advanced LLM-based classification using structured output
+        Route locally from the query embedding when confident, otherwise
+        use LLM-based classification with structured output
         """
         try:
+            # The combined pre-processing call already classified the query
+            if state.required_sources:
+                logging.info(f"Using sources from query pre-processing: {[s.value for s in state.required_sources]}")
+                if state.query_embedding is not None:
+                    self.query_router.add_example(state.query_embedding, state.required_sources)
+                    await asyncio.to_thread(self.query_router.persist)
+                return state
+
+            if state.query_embedding is not None:
+                decision = self.query_router.route(state.query_embedding)
+                if decision:
+                    state.required_sources = decision.sources
+                    state.current_source_index = 0
+                    logging.info(f"Local routing ({decision.method}, confidence {decision.confidence:.2f}): {[s.value for s in decision.sources]}")
+                    return state
+
             # Get structured classification from LLM            
-            classification_response = openai_service.classify_multi_source_query(state.user_query)
+            classification_response = await openai_service.classify_multi_source_query(state.user_query)
             if classification_response['status'] == 'error':
                 state.required_sources = [ContentType.GENERAL]
                 state.current_source_index = 0
@@ -55,32 +117,33 @@ class LanggraphService:
             classification = classification_response['message']
 
             # Convert string sources to ContentType enum in order
-            required_sources = []
-            for source in classification.required_sources:
-                source_clean = source.lower().strip()
-                if source_clean == "quran":
-                    required_sources.append(ContentType.QURAN)
-                elif source_clean == "hadith":
-                    required_sources.append(ContentType.HADITH)
-                elif source_clean == "tafseer":
-                    required_sources.append(ContentType.TAFSEER)
-                elif source_clean == "general_islamic_info":
-                    required_sources.append(ContentType.GENERAL)
+            required_sources = [
+                content_type for content_type in map(ContentType.from_label, classification.required_sources)
+                if content_type
+            ]
 
 
             # If no valid sources identified, use general fallback
             if not required_sources:
                 required_sources.append(ContentType.GENERAL)
 
+            # Label the example so similar queries can be routed without the LLM
+            elif state.query_embedding is not None:
+                self.query_router.add_example(state.query_embedding, required_sources)
+                await asyncio.to_thread(self.query_router.persist)
+
 
             state.required_sources = required_sources
             state.current_source_index = 0  # Reset index
+            if classification.filters and not classification.filters.is_empty():
+                state.filters = classification.filters
 
 
             # Log the classification details
             logging.info("LLM Classification Results:")
             logging.info(f"  - Required sources (in order): {[s.value for s in required_sources]}")
             logging.info(f"  - Reasoning: {classification.reasoning}")
+            logging.info(f"  - Filters: {state.filters}")
             
         except Exception as e:
             logging.error(f"Error in LLM classification: {e}")
@@ -95,27 +158,32 @@ class LanggraphService:
 
 
 
-    def _web_search_and_store(self, state: LangraphState) -> LangraphState:
+    @tracer.traced("web_search")
+    async def _web_search_and_store(self, state: LangraphState) -> dict:
         """
-        Perform web search using Tavily and store results in vector database
+        Perform web search using Tavily. Runs in parallel with classification and retrieval and
+        gives up after WEB_SEARCH_TIMEOUT_SECONDS, so the answer is generated without web results
+        rather than waiting on Tavily's tail latency.
         """
+        web_documents = []
         try:
-            if not self.tavily_client:
-                logging.warning("Tavily client not initialized, skipping web search")
-                return state
-                
-            # Perform web search
-            search_results = self.tavily_client.search(
-                query=f"{state.user_query} in Islam.",
-                search_depth="advanced",
-                max_results=1,                            #updated
-                include_answer=True,
-                include_raw_content=True,
+            if not self.tavily_client or not settings.WEB_SEARCH_ENABLED:
+                logging.warning("Web search disabled, skipping web search")
+                return {"web_search_results": web_documents}
                 
+            # Perform web search; only the snippet content is used downstream
+            search_results = await asyncio.wait_for(
+                self.tavily_client.search(
+                    query=f"{state.user_query} in Islam.",
+                    search_depth=settings.WEB_SEARCH_DEPTH,
+                    max_results=1,                            #updated
+                    include_answer=False,
+                    include_raw_content=False,
+                ),
+                timeout=settings.WEB_SEARCH_TIMEOUT_SECONDS
             )
 
             # Process and store search results
-            web_documents = []
             for result in search_results.get('results', []):
                 doc_content = {
                     'content': result.get('content', ''),
@@ -123,102 +191,206 @@ class LanggraphService:
                     'title': result.get('title', '')
                 }
                 web_documents.append(doc_content)
-
-            
-            # Store in vector database (you might want to create a separate collection for web results)
-            # Or store in state for later use
-            if not hasattr(state, 'web_search_results'):
-                state.web_search_results = []
-            state.web_search_results.extend(web_documents)
             
             logging.info(f"Retrieved {len(web_documents)} web search results")
+
+        except asyncio.TimeoutError:
+            logging.warning(f"Web search exceeded {settings.WEB_SEARCH_TIMEOUT_SECONDS}s deadline, continuing without web results")
             
         except Exception as e:
             logging.error(f"Error in web search: {e}")
-            if not hasattr(state, 'web_search_results'):
-                state.web_search_results = []
         
-        return state
+        # Partial update: this node runs in the same step as classify_and_retrieve
+        return {"web_search_results": state.web_search_results + web_documents}
 
 
 
 
-    def _retrieve_from_quran(self, state: LangraphState) -> LangraphState:
+    async def _classify_and_retrieve(self, state: LangraphState) -> dict:
         """
-        Retrieve documents from Quran vector store
+        Classify the query and retrieve from the required sources (or every collection
+        when classification yields none), alongside the web search branch. A query naming
+        an exact verse or hadith is answered by payload lookup and skips both.
         """
-        state = self._retrieve_documents(state, ContentType.QURAN)
-        state.completed_sources.add(ContentType.QURAN)
-        state.current_source_index += 1
-        return state
+        if state.reference is not None:
+            state = await self._lookup_reference(state)
+
+        # No exact reference, or it matched nothing in the collections; a hinted verse is merged with retrieval
+        if state.reference is None or not state.reference.exact or not state.retrieved_documents:
+            state = await self._classify_multi_source_query(state)
+
+            # The router and the pre-processing call may not have extracted filters
+            if state.filters is None:
+                state.filters = parse_filters(state.user_query)
+
+            if state.required_sources:
+                state = await self._retrieve_required_sources(state)
+            else:
+                state = await self._fallback_retrieval(state)
 
+        # Partial update so it merges with the web search branch
+        return {
+            "required_sources": state.required_sources,
+            "current_source_index": state.current_source_index,
+            "completed_sources": state.completed_sources,
+            "retrieved_documents": state.retrieved_documents,
+            "query_embedding": state.query_embedding,
+            "error_message": state.error_message,
+        }
 
 
 
 
-    def _retrieve_from_hadith(self, state: LangraphState) -> LangraphState:
+    @tracer.traced("retrieve")
+    async def _retrieve_required_sources(self, state: LangraphState) -> LangraphState:
         """
-        Retrieve documents from Hadith vector store
+        Fan out retrieval for every required source concurrently and join the results
+        before response generation, so multi-source queries pay for one round trip instead of one per source
         """
-        state = self._retrieve_documents(state, ContentType.HADITH)
-        state.completed_sources.add(ContentType.HADITH)
-        state.current_source_index += 1
-        return state
+        sources = list(dict.fromkeys(state.required_sources))
+        if not sources:
+            return state
 
+        # Embed once so the parallel searches all share the same vector
+        if state.query_embedding is None:
+            state.query_embedding = await openai_service.embed_query(state.user_query)
 
+        # One RPC per (cluster, collection) group, all groups in flight at once
+        results = await self.qdrant_service.search_many(
+            state.user_query, sources, state.query_embedding, state.detected_language, state.filters
+        )
 
+        # Join in classification order so the context keeps the same source ordering
+        for content_type in sources:
+            documents = results[content_type]
+            if isinstance(documents, Exception):
+                logging.error(f"Error retrieving documents from {content_type.value}: {documents}")
+                if not state.error_message:
+                    state.error_message = f"Error retrieving documents from {content_type.value}: {str(documents)}"
+            else:
+                state.retrieved_documents.setdefault(content_type.value, []).extend(documents)
 
+            state.completed_sources.add(content_type)
+            state.current_source_index += 1
 
-    def _retrieve_from_tafseer(self, state: LangraphState) -> LangraphState:
-        """
-        Retrieve documents from Tafseer vector store
-        """
-        state = self._retrieve_documents(state, ContentType.TAFSEER)
-        state.completed_sources.add(ContentType.TAFSEER)
-        state.current_source_index += 1
+        logging.info(f"Parallel retrieval completed for sources: {[s.value for s in sources]}")
         return state
 
 
 
 
 
-    def _retrieve_from_general(self, state: LangraphState) -> LangraphState:
+    @tracer.traced("reference_lookup")
+    async def _lookup_reference(self, state: LangraphState) -> LangraphState:
         """
-        Retrieve documents from General Islamic Info vector store
+        Fetch the referenced verse (with its tafseer) or hadith by payload filter
         """
-        state = self._retrieve_documents(state, ContentType.GENERAL)
-        state.completed_sources.add(ContentType.GENERAL)
-        state.current_source_index += 1
+        results = await self.qdrant_service.lookup_reference(state.reference, state.detected_language)
+        for content_type, documents in results.items():
+            if documents:
+                state.retrieved_documents.setdefault(content_type.value, []).extend(documents)
+
+        # A hint leaves classification and retrieval to run as usual
+        if state.retrieved_documents and state.reference.exact:
+            state.required_sources = list(results)
+            state.completed_sources.update(results)
+            state.current_source_index = len(results)
         return state
 
 
 
 
 
-    def _retrieve_documents(self, state: LangraphState, content_type: ContentType) -> LangraphState:
+    @tracer.traced("fallback_retrieval")
+    async def _fallback_retrieval(self, state: LangraphState) -> LangraphState:
         """
-        Generic document retrieval function with enhanced context awareness
+        Fallback node that searches across all collections when GENERAL is specified
         """
-        return self.qdrant_service.retrieve_documents(state, content_type)
-
-
+        return await self.qdrant_service.fallback_retrieval(state)
 
 
 
-    def _fallback_retrieval(self, state: LangraphState) -> LangraphState:
+    async def _translate_batch(self, batch_idx: int, batch: dict, query_lang: str) -> dict:
         """
-        Fallback node that searches across all collections when GENERAL is specified
+        Translate one context batch, keeping the original text if translation fails
         """
-        return self.qdrant_service.fallback_retrieval(state)
+        try:
+            logger.info(f"Translating batch {batch_idx + 1} for {batch['source_info']['type']}")
+            
+            # Translate only the content, passage by passage, skipping passages pre-translated at ingest time
+            missing = [content for content, ru in zip(batch['contents'], batch['pretranslated']) if ru is None]
+            with tracer.span("context_translation", batch['source_info']['type']):
+                translated_missing = iter(await self.deepl_services.translate_passages(missing, query_lang) if missing else [])
+            translated_parts = [ru if ru is not None else next(translated_missing) for ru in batch['pretranslated']]
+            
+            logger.info(f"Batch {batch_idx + 1} translation completed successfully!")
+            
+            return {
+                'translated_parts': translated_parts,
+                'source_info': batch['source_info']
+            }
+            
+        except Exception as e:
+            logger.error(f"Translation failed for batch {batch_idx}: {str(e)}")
+            # Use original content if translation fails
+            return {
+                'translated_parts': batch['contents'],
+                'source_info': batch['source_info']
+            }
+
+
+
 
 
+    @staticmethod
+    def _context_body_fields(source_type: str, doc: dict, english: bool) -> list:
+        """Dotted paths of the passage text a document contributes to the context (what the budget may truncate)"""
+        if source_type == 'web_search':
+            return ['content']
+        if english:
+            return ['content', 'metadata.Tafsir'] if source_type == 'quran' else ['content']
+        if source_type == 'quran':
+            return ['metadata.ru_translation']
+        if source_type == 'tafseer':
+            return [f"metadata.{key}" for key in RU_TAFSEER_FIELDS]
+        return ['ru_content'] if doc.get('ru_content') else ['content']
+
+
+    @staticmethod
+    def _context_entry(source_type: str, doc: dict, english: bool) -> str:
+        """Approximate rendering of one document in the context, used for token counting"""
+        metadata = doc.get('metadata', {})
+        if source_type == 'web_search':
+            return f"Title: {doc.get('title', '')}\nContent: {doc.get('content', '')}\nURL: {doc.get('url', '')}"
+        if english:
+            return f"Content: {doc.get('content', '')}\nMetadata: {metadata}"
+        if source_type == 'quran':
+            return f"RU_Translation: {metadata.get('ru_translation', '')}\nMetadata: {dict(metadata, Tafsir=None)}"
+        if source_type == 'tafseer':
+            other = {k: v for k, v in metadata.items() if k not in RU_TAFSEER_FIELDS}
+            return "\n".join(f"Tafseer_Content: {metadata[key]}\nMetadata: {other}" for key in RU_TAFSEER_FIELDS if metadata.get(key))
+        return f"Content: {doc.get('ru_content') or doc.get('content', '')}\nMetadata: {metadata}"
+
+
+    def _apply_context_budget(self, state: LangraphState) -> None:
+        """Deduplicate and trim retrieved documents and web results to the context token budget"""
+        english = (state.detected_language or "EN").upper() == "EN"
+        fitted = self.context_budget.fit(
+            {**state.retrieved_documents, 'web_search': state.web_search_results or []},
+            render=lambda source_type, doc: self._context_entry(source_type, doc, english),
+            body_fields=lambda source_type, doc: self._context_body_fields(source_type, doc, english)
+        )
+        state.web_search_results = fitted.pop('web_search')
+        state.retrieved_documents = fitted
+
 
-    def _generate_comprehensive_response(self, state: LangraphState) -> LangraphState:
+    @tracer.traced("build_context")
+    async def _build_comprehensive_context(self, state: LangraphState) -> LangraphState:
         """
-        Generate final response using all retrieved context from multiple sources
+        Assemble the prompt context from all retrieved sources, translating it for non-English queries
         """
         
-        logger.info("Starting _generate_comprehensive_response")
+        logger.info("Starting _build_comprehensive_context")
         
         try:
             if state.error_message and not state.retrieved_documents:
@@ -229,6 +401,9 @@ class LanggraphService:
             query_lang = state.detected_language
             logger.info(f"Detected query language inside gen_comprehensive_response function: {query_lang.upper()}")
 
+            # Bound the prompt size before anything is translated or rendered
+            self._apply_context_budget(state)
+
             # Prepare comprehensive context from all sources
             if query_lang.upper() != "EN":
                 
@@ -254,10 +429,10 @@ class LanggraphService:
                             })
                     
                     if web_contents_to_translate:
-                        # Join only content for translation
-                        web_content_batch = "\n\n===CONTENT_SEPARATOR===\n\n".join(web_contents_to_translate)
+                        # Keep passages separate so each one can hit the translation memory
                         translation_batches.append({
-                            'content': web_content_batch,
+                            'contents': web_contents_to_translate,
+                            'pretranslated': [None] * len(web_contents_to_translate),
                             'source_info': {
                                 'type': 'web_search',
                                 'metadata': web_metadata,
@@ -312,21 +487,23 @@ class LanggraphService:
                         elif source_type == 'hadith':
                             # Hadith content needs translation - extract only content
                             hadith_contents_to_translate = []
+                            hadith_pretranslated = []  # Russian text stored in the payload at ingest time
                             hadith_metadata = []
                             
                             for i, doc in enumerate(documents):
                                 if doc.get('content'):
                                     hadith_contents_to_translate.append(doc['content'])
+                                    hadith_pretranslated.append(doc.get('ru_content'))
                                     hadith_metadata.append({
                                         'index': i,
                                         'metadata': doc.get('metadata', {})
                                     })
                             
                             if hadith_contents_to_translate:
-                                # Join only content for translation
-                                hadith_content_batch = "\n\n===CONTENT_SEPARATOR===\n\n".join(hadith_contents_to_translate)
+                                # Keep passages separate so each one can hit the translation memory
                                 translation_batches.append({
-                                    'content': hadith_content_batch,
+                                    'contents': hadith_contents_to_translate,
+                                    'pretranslated': hadith_pretranslated,
                                     'source_info': {
                                         'type': 'hadith',
                                         'metadata': hadith_metadata,
@@ -339,21 +516,23 @@ class LanggraphService:
                         elif source_type == 'general_islamic_info':
                             # General content needs translation - extract only content
                             general_contents_to_translate = []
+                            general_pretranslated = []  # Russian text stored in the payload at ingest time
                             general_metadata = []
                             
                             for i, doc in enumerate(documents):
                                 if doc.get('content'):
                                     general_contents_to_translate.append(doc['content'])
+                                    general_pretranslated.append(doc.get('ru_content'))
                                     general_metadata.append({
                                         'index': i,
                                         'metadata': doc.get('metadata', {})
                                     })
                             
                             if general_contents_to_translate:
-                                # Join only content for translation
-                                general_content_batch = "\n\n===CONTENT_SEPARATOR===\n\n".join(general_contents_to_translate)
+                                # Keep passages separate so each one can hit the translation memory
                                 translation_batches.append({
-                                    'content': general_content_batch,
+                                    'contents': general_contents_to_translate,
+                                    'pretranslated': general_pretranslated,
                                     'source_info': {
                                         'type': 'general_islamic_info',
                                         'metadata': general_metadata,
@@ -363,45 +542,14 @@ class LanggraphService:
                                 logger.info("Adding general Islamic info to translation batch")
                                 context_items.append({'type': 'translate', 'batch_index': len(translation_batches) - 1})
 
-                # Perform batch translation with improved strategy
+                # Translate all batches concurrently; DeepL concurrency is bounded inside Deepl_Service
                 translated_batches = []
                 if translation_batches:
-                    logger.info(f"Translating {len(translation_batches)} batches...")
+                    logger.info(f"Translating {len(translation_batches)} batches concurrently...")
                     
-                    for batch_idx, batch in enumerate(translation_batches):
-                        try:
-                            logger.info(f"Translating batch {batch_idx + 1}/{len(translation_batches)} for {batch['source_info']['type']}")
-                            logger.debug(f"Original content to translate: {batch['content'][:200]}...")
-                            
-                            # Translate only the content
-                            translated_content = self.deepl_services.translate_response(batch['content'], query_lang)
-                            
-                            logger.info(f"Batch {batch_idx + 1} translation completed successfully!")
-                            logger.debug(f"Translated content: {translated_content[:200]}...")
-                            
-                            # Split translated content back
-                            translated_parts = translated_content.split("\n\n===CONTENT_SEPARATOR===\n\n")
-                            
-                            # Validate translation
-                            expected_parts = batch['source_info']['count']
-                            if len(translated_parts) != expected_parts:
-                                logger.warning(f"Expected {expected_parts} parts, got {len(translated_parts)} for batch {batch_idx}")
-                                # If split failed, treat as single content
-                                translated_parts = [translated_content]
-                            
-                            translated_batches.append({
-                                'translated_parts': translated_parts,
-                                'source_info': batch['source_info']
-                            })
-                            
-                        except Exception as e:
-                            logger.error(f"Translation failed for batch {batch_idx}: {str(e)}")
-                            # Use original content if translation fails
-                            original_parts = batch['content'].split("\n\n===CONTENT_SEPARATOR===\n\n")
-                            translated_batches.append({
-                                'translated_parts': original_parts,
-                                'source_info': batch['source_info']
-                            })
+                    translated_batches = await asyncio.gather(
+                        *(self._translate_batch(batch_idx, batch, query_lang) for batch_idx, batch in enumerate(translation_batches))
+                    )
                 
                 # Reconstruct context with translated content
                 final_context_sections = []
@@ -443,13 +591,7 @@ class LanggraphService:
 
                 full_context = "\n\n\n".join(final_context_sections)
                 logger.info("Final context compiled successfully for non-English query")
-                print(f"\n---------------------Russian_final_context-----------------------\n{full_context}")
-                
-                # Generate response using the prepared context
-                logger.info("Sending Russian context to OpenAI for response generation")
-                response = openai_service.generate_response(state.user_query, full_context, state.detected_language)
-                state.final_response = response['message']
-                logger.info("Russian Response generated successfully")
+                log_payload(logger, "Russian final context", full_context)
                 
                 
                 
@@ -481,21 +623,17 @@ class LanggraphService:
                 full_context = "\n".join(context_sections)
                 logger.info("English context compiled successfully")
 
-            # Generate response using the prepared context
-            logger.info("Sending context to OpenAI for response generation")
-            response = openai_service.generate_response(state.user_query, full_context, state.detected_language)
-            state.final_response = response['message']
-            logger.info("English Response generated successfully")
+            state.context = full_context
 
 
         except Exception as e:
-            logger.error(f"Error in _generate_comprehensive_response: {str(e)}")
+            logger.error(f"Error in _build_comprehensive_context: {str(e)}")
             error_msg = f"I apologize, but I encountered an error while generating the response: {str(e)}"
             
             # Translate error message for non-English queries
             if hasattr(state, 'detected_language') and state.detected_language.upper() != "EN":
                 try:
-                    error_msg = self.deepl_services.translate_response(error_msg, state.detected_language)
+                    error_msg = await self.deepl_services.translate_response(error_msg, state.detected_language)
                 except Exception as translation_error:
                     logger.error(f"Failed to translate error message: {translation_error}")
             
@@ -505,177 +643,232 @@ class LanggraphService:
                     
   
 
-    def _route_to_next_source(self, state: LangraphState) -> LangraphState:
+    @tracer.traced("llm_generation")
+    async def _generate_comprehensive_response(self, state: LangraphState) -> LangraphState:
         """
-        Route to the next required source based on classification order
-        This is now a regular node, not a conditional edge function
+        Generate final response from the assembled context
         """
-        # Just return the state as-is, routing logic will be handled by conditional edges
+        # Context building already produced an (apology) answer
+        if state.final_response:
+            return state
+
+        logger.info("Sending context to OpenAI for response generation")
+        response = await openai_service.generate_response(state.user_query, state.context, state.detected_language)
+        state.final_response = response['message']
+        logger.info("Response generated successfully")
+
         return state
 
 
 
 
- 
-    def _determine_next_route(self, state: LangraphState) -> str:
+
+    def _create_graph(self, include_generation: bool = True) -> StateGraph:
         """
-        Determine the next route - this is the actual conditional edge function
+        Create the enhanced LangGraph workflow with web search in parallel to multi-source retrieval.
+        Without generation the graph stops once the context is built, so the caller can stream the answer.
         """
+        # Create the state graph
+        workflow = StateGraph(LangraphState)
+
+        # Add nodes
+        workflow.add_node("web_search", self._web_search_and_store)
+        workflow.add_node("classify_and_retrieve", self._classify_and_retrieve)
+        workflow.add_node("build_context", self._build_comprehensive_context)
 
-        # Check if we have more sources to process
-        if state.current_source_index < len(state.required_sources):
-            current_source = state.required_sources[state.current_source_index]
+        # Web search runs concurrently with classification and retrieval instead of in front of them
+        workflow.add_edge(START, "web_search")
+        workflow.add_edge(START, "classify_and_retrieve")
 
-            if current_source == ContentType.QURAN:
-                return "retrieve_quran"
-            elif current_source == ContentType.HADITH:
-                return "retrieve_hadith"
-            elif current_source == ContentType.TAFSEER:
-                return "retrieve_tafseer"
-            elif current_source == ContentType.GENERAL:
-                return "retrieve_general"
-        
-        # No more sources to process
-        return "generate_response"
+        # Build the context once both branches are done
+        workflow.add_edge(["web_search", "classify_and_retrieve"], "build_context")
+
+        if include_generation:
+            workflow.add_node("generate_response", self._generate_comprehensive_response)
+            workflow.add_edge("build_context", "generate_response")
+
+            # End after response generation
+            workflow.add_edge("generate_response", END)
+        else:
+            workflow.add_edge("build_context", END)
+
+        # Compile the graph without checkpointer
+        return workflow.compile()
 
 
 
 
 
-    def _should_continue_retrieval(self, state: LangraphState) -> str:
+    def _collect_citations(self, final_state) -> list:
         """
-        Determine if we should continue retrieving or move to response generation
+        Extract the references (document metadata and web URLs) a response was built from
         """
-        # Check if we have more sources to process
-        if state.current_source_index < len(state.required_sources):
-            return "continue_retrieval"
-        else:
-            return "generate_response"
+        citations = []
+        for doc in final_state.get('web_search_results') or []:
+            citations.append({'source': 'web_search', 'title': doc.get('title', ''), 'url': doc.get('url', '')})
+
+        for source_type, documents in (final_state.get('retrieved_documents') or {}).items():
+            for doc in documents:
+                citations.append({'source': source_type, 'metadata': doc.get('metadata', {})})
 
+        return citations
 
 
 
 
-    def _create_graph(self) -> StateGraph:
+
+    def _initial_state(
+        self, user_query: str, lang_detected: str, query_embedding, base_prompt: str = "", required_sources=None, reference=None, filters=None
+    ) -> LangraphState:
         """
-        Create the enhanced LangGraph workflow with proper sequential retrieval
+        Build the initial graph state for a query
         """
-        # Create the state graph
-        workflow = StateGraph(LangraphState)
-
-        # Add nodes
-        workflow.add_node("web_search", self._web_search_and_store)
-        workflow.add_node("classify_query", self._classify_multi_source_query)
-        workflow.add_node("route_to_source", self._route_to_next_source)  
-        workflow.add_node("retrieve_quran", self._retrieve_from_quran)
-        workflow.add_node("retrieve_hadith", self._retrieve_from_hadith)
-        workflow.add_node("retrieve_tafseer", self._retrieve_from_tafseer)
-        workflow.add_node("retrieve_general", self._retrieve_from_general)
-        workflow.add_node("fallback_retrieval", self._fallback_retrieval)
-        workflow.add_node("generate_response", self._generate_comprehensive_response)
-
-        # Set entry point
-        workflow.set_entry_point("web_search")
-
-        # Route from web search to classification
-        workflow.add_edge("web_search", "classify_query")
-
-        # Route from classification to routing logic
-        workflow.add_edge("classify_query", "route_to_source")
-
-        # Route from routing node to appropriate source
-        workflow.add_conditional_edges(
-            "route_to_source",
-            self._determine_next_route,
-            {
-                "retrieve_quran": "retrieve_quran",
-                "retrieve_hadith": "retrieve_hadith", 
-                "retrieve_tafseer": "retrieve_tafseer",
-                "retrieve_general": "retrieve_general",
-                "fallback_retrieval": "fallback_retrieval",
-                "generate_response": "generate_response"
-            }
+        return LangraphState(
+            user_query=user_query,
+            base_prompt=base_prompt or "Please provide a comprehensive Islamic answer to the following question:",
+            required_sources=[
+                content_type for content_type in map(ContentType.from_label, required_sources or [])
+                if content_type
+            ],
+            completed_sources=set(),
+            retrieved_documents={},
+            final_response="",
+            current_source_index=0,
+            detected_language=lang_detected,  # <-- passed
+            query_embedding=query_embedding,
+            request_id=request_id_var.get(),
+            reference=reference,
+            filters=filters if filters and not filters.is_empty() else None
         )
 
-        # After each retrieval, route to next source or generate response
-        workflow.add_conditional_edges(
-            "retrieve_quran",
-            self._should_continue_retrieval,
-            {
-                "continue_retrieval": "route_to_source",
-                "generate_response": "generate_response"
-            }
-        )
 
-        workflow.add_conditional_edges(
-            "retrieve_hadith",
-            self._should_continue_retrieval,
-            {
-                "continue_retrieval": "route_to_source",
-                "generate_response": "generate_response"
-            }
-        )
 
-        workflow.add_conditional_edges(
-            "retrieve_tafseer",
-            self._should_continue_retrieval,
-            {
-                "continue_retrieval": "route_to_source",
-                "generate_response": "generate_response"
-            }
-        )
-        
-        workflow.add_conditional_edges(
-            "retrieve_general",
-            self._should_continue_retrieval,
-            {
-                "continue_retrieval": "route_to_source",
-                "generate_response": "generate_response"
-            }
-        )
 
-        # Fallback goes directly to response
-        workflow.add_edge("fallback_retrieval", "generate_response")
 
-        # End after response generation
-        workflow.add_edge("generate_response", END)
+    @staticmethod
+    def _cache_scope(user_query: str, filters) -> str:
+        """
+        Semantic cache partition: answers retrieved for different surahs or collections are not
+        interchangeable, however close the question embeddings are
+        """
+        filters = filters if filters and not filters.is_empty() else parse_filters(user_query)
+        return filters.model_dump_json(exclude_none=True) if filters else ""
+
 
-        # Compile the graph without checkpointer
-        return workflow.compile()
 
 
 
+    def _store_in_cache(self, final_state, query_embedding, lang_detected: str, final_response: str, scope: str) -> None:
+        """
+        Only cache clean answers so transient failures are not replayed
+        """
+        if query_embedding is None or final_state.get('reference') is not None:
+            return  # answers about a named verse or hadith come from the lookup, not the cache
+
+        if settings.SEMANTIC_CACHE_ENABLED and final_response and not final_state.get('error_message'):
+            self.semantic_cache.store(
+                query_embedding,
+                lang_detected,
+                final_response,
+                self._collect_citations(final_state),
+                scope
+            )
+
 
 
-    def query(self, user_query: str, lang_detected: str, base_prompt: str = "") -> str:
+
+
+    async def query(self, user_query: str, lang_detected: str, base_prompt: str = "", required_sources=None, filters=None) -> str:
         """
         Main function to process user query with multi-source retrieval
         
         Args:
             user_query: The user's question
             base_prompt: Base prompt to be enhanced with retrieved context
+            required_sources: Source labels from query pre-processing; classification is skipped when given
+            filters: Metadata filters from query pre-processing
             
         Returns:
             Generated response from the system
         """
         try:
+            # An exact verse or hadith reference is fetched by payload filter, without embedding the query
+            reference = parse_reference(user_query)
+            query_embedding = None if reference and reference.exact else await openai_service.embed_query(user_query)
+
+            # Near-duplicate questions are answered straight from the semantic cache
+            cache_scope = self._cache_scope(user_query, filters)
+            if settings.SEMANTIC_CACHE_ENABLED and reference is None:
+                with tracer.span("semantic_cache"):
+                    cached = self.semantic_cache.lookup(query_embedding, lang_detected, cache_scope)
+                if cached:
+                    logging.info("Semantic cache hit, skipping the graph")
+                    return cached.final_response
+
             # Create initial state
-            initial_state = LangraphState(
-                user_query=user_query,
-                base_prompt=base_prompt or "Please provide a comprehensive Islamic answer to the following question:",
-                required_sources=[],
-                completed_sources=set(),
-                retrieved_documents={},
-                final_response="",
-                current_source_index=0,
-                detected_language=lang_detected  # <-- passed
-            )
+            initial_state = self._initial_state(user_query, lang_detected, query_embedding, base_prompt, required_sources, reference, filters)
             logging.info(f"Langraph initial_state.detected_language: {initial_state.detected_language}")
             
             # Run the graph without configuration (no checkpointer)
-            final_state = self.graph.invoke(initial_state)
+            final_state = await self.graph.ainvoke(initial_state)
+
+            self._store_in_cache(final_state, query_embedding, lang_detected, final_state['final_response'], cache_scope)
             
             return final_state['final_response']
         except Exception as e:
-            print("Error while Querying: ", e)
+            logging.error(f"Error while querying: {e}")
             return str(e)
+
+
+
+
+
+    async def astream_query(self, user_query: str, lang_detected: str, base_prompt: str = "", required_sources=None, filters=None):
+        """
+        Streaming variant of query(): runs retrieval and context building, then yields
+        answer tokens as the LLM produces them
+        
+        Args:
+            user_query: The user's question
+            lang_detected: Detected language code of the original query
+            base_prompt: Base prompt to be enhanced with retrieved context
+            required_sources: Source labels from query pre-processing; classification is skipped when given
+            filters: Metadata filters from query pre-processing
+            
+        Yields:
+            Chunks of the generated response
+        """
+        try:
+            reference = parse_reference(user_query)
+            query_embedding = None if reference and reference.exact else await openai_service.embed_query(user_query)
+
+            cache_scope = self._cache_scope(user_query, filters)
+            if settings.SEMANTIC_CACHE_ENABLED and reference is None:
+                with tracer.span("semantic_cache"):
+                    cached = self.semantic_cache.lookup(query_embedding, lang_detected, cache_scope)
+                if cached:
+                    logging.info("Semantic cache hit, skipping the graph")
+                    yield cached.final_response
+                    return
+
+            initial_state = self._initial_state(user_query, lang_detected, query_embedding, base_prompt, required_sources, reference, filters)
+            context_state = await self.context_graph.ainvoke(initial_state)
+
+            # Context building already produced an (apology) answer
+            if context_state['final_response']:
+                yield context_state['final_response']
+                return
+
+            chunks = []
+            with tracer.span("llm_generation"):
+                started = time.perf_counter()
+                async for chunk in openai_service.stream_response(user_query, context_state['context'], lang_detected):
+                    if not chunks:
+                        tracer.observe("llm_first_token", time.perf_counter() - started)
+                    chunks.append(chunk)
+                    yield chunk
+
+            self._store_in_cache(context_state, query_embedding, lang_detected, "".join(chunks), cache_scope)
+        except Exception as e:
+            logging.error(f"Error while streaming query: {e}")
+            yield str(e)
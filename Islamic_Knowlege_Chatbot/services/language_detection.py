@@ -0,0 +1,179 @@
+import math
+import re
+import threading
+from collections import Counter
+from dataclasses import dataclass
+from typing import Dict, Optional
+
+
+# Compact seed text for the character trigram profiles. Only the Cyrillic languages need
+# a statistical model, English is decided from the script plus function words.
+_SEED_TEXT = {
+    "RU": (
+        "что такое ислам и что говорит коран о терпении как совершать намаз кто такой пророк "
+        "мухаммад почему мусульмане соблюдают пост в месяц рамадан это очень важно для веры "
+        "какие хадисы есть о милосердии можно ли читать молитву расскажи мне пожалуйста об этом "
+        "объясни значение этого аята где находится мечеть сколько раз нужно молиться в день "
+        "что значит быть верующим человеком который боится аллаха и любит своих родителей"
+    ),
+    "UK": (
+        "що таке іслам і що говорить коран про терпіння як здійснювати намаз хто такий пророк "
+        "мухаммад чому мусульмани дотримуються посту в місяць рамадан це дуже важливо для віри "
+        "які хадиси є про милосердя чи можна читати молитву розкажи мені будь ласка про це "
+        "поясни значення цього аяту де знаходиться мечеть скільки разів потрібно молитися на день "
+        "що означає бути віруючою людиною яка боїться аллаха і любить своїх батьків"
+    ),
+}
+
+# Letters that only occur in one of the two Cyrillic languages
+_UK_ONLY = set("іїєґ")
+_RU_ONLY = set("ыэъё")
+
+# Frequent question words that differ between Russian and Ukrainian
+_RU_WORDS = {
+    "что", "как", "это", "кто", "где", "почему", "какие", "какой", "сколько", "можно", "ли",
+    "мне", "пожалуйста", "говорит", "такое", "нужно", "расскажи", "объясни", "или", "об",
+}
+_UK_WORDS = {
+    "що", "як", "це", "хто", "де", "чому", "які", "який", "скільки", "можна", "чи",
+    "мені", "будь", "каже", "такий", "потрібно", "розкажи", "поясни", "або", "та",
+}
+
+_ENGLISH_FUNCTION_WORDS = {
+    "the", "a", "an", "is", "are", "was", "were", "what", "who", "how", "why", "when", "where",
+    "which", "does", "do", "did", "can", "could", "should", "about", "of", "in", "on", "to",
+    "and", "or", "for", "with", "me", "my", "i", "you", "it", "this", "that", "tell", "explain",
+    "say", "says", "please", "allowed", "meaning",
+}
+
+_LATIN = re.compile(r"[a-zA-Z]")
+_LATIN_DIACRITICS = re.compile(r"[À-ɏ]")
+_CYRILLIC = re.compile(r"[Ѐ-ӿ]")
+_WORD = re.compile(r"[^\W\d_]+", re.UNICODE)
+
+
+def _trigrams(text: str):
+    for word in _WORD.findall(text.lower()):
+        padded = f" {word} "
+        for i in range(len(padded) - 2):
+            yield padded[i:i + 3]
+
+
+def _build_profile(text: str) -> Dict[str, float]:
+    counts = Counter(_trigrams(text))
+    total = sum(counts.values())
+    vocabulary = len(counts) + 1
+    # Add-one smoothed log probabilities; unseen trigrams use the "" entry
+    profile = {gram: math.log((count + 1) / (total + vocabulary)) for gram, count in counts.items()}
+    profile[""] = math.log(1 / (total + vocabulary))
+    return profile
+
+
+_PROFILES = {language: _build_profile(text) for language, text in _SEED_TEXT.items()}
+
+
+@dataclass
+class LanguageDetectionResult:
+    language: Optional[str]  # "EN", "RU", "UK" or None when ambiguous
+    confidence: float
+    method: str
+
+
+class LanguageDetector:
+    """
+    In-process language identification for EN/RU/UK queries.
+    Script heuristics separate Latin from Cyrillic; distinctive letters, question words and a
+    character trigram model separate Russian from Ukrainian. Mixed or unclear input is reported
+    as ambiguous so the caller can fall back to the LLM/DeepL.
+    """
+
+    def __init__(self, script_threshold: float = 0.85, margin: float = 0.15):
+
+        self.script_threshold = script_threshold
+        self.margin = margin
+        self._lock = threading.Lock()
+        self._counts = Counter()
+
+
+    def _record(self, key: str) -> None:
+        with self._lock:
+            self._counts[key] += 1
+
+
+    def stats(self) -> Dict[str, float]:
+        """Detections per language; every ambiguous detection goes to the LLM/DeepL fallback"""
+        with self._lock:
+            counts = dict(self._counts)
+        total = sum(counts.values())
+        return {
+            **counts,
+            "total": total,
+            "fallback_rate": counts.get("ambiguous", 0) / total if total else 0.0,
+        }
+
+
+    def _cyrillic_language(self, text: str) -> LanguageDetectionResult:
+        letters = set(text.lower())
+        has_uk, has_ru = bool(letters & _UK_ONLY), bool(letters & _RU_ONLY)
+        if has_uk != has_ru:
+            return LanguageDetectionResult("UK" if has_uk else "RU", 1.0, "letters")
+
+        words = set(_WORD.findall(text.lower()))
+        ru_hits, uk_hits = len(words & _RU_WORDS), len(words & _UK_WORDS)
+        if ru_hits != uk_hits:
+            confidence = abs(ru_hits - uk_hits) / (ru_hits + uk_hits)
+            return LanguageDetectionResult("RU" if ru_hits > uk_hits else "UK", confidence, "function_words")
+
+        grams = list(_trigrams(text))
+        if not grams:
+            return LanguageDetectionResult(None, 0.0, "ngram")
+
+        scores = {
+            language: sum(profile.get(gram, profile[""]) for gram in grams) / len(grams)
+            for language, profile in _PROFILES.items()
+        }
+        best, second = sorted(scores, key=scores.get, reverse=True)
+        # Convert the per-trigram log-likelihood gap into a 0..1 confidence
+        confidence = 1 - math.exp(-(scores[best] - scores[second]))
+        if confidence < self.margin:
+            return LanguageDetectionResult(None, confidence, "ngram")
+        return LanguageDetectionResult(best, confidence, "ngram")
+
+
+    def _latin_language(self, text: str) -> LanguageDetectionResult:
+        words = [word.lower() for word in _WORD.findall(text)]
+        if not words:
+            return LanguageDetectionResult(None, 0.0, "function_words")
+
+        # Accented Latin letters point at another European language
+        if _LATIN_DIACRITICS.search(text):
+            return LanguageDetectionResult(None, 0.0, "script")
+
+        hits = sum(1 for word in words if word in _ENGLISH_FUNCTION_WORDS)
+        if hits / len(words) >= 0.2:
+            return LanguageDetectionResult("EN", min(1.0, 0.5 + hits / len(words)), "function_words")
+
+        # Latin script without English function words: transliterated Russian ("chto takoe namaz"),
+        # Uzbek, Indonesian... or a bare "Surah Al-Fatiha"; short queries are no exception
+        return LanguageDetectionResult(None, 0.0, "function_words")
+
+
+    def detect(self, text: str) -> LanguageDetectionResult:
+        latin = len(_LATIN.findall(text))
+        cyrillic = len(_CYRILLIC.findall(text))
+        letters = latin + cyrillic
+
+        if not letters:
+            result = LanguageDetectionResult(None, 0.0, "script")
+        elif cyrillic / letters >= self.script_threshold:
+            result = self._cyrillic_language(text)
+        elif latin / letters >= self.script_threshold:
+            result = self._latin_language(text)
+        else:
+            result = LanguageDetectionResult(None, 0.0, "script")
+
+        self._record(f"local_{result.language}" if result.language else "ambiguous")
+        return result
+
+
+language_detector = LanguageDetector()
@@ -1,63 +1,114 @@
 import json
+import logging
 from typing import Any
 
-from openai import OpenAI  # Updated import for v1.x
 from pydantic import BaseModel
 from langchain_openai import ChatOpenAI, OpenAIEmbeddings
 from langchain.schema import HumanMessage, SystemMessage
 
 from core.config import settings
+from core.app_logging import log_payload
+from core.clients import get_openai_client, get_http_client
+from services.embedding_cache import EmbeddingCache
+from services.tracing import tracer
 from schemas.structured_outputs.query_classification import QueryClassificationSchema
+from schemas.structured_outputs.query_translation import QueryPreprocessingSchema
 
 
 from services.prompt_templates import (
-    QUERY_CLASSIFICATION_PROMPT, ENGLISH_FINAL_RESPONSE_PROMPT, RUSSAIN_FINAL_RESPONSE_PROMPT
+    QUERY_CLASSIFICATION_PROMPT, QUERY_PREPROCESSING_PROMPT, ENGLISH_FINAL_RESPONSE_PROMPT, RUSSAIN_FINAL_RESPONSE_PROMPT
 )
 
+logger = logging.getLogger(__name__)
+
 
 class OpenAIService:
     """Handles interactions with OpenAI"""
 
     def __init__(self, openai_model: str, openai_api_key: str, embedding_model: str):
     
-        self.client = OpenAI(api_key=openai_api_key)
-        self.llm = ChatOpenAI(model=openai_model, api_key=openai_api_key)
-        self.embeddings = OpenAIEmbeddings(model=embedding_model, openai_api_key=openai_api_key)
+        # All OpenAI traffic goes through the shared keep-alive HTTP/2 pool
+        self.client = get_openai_client()
+        self.llm = ChatOpenAI(model=openai_model, api_key=openai_api_key, http_async_client=get_http_client())
+        self.embeddings = OpenAIEmbeddings(model=embedding_model, openai_api_key=openai_api_key, http_async_client=get_http_client())
         self.openai_model = openai_model 
+        self.embedding_model = embedding_model
+        self.embedding_cache = EmbeddingCache(settings.EMBEDDING_CACHE_SIZE)
+
+
+
+
+    async def embed_query(self, query: str):
+        """Embed a query, reusing the cached vector for repeated questions."""
 
+        vector = self.embedding_cache.get(query, self.embedding_model)
+        if vector is None:
+            with tracer.span("embed"):
+                vector = await self.embeddings.aembed_query(query)
+            self.embedding_cache.put(query, self.embedding_model, vector)
 
+        return vector
 
 
-    def classify_multi_source_query(self, query):
+
+
+    async def classify_multi_source_query(self, query):
         
         """Classify a query to determine which resources are needed."""
-        return self._process_request(QUERY_CLASSIFICATION_PROMPT, query, QueryClassificationSchema)
+        return await self._process_request(QUERY_CLASSIFICATION_PROMPT, query, QueryClassificationSchema)
 
 
 
 
-    def generate_response(self, query, context, detect_lang: str):
+    def _final_response_prompt(self, context, detect_lang: str) -> str:
         
-        """Generate a comprehensive/final response to a query."""
+        """Pick the final response template for the query language and fill in the context."""
         
         if detect_lang == 'RU':
-            
-            prompt = self._replacer(RUSSAIN_FINAL_RESPONSE_PROMPT, context=context)
-            
-            return self._process_request(prompt, query, None)
+            return self._replacer(RUSSAIN_FINAL_RESPONSE_PROMPT, context=context)
 
-            
-            
-        else:
-            prompt = self._replacer(ENGLISH_FINAL_RESPONSE_PROMPT , context=context)
-            return self._process_request(prompt, query, None)
+        return self._replacer(ENGLISH_FINAL_RESPONSE_PROMPT , context=context)
+
+
+
+
+    async def preprocess_query(self, query):
+        
+        """Detect the language, render the query in English and classify its sources in one call."""
+        return await self._process_request(QUERY_PREPROCESSING_PROMPT, query, QueryPreprocessingSchema)
+
+
+
+
+    async def generate_response(self, query, context, detect_lang: str):
+        
+        """Generate a comprehensive/final response to a query."""
+        
+        prompt = self._final_response_prompt(context, detect_lang)
+        return await self._process_request(prompt, query, None)
+
+
+
+
+    async def stream_response(self, query, context, detect_lang: str):
+        
+        """Generate the final response token by token."""
+        
+        prompt = self._final_response_prompt(context, detect_lang)
+        messages = [
+            SystemMessage(content=prompt),
+            HumanMessage(content=query)
+        ]
+
+        async for chunk in self.llm.astream(messages):
+            if chunk.content:
+                yield chunk.content
 
 
 
 
     def _replacer(self, prompt: str, **kwargs: Any) -> str:
         """Replaces placeholders in a prompt with actual serialized values."""
-        print("Hi")
 
         for key, value in kwargs.items():
             placeholder = f"{{{key}}}"
@@ -85,11 +136,11 @@ class OpenAIService:
 
 
 
-    def is_english_with_llm(self, query: str) -> bool:
+    async def is_english_with_llm(self, query: str) -> bool:
      
         try:
             # Updated to use v1.x API
-            response = self.client.chat.completions.create(
+            response = await self.client.chat.completions.create(
                 model=self.openai_model,
                messages=[
                         {
@@ -109,17 +160,17 @@ class OpenAIService:
             elif reply == "no":
                 return False
             else:
-                print(f"Unexpected response from LLM: {reply}")
+                logger.warning(f"Unexpected response from LLM: {reply}")
                 return False
             
             
         except Exception as e:
-            print(f"LLM detection failed: {e}")
+            logger.error(f"LLM detection failed: {e}")
             return False
 
     
     
-    def _process_request(
+    async def _process_request(
         self, prompt: str, text: str, schema=None
     ):
         """Generic method to handle requests to OpenAI"""
@@ -133,11 +184,9 @@ class OpenAIService:
 
             # Initialize llm_instance with structured output if schema is provided else use simple llm to invoke.
             llm_instance = self.llm.with_structured_output(schema) if schema else self.llm  
-            response = llm_instance.invoke(messages)
-
-
-            print(response)
+            response = await llm_instance.ainvoke(messages)
 
+            log_payload(logger, "LLM response", response)
 
             return {"status": "success", "message": response.content if not schema else response}
 
@@ -56,11 +56,20 @@ Priority Hierarchy:
 3. Specialized Literature: Leverage specific books in General Islamic Info for specialized topics
 4. Comprehensive Coverage: Use multiple sources for complex, multi-faceted questions
 
+Metadata Filters:
+Only when the question itself explicitly restricts the answer, fill the matching filter; otherwise leave it empty:
+- surah: the surah number (1-114) when the question is about one specific surah, e.g. "What is Surah Al-Kahf about?" → 18
+- collection: the hadith collection when one is named, e.g. "hadith in Sahih Muslim about fasting" → Sahih Muslim
+- grading: the hadith grading when the question asks for it, e.g. "authentic hadith about charity" → Sahih
+- tafsir_source: the tafsir work when one is named, e.g. "Ibn Kathir's explanation of ..." → Ibn Kathir
+Never guess a filter from the topic alone; a wrong filter hides the relevant sources.
+
 Output Format:
 For each query, specify:
 - Primary Sources: Most directly relevant (1-3 sources)
 - Supporting Sources: Additional sources for comprehensive coverage
 - Rationale: Brief explanation of source selection
+- Filters: Surah, collection, grading or tafsir source, only when explicitly requested
 
 """
 
@@ -528,4 +537,13 @@ RUSSAIN_FINAL_RESPONSE_PROMPT = """
 - Включайте всю доступную информацию - никогда не сокращайте контент для краткости.
 
 
-"""
\ No newline at end of file
+"""
+
+
+QUERY_PREPROCESSING_PROMPT = """You pre-process user questions for an Islamic knowledge assistant. In a single answer you must:
+
+1. Detect the PRIMARY language of the question. If the text uses English sentence structure, grammar and common English words, it is English even if it contains foreign words or names. Report it as an uppercase ISO 639-1 code (EN, RU, UK, ...).
+2. Render the question in English, preserving names, Surah/Ayah numbers and hadith references exactly. If it is already English, return it unchanged.
+3. Classify the English question into the required Islamic sources following the instructions below.
+
+""" + QUERY_CLASSIFICATION_PROMPT
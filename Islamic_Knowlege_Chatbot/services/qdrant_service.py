@@ -1,32 +1,97 @@
 
+import asyncio
 import logging
-from sentence_transformers import CrossEncoder
+from typing import Optional
 
-from qdrant_client import QdrantClient
+from qdrant_client import models
+
+from core.config import settings
+from core.app_logging import log_payload
+from core.clients import get_qdrant_client
+from services.open_ai_service import openai_service
+from services.reranker_service import RerankerService
+from services.sparse_encoder import SparseEncoder
+from services.retrieval_depth import AdaptiveDepth
+from services.tracing import tracer
 
 from schemas.data_classes.langraph_state import LangraphState
 from schemas.data_classes.content_type import ContentType
+from schemas.data_classes.scripture_reference import ScriptureReference
+from schemas.structured_outputs.retrieval_filters import RetrievalFiltersSchema
+
+
+
+# Payload fields the context builder never renders, per answer language, so Qdrant does not
+# ship them. page_content always stays because the reranker scores it.
+RU_TAFSEER_FIELDS = ["As_Saadi_Tafseer", "abu_Adil_tafsir", "Ibni_kathir_quran_tafsir"]
+
+PAYLOAD_EXCLUDES = {
+    # English context: page_content + metadata; the Russian commentaries and translations are unused
+    "EN": {
+        ContentType.QURAN: ["ru_page_content"],
+        ContentType.HADITH: ["ru_page_content"],
+        ContentType.TAFSEER: ["ru_page_content"] + [f"metadata.{key}" for key in RU_TAFSEER_FIELDS],
+        ContentType.GENERAL: ["ru_page_content"],
+    },
+    # Russian/Ukrainian context: Quran drops its Tafsir, Tafseer renders only the commentaries and a few ids
+    "RU": {
+        ContentType.QURAN: ["metadata.Tafsir"],
+        ContentType.TAFSEER: [
+            "metadata.ayah_translation", "metadata.surah_number", "metadata.En_tafsir_source", "metadata.En_source_url",
+            "metadata.abu_Adil_tafsir_source", "metadata.Ibni_kathir_tafsir_source", "metadata.tafsir_Source",
+            "metadata.As-Saadi_tafsir_source",
+        ],
+    },
+}
 
 
 class QdrantService:
-    def __init__(self, qdrant_configs, embeddings, reranker_model_name="cross-encoder/ms-marco-MiniLM-L-6-v2"):
+    def __init__(self, qdrant_configs, embeddings, reranker_model_name=None):
 
         self.qdrant_clients = {}
         self.collection_configs = {}
         self.embeddings = embeddings
+        self.sparse_encoder = SparseEncoder()
+        self.depth_policy = AdaptiveDepth(
+            enabled=settings.ADAPTIVE_RETRIEVAL,
+            margin=settings.ADAPTIVE_SCORE_MARGIN,
+            flat_spread=settings.ADAPTIVE_FLAT_SPREAD,
+            expand_min_score=settings.ADAPTIVE_EXPAND_MIN_SCORE,
+            expand_factor=settings.ADAPTIVE_EXPAND_FACTOR
+        )
         
-        # Initialize reranker model
-        self.reranker = CrossEncoder(reranker_model_name)
+        # Initialize reranker model (batched, cached, optionally ONNX)
+        self.reranker = RerankerService(
+            reranker_model_name or settings.RERANKER_MODEL,
+            backend=settings.RERANKER_BACKEND,
+            model_file=settings.RERANKER_MODEL_FILE,
+            batch_size=settings.RERANKER_BATCH_SIZE,
+            max_wait_ms=settings.RERANKER_MAX_WAIT_MS,
+            cache_size=settings.RERANKER_CACHE_SIZE,
+            workers=settings.RERANK_WORKERS,
+            cache_folder=settings.MODEL_CACHE_DIR,
+            local_files_only=settings.MODEL_LOCAL_FILES_ONLY
+        )
         
-        # Create separate Qdrant clients for each content type
+        # Content types on the same endpoint share one client (and its connections)
         for content_type, config in qdrant_configs.items():
-            self.qdrant_clients[content_type] = QdrantClient(
-                url=config["url"], 
-                api_key=config["api_key"]
-            )
+            self.qdrant_clients[content_type] = get_qdrant_client(config["url"], config["api_key"])
             self.collection_configs[content_type] = config["collection"]
 
 
+    async def warm_up(self) -> None:
+        """Load the reranker and open one connection per Qdrant endpoint"""
+        clients = {id(client): client for client in self.qdrant_clients.values()}
+        results = await asyncio.gather(
+            asyncio.to_thread(self.reranker.warm_up),
+            *(client.get_collections() for client in clients.values()),
+            return_exceptions=True
+        )
+        for result in results:
+            if isinstance(result, Exception):
+                logging.warning(f"Warm-up step failed: {result}")
+
+
     def _get_content_type_limit(self, content_type: ContentType) -> int:
         """Get retrieval limit based on content type"""
         limits = {
@@ -38,18 +103,15 @@ class QdrantService:
         return limits.get(content_type, 8)  # Default fallback
 
 
-    def _rerank_documents(self, query: str, documents: list, top_k: int = None) -> list:
+    async def _rerank_documents(self, query: str, documents: list, top_k: int = None) -> list:
         """
         Rerank documents using cross-encoder model
         """
         if not documents:
             return documents
             
-        # Prepare query-document pairs for reranking
-        query_doc_pairs = [(query, doc['content']) for doc in documents]
-        
-        # Get relevance scores from cross-encoder
-        relevance_scores = self.reranker.predict(query_doc_pairs)
+        # Get relevance scores from cross-encoder; concurrent calls are coalesced into one predict
+        relevance_scores = await self.reranker.score(query, documents)
         
         # Add rerank scores to documents
         for i, doc in enumerate(documents):
@@ -65,50 +127,306 @@ class QdrantService:
         return reranked_docs
 
 
-    def retrieve_documents(self, state: LangraphState, content_type: ContentType) -> LangraphState:
+    def _get_payload_selector(self, content_type: ContentType, language: str) -> models.PayloadSelectorExclude:
+        """Project the payload to what the context builder renders for this content type and language"""
+        excludes = PAYLOAD_EXCLUDES["EN" if (language or "EN").upper() == "EN" else "RU"].get(content_type, [])
+        return models.PayloadSelectorExclude(exclude=excludes)
+
+
+    def _get_search_params(self, content_type: ContentType) -> models.SearchParams:
+        """Get HNSW search params (hnsw_ef, exact, ...) for a content type from QDRANT_SEARCH_PARAMS"""
+        return models.SearchParams(**settings.QDRANT_SEARCH_PARAMS.get(content_type.value, {}))
+
+
+    def _build_filter(self, content_type: ContentType, filters: Optional[RetrievalFiltersSchema]) -> Optional[models.Filter]:
+        """Payload filter for the metadata constraints that apply to this content type, None when none do"""
+        if filters is None:
+            return None
+
+        fields = settings.PAYLOAD_FIELDS.get(content_type.value, {})
+        conditions = [
+            models.FieldCondition(key=fields[name], match=models.MatchValue(value=value))
+            for name, value in filters.model_dump(exclude_none=True).items()
+            if name in fields
+        ]
+        return models.Filter(must=conditions) if conditions else None
+
+
+    def _build_query_request(
+        self, content_type: ContentType, query_embedding, language: str = "EN", query: str = None, filters: RetrievalFiltersSchema = None
+    ) -> models.QueryRequest:
         """
-        Generic document retrieval function with enhanced context awareness and reranking
+        Query request for one content type, over-fetching candidates for reranking. Content types in
+        HYBRID_SEARCH_CONTENT_TYPES fuse the dense and BM25 candidate lists with reciprocal rank fusion,
+        so exact names and terms the embedding blurs still reach the reranker.
         """
-        try:
+        limit = self._get_content_type_limit(content_type)
+        query_filter = self._build_filter(content_type, filters)
+        if query and content_type.value in settings.HYBRID_SEARCH_CONTENT_TYPES:
+            return models.QueryRequest(
+                prefetch=[
+                    models.Prefetch(
+                        query=query_embedding,
+                        using=settings.DENSE_VECTOR_NAME,
+                        filter=query_filter,
+                        limit=limit * 4,
+                        params=self._get_search_params(content_type)
+                    ),
+                    models.Prefetch(
+                        query=self.sparse_encoder.encode_query(query),
+                        using=settings.SPARSE_VECTOR_NAME,
+                        filter=query_filter,
+                        limit=limit * 4
+                    ),
+                ],
+                query=models.FusionQuery(fusion=models.Fusion.RRF),
+                limit=limit * 2,
+                with_payload=self._get_payload_selector(content_type, language),
+                with_vector=False
+            )
+
+        return models.QueryRequest(
+            query=query_embedding,
+            using=settings.DENSE_VECTOR_NAME,
+            filter=query_filter,
+            limit=limit * 2,  # Retrieve more documents for reranking
+            params=self._get_search_params(content_type),
+            with_payload=self._get_payload_selector(content_type, language),
+            with_vector=False
+        )
+
+
+    def _format_points(self, points, content_type_value: str) -> list:
+        """Convert Qdrant scored points into the document dicts used by the graph"""
+        documents = []
+        for result in points:
+            doc = {
+                'id': result.id,
+                'content': result.payload.get('page_content', ''),
+                'ru_content': result.payload.get('ru_page_content'),  # filled by scripts/pretranslate_payloads.py
+                'metadata': result.payload.get('metadata', {}),
+                'score': getattr(result, 'score', None),  # scroll records (reference lookups) are unscored
+                'source': content_type_value
+            }
+            documents.append(doc)
+        return documents
+
+
+    async def _query_collection(self, qdrant_client, collection_name: str, requests: list) -> list:
+        """
+        Run the requests against one collection: a single query_points call, or one
+        query_batch_points RPC when several requests target the same collection
+        """
+        with tracer.span("qdrant_search", collection_name):
+            return await self._query_points(qdrant_client, collection_name, requests)
+
+
+    async def _query_points(self, qdrant_client, collection_name: str, requests: list) -> list:
+        if len(requests) == 1:
+            request = requests[0]
+            response = await qdrant_client.query_points(
+                collection_name=collection_name,
+                query=request.query,
+                prefetch=request.prefetch,
+                using=request.using,
+                query_filter=request.filter,
+                limit=request.limit,
+                offset=request.offset,
+                search_params=request.params,
+                with_payload=request.with_payload,
+                with_vectors=False
+            )
+            return [response.points]
+
+        responses = await qdrant_client.query_batch_points(collection_name=collection_name, requests=requests)
+        return [response.points for response in responses]
+
+
+    async def _adapt_depth(self, content_type: ContentType, points: list, query: str, query_embedding, language: str, filters) -> list:
+        """
+        Choose how many vector candidates the cross-encoder scores (see AdaptiveDepth): a prefix of
+        the pool when the top scores clear the margin, the pool plus a second page when scores are flat
+        """
+        limit = self._get_content_type_limit(content_type)
+        requested = limit * 2
+        # RRF fusion scores only encode ranks, their gaps say nothing about confidence
+        adaptive = content_type.value not in settings.HYBRID_SEARCH_CONTENT_TYPES
+        decision = self.depth_policy.decide([point.score for point in points], limit, requested, adaptive)
+
+        candidates = points[:decision.depth]
+        if decision.action == "expand":
+            request = self._build_query_request(content_type, query_embedding, language, query, filters).model_copy(
+                update={"offset": len(points), "limit": limit * self.depth_policy.expand_factor}
+            )
+            with tracer.span("qdrant_expand", self.collection_configs[content_type.value]):
+                more = await self._query_points(
+                    self.qdrant_clients[content_type.value], self.collection_configs[content_type.value], [request]
+                )
+            candidates = points + more[0]
+
+        self.depth_policy.record(decision, reranked=len(candidates), fixed=len(points))
+        logging.info(
+            f"Retrieval depth for {content_type.value}: {decision.action}, reranking {len(candidates)} of {len(points)} "
+            f"fetched (top {decision.top_score:.3f}, spread {decision.spread:.3f})"
+        )
+        return candidates
+
+
+    async def search_many(
+        self, query: str, content_types: list, query_embedding=None, language: str = "EN", filters: RetrievalFiltersSchema = None
+    ) -> dict:
+        """
+        Search and rerank several content types at once. Requests are grouped per
+        (client, collection) so each group costs one RPC, groups run concurrently.
+        Metadata filters are applied where the content type has the payload field.
+        Returns {content_type: reranked documents or the exception raised for it}.
+        """
+        # Reuse the request's embedding when the caller already computed it, otherwise go through the shared embedding cache
+        if query_embedding is None:
+            query_embedding = await openai_service.embed_query(query)
+
+        results = {}
+        groups = {}
+        for content_type in content_types:
             content_type_value = content_type.value
             # Get the appropriate client and collection for this content type
             if content_type_value not in self.qdrant_clients:
                 logging.warning(f"No Qdrant client configured for {content_type_value}")
-                return state
+                results[content_type] = []
+                continue
 
             qdrant_client = self.qdrant_clients[content_type_value]
             collection_name = self.collection_configs[content_type_value]
-            
-            # Generate query embedding
-            query_embedding = self.embeddings.embed_query(state.user_query)
-            
+            groups.setdefault((id(qdrant_client), collection_name), []).append(content_type)
+
+        group_items = list(groups.items())
+        group_results = await asyncio.gather(
+            *(
+                self._query_collection(
+                    self.qdrant_clients[members[0].value],
+                    collection_name,
+                    [self._build_query_request(content_type, query_embedding, language, query, filters) for content_type in members]
+                )
+                for (_, collection_name), members in group_items
+            ),
+            return_exceptions=True
+        )
+
+        async def rerank(content_type, points):
+            # A filter that matches nothing (e.g. a tafsir source spelled differently) must not hide the whole source
+            applied_filters = filters
+            if not points and self._build_filter(content_type, filters) is not None:
+                logging.info(f"Filtered search in {content_type.value} found nothing, retrying without filters")
+                applied_filters = None
+                points = (await self._query_collection(
+                    self.qdrant_clients[content_type.value],
+                    self.collection_configs[content_type.value],
+                    [self._build_query_request(content_type, query_embedding, language, query)]
+                ))[0]
+
+            points = await self._adapt_depth(content_type, points, query, query_embedding, language, applied_filters)
+            documents = self._format_points(points, content_type.value)
             limit = self._get_content_type_limit(content_type)
-            # Search in Qdrant - retrieve more documents for reranking
-            search_results = qdrant_client.search(
-                collection_name=collection_name,
-                query_vector=query_embedding,
-                limit=limit * 2,  # Retrieve more documents for reranking
-                with_payload=True,
-                with_vectors=False
-            )
-            
-            # print("\n\n\n\n\n", search_results, "\n\n\n\n")
-            
-            # Format retrieved documents
-            documents = []
-            for result in search_results:
-                doc = {
-                    'content': result.payload.get('page_content', ''),
-                    'metadata': result.payload.get('metadata', {}),
-                    'score': result.score,
-                    'source': content_type_value
-                }
-                documents.append(doc)
-            
             # Rerank documents using cross-encoder
-            reranked_documents = self._rerank_documents(state.user_query, documents, top_k=limit)
+            with tracer.span("rerank", content_type.value):
+                reranked_documents = await self._rerank_documents(query, documents, top_k=limit)
+
+            log_payload(logging.getLogger(__name__), "Reranked documents", reranked_documents)
+            logging.info(f"Retrieved and reranked {len(reranked_documents)} documents from {content_type.value}")
+            return reranked_documents
+
+        to_rerank = []
+        for ((_, _), members), group_result in zip(group_items, group_results):
+            if isinstance(group_result, Exception):
+                for content_type in members:
+                    results[content_type] = group_result
+                continue
+            to_rerank.extend(zip(members, group_result))
+
+        reranked = await asyncio.gather(
+            *(rerank(content_type, points) for content_type, points in to_rerank),
+            return_exceptions=True
+        )
+        for (content_type, _), documents in zip(to_rerank, reranked):
+            results[content_type] = documents
+
+        return results
+
 
-            print("\n\n\nReranked Documents: ", reranked_documents, "\n\n\n")
+    def _reference_filter(self, content_type: ContentType, reference: ScriptureReference) -> models.Filter:
+        """Payload filter selecting exactly the referenced verses or hadith (keys from PAYLOAD_FIELDS)"""
+        fields = settings.PAYLOAD_FIELDS[content_type.value]
+        if content_type == ContentType.HADITH:
+            return models.Filter(must=[
+                models.FieldCondition(key=fields["collection"], match=models.MatchValue(value=reference.collection)),
+                models.FieldCondition(key=fields["number"], match=models.MatchValue(value=reference.hadith_number)),
+            ])
+        return models.Filter(must=[
+            models.FieldCondition(key=fields["surah"], match=models.MatchValue(value=reference.surah)),
+            models.FieldCondition(key=fields["ayah"], range=models.Range(gte=reference.ayah_start, lte=reference.ayah_end)),
+        ])
+
+
+    async def lookup_reference(self, reference: ScriptureReference, language: str = "EN") -> dict:
+        """
+        Fetch an exact verse (range) or hadith by payload filter: no embedding, no vector search and
+        no reranking. Returns {content_type: documents} with empty lists where nothing matched.
+        """
+        async def scroll(content_type):
+            content_type_value = content_type.value
+            if content_type_value not in self.qdrant_clients or content_type_value not in settings.PAYLOAD_FIELDS:
+                return []
+
+            span = 1 if content_type == ContentType.HADITH else reference.ayah_end - reference.ayah_start + 1
+            with tracer.span("qdrant_lookup", self.collection_configs[content_type_value]):
+                records, _ = await self.qdrant_clients[content_type_value].scroll(
+                    collection_name=self.collection_configs[content_type_value],
+                    scroll_filter=self._reference_filter(content_type, reference),
+                    limit=min(span, 20) * 2,  # a verse may be split over several points
+                    with_payload=self._get_payload_selector(content_type, language),
+                    with_vectors=False
+                )
+
+            documents = self._format_points(records, content_type_value)
+            for doc in documents:
+                doc['score'] = doc['rerank_score'] = 1.0  # exact match
+            return documents
+
+        content_types = reference.sources
+        found = await asyncio.gather(*(scroll(content_type) for content_type in content_types), return_exceptions=True)
+
+        results = {}
+        for content_type, documents in zip(content_types, found):
+            if isinstance(documents, Exception):
+                logging.warning(f"Reference lookup in {content_type.value} failed: {documents}")
+                documents = []
+            results[content_type] = documents
+        logging.info(f"Reference lookup {reference} found {sum(len(docs) for docs in results.values())} documents")
+        return results
+
+
+    async def search_documents(
+        self, query: str, content_type: ContentType, query_embedding=None, language: str = "EN", filters: RetrievalFiltersSchema = None
+    ) -> list:
+        """
+        Embed, search and rerank a single collection and return the reranked documents.
+        Does not touch the graph state so it can safely run concurrently for several sources.
+        """
+        result = (await self.search_many(query, [content_type], query_embedding, language, filters))[content_type]
+        if isinstance(result, Exception):
+            raise result
+        return result
+
+
+    async def retrieve_documents(self, state: LangraphState, content_type: ContentType) -> LangraphState:
+        """
+        Generic document retrieval function with enhanced context awareness and reranking
+        """
+        content_type_value = content_type.value
+        try:
+            reranked_documents = await self.search_documents(
+                state.user_query, content_type, state.query_embedding, state.detected_language, state.filters
+            )
 
             # Store documents by source type
             if content_type_value not in state.retrieved_documents:
@@ -116,8 +434,6 @@ class QdrantService:
             
             state.retrieved_documents[content_type_value].extend(reranked_documents)
 
-            logging.info(f"Retrieved and reranked {len(reranked_documents)} documents from {content_type_value}")
-
         except Exception as e:
             logging.error(f"Error retrieving documents from {content_type_value}: {e}")
             if not state.error_message:
@@ -126,48 +442,25 @@ class QdrantService:
         return state
 
 
-    def fallback_retrieval(self, state: LangraphState) -> LangraphState:
+    async def fallback_retrieval(self, state: LangraphState) -> LangraphState:
         """
-        Fallback node that searches across all collections when GENERAL is specified
+        Fallback node that searches across all collections when GENERAL is specified,
+        concurrently through search_many with the request's embedding
         """
         try:
-            # Search in all collections if no specific sources were identified
-            for content_type_value, qdrant_client in self.qdrant_clients.items():
-                try:
-                    collection_name = self.collection_configs[content_type_value]
-                    query_embedding = self.embeddings.embed_query(state.user_query)
-                    
-                    search_results = qdrant_client.search(
-                        collection_name=collection_name,
-                        query_vector=query_embedding,
-                        limit=6,  # Retrieve more for reranking
-                        with_payload=True,
-                        with_vectors=False
-                    )
-                    
-                    documents = []
-                    for result in search_results:
-                        doc = {
-                            'content': result.payload.get('content', ''),
-                            'metadata': result.payload.get('metadata', {}),
-                            'score': result.score,
-                            'source': content_type_value
-                        }
-                        documents.append(doc)
-                    
-                    # Rerank documents for this source
-                    reranked_documents = self._rerank_documents(state.user_query, documents, top_k=3)
-                    
-                    if content_type_value not in state.retrieved_documents:
-                        state.retrieved_documents[content_type_value] = []
-                    state.retrieved_documents[content_type_value].extend(reranked_documents)
-                        
-                except Exception as e:
-                    logging.warning(f"Error searching in {content_type_value}: {e}")
+            content_types = [ContentType(content_type_value) for content_type_value in self.qdrant_clients]
+            results = await self.search_many(
+                state.user_query, content_types, state.query_embedding, state.detected_language, state.filters
+            )
+
+            for content_type, documents in results.items():
+                if isinstance(documents, Exception):
+                    logging.warning(f"Error searching in {content_type.value}: {documents}")
                     continue
-            
+                state.retrieved_documents.setdefault(content_type.value, []).extend(documents)
+
             # Mark all sources as completed for fallback
-            state.completed_sources.update([ContentType.QURAN, ContentType.HADITH, ContentType.TAFSEER])
+            state.completed_sources.update(content_types)
             logging.info(f"Fallback retrieved documents from {len(state.retrieved_documents)} sources")
             
         except Exception as e:
@@ -0,0 +1,265 @@
+import os
+import json
+import logging
+import threading
+from collections import Counter
+from dataclasses import dataclass
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from schemas.data_classes.content_type import ContentType
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class RouteDecision:
+    sources: List[ContentType]
+    confidence: float
+    method: str  # "cache" or "knn+centroid"
+
+
+class QueryRouter:
+    """
+    Local router for classify_multi_source_query.
+
+    Every LLM classification is kept as a labelled example (query embedding -> sources).
+    A new query first looks for a near-identical past query (classification cache), then
+    combines a similarity-weighted k-nearest-neighbour vote with a per-source nearest-centroid
+    classifier. The LLM is only needed when the combined confidence is below the threshold.
+
+    Examples live in a ring buffer of `max_examples` rows and the centroids are kept as running
+    per-source sums, so adding an example never refits anything. New examples are appended to
+    `examples_path` by persist(), which callers run off the event loop; the file is compacted to
+    the examples in memory once it holds twice as many lines.
+    """
+
+    def __init__(
+        self,
+        examples_path: Optional[str] = None,
+        cache_threshold: float = 0.95,
+        confidence_threshold: float = 0.6,
+        min_similarity: float = 0.7,
+        min_examples: int = 50,
+        max_examples: int = 5000,
+        k: int = 7,
+    ):
+
+        self.examples_path = examples_path
+        self.cache_threshold = cache_threshold
+        self.confidence_threshold = confidence_threshold
+        self.min_similarity = min_similarity
+        self.min_examples = min_examples
+        self.max_examples = max_examples
+        self.k = k
+
+        self._sources = list(ContentType)
+
+        self._lock = threading.Lock()
+        # Allocated on the first example, once the embedding size is known
+        self._matrix: Optional[np.ndarray] = None
+        self._label_matrix = np.zeros((max_examples, len(self._sources)), dtype=np.float32)
+        self._size = 0
+        self._next = 0  # ring buffer row the next example overwrites
+        self._total_sum: Optional[np.ndarray] = None
+        self._positive_sums: Optional[np.ndarray] = None  # per source, sum of the examples labelled with it
+        self._positive_counts = np.zeros(len(self._sources), dtype=np.int64)
+        self._counts = Counter()
+
+        # Examples not yet written to examples_path, and the file's line count
+        self._pending: List[str] = []
+        self._file_lock = threading.Lock()
+        self._file_lines = 0
+
+        self._load()
+
+
+    @staticmethod
+    def _normalize(embedding) -> np.ndarray:
+        vector = np.asarray(embedding, dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+
+    def _encode_labels(self, sources: List[ContentType]) -> np.ndarray:
+        return np.array([1.0 if source in sources else 0.0 for source in self._sources], dtype=np.float32)
+
+
+    def _example_line(self, vector: np.ndarray, labels: np.ndarray) -> str:
+        return json.dumps({
+            "embedding": [round(float(x), 6) for x in vector],
+            "sources": [source.value for source, flag in zip(self._sources, labels) if flag],
+        }) + "\n"
+
+
+    def _append(self, vector: np.ndarray, labels: np.ndarray) -> None:
+        """Write an example into the ring buffer and update the centroid sums (caller holds the lock)"""
+        if self._matrix is None:
+            self._matrix = np.zeros((self.max_examples, vector.shape[0]), dtype=np.float32)
+            self._total_sum = np.zeros(vector.shape[0], dtype=np.float64)
+            self._positive_sums = np.zeros((len(self._sources), vector.shape[0]), dtype=np.float64)
+
+        row = self._next
+        if self._size == self.max_examples:
+            # Evict the oldest example from the sums
+            self._total_sum -= self._matrix[row]
+            self._positive_sums -= np.outer(self._label_matrix[row], self._matrix[row])
+            self._positive_counts -= self._label_matrix[row].astype(np.int64)
+        else:
+            self._size += 1
+
+        self._matrix[row] = vector
+        self._label_matrix[row] = labels
+        self._total_sum += vector
+        self._positive_sums += np.outer(labels, vector)
+        self._positive_counts += labels.astype(np.int64)
+        self._next = (row + 1) % self.max_examples
+
+
+    def _load(self) -> None:
+        if not self.examples_path or not os.path.exists(self.examples_path):
+            return
+
+        with open(self.examples_path, encoding="utf-8") as f:
+            for line in f:
+                self._file_lines += 1
+                try:
+                    example = json.loads(line)
+                    sources = [ContentType(value) for value in example["sources"]]
+                    # Older examples are overwritten in the ring buffer, keeping the most recent
+                    self._append(self._normalize(example["embedding"]), self._encode_labels(sources))
+                except (ValueError, KeyError) as e:
+                    logger.warning(f"Skipping invalid router example: {e}")
+
+        logger.info(f"Loaded {self._size} labelled routing examples")
+
+
+    def add_example(self, embedding, sources: List[ContentType]) -> None:
+        """Remember an (LLM) classification so similar queries can be routed locally; see persist()"""
+        vector = self._normalize(embedding)
+        labels = self._encode_labels(sources)
+
+        with self._lock:
+            self._append(vector, labels)
+            if self.examples_path:
+                self._pending.append(self._example_line(vector, labels))
+
+
+    def persist(self) -> None:
+        """
+        Append the pending examples to examples_path, compacting the file to the examples in
+        memory once it has grown past twice max_examples. Blocking file I/O: run it in a thread.
+        """
+        if not self.examples_path:
+            return
+
+        with self._file_lock:
+            with self._lock:
+                pending, self._pending = self._pending, []
+                compact = self._file_lines + len(pending) > 2 * self.max_examples
+                if compact:
+                    # Oldest first, so a reload keeps the same examples
+                    order = [(self._next + i) % self.max_examples for i in range(self.max_examples)][-self._size:]
+                    vectors, labels = self._matrix[order], self._label_matrix[order]
+
+            if not pending and not compact:
+                return
+
+            directory = os.path.dirname(self.examples_path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+
+            if compact:
+                lines = [self._example_line(vector, flags) for vector, flags in zip(vectors, labels)]
+                temporary = f"{self.examples_path}.tmp"
+                with open(temporary, "w", encoding="utf-8") as f:
+                    f.writelines(lines)
+                os.replace(temporary, self.examples_path)
+                self._file_lines = len(lines)
+                logger.info(f"Compacted router examples to {len(lines)} lines")
+            else:
+                with open(self.examples_path, "a", encoding="utf-8") as f:
+                    f.writelines(pending)
+                self._file_lines += len(pending)
+
+
+    def _centroids(self) -> Dict[str, tuple]:
+        """Per-source (positive, negative) centroids from the running sums (caller holds the lock)"""
+        centroids = {}
+        for i, source in enumerate(self._sources):
+            positives = int(self._positive_counts[i])
+            if 0 < positives < self._size:
+                centroids[source.value] = (
+                    self._normalize(self._positive_sums[i] / positives),
+                    self._normalize((self._total_sum - self._positive_sums[i]) / (self._size - positives)),
+                )
+        return centroids
+
+
+    def route(self, embedding) -> Optional[RouteDecision]:
+        """Return the routed sources, or None when the LLM should decide"""
+        query_vector = self._normalize(embedding)
+
+        with self._lock:
+            if self._size < self.min_examples:
+                self._counts["fallback"] += 1
+                return None
+
+            similarities = self._matrix[:self._size] @ query_vector
+            k = min(self.k, self._size)
+            nearest = np.argpartition(-similarities, k - 1)[:k]
+            nearest = nearest[np.argsort(-similarities[nearest])]
+
+            # Classification cache: a near-identical query was already classified
+            if similarities[nearest[0]] >= self.cache_threshold:
+                sources = [s for s, flag in zip(self._sources, self._label_matrix[nearest[0]]) if flag]
+                if sources:
+                    self._counts["cache"] += 1
+                    return RouteDecision(sources, float(similarities[nearest[0]]), "cache")
+
+            # Nothing similar has been classified yet, let the LLM decide
+            if similarities[nearest[0]] < self.min_similarity:
+                self._counts["fallback"] += 1
+                return None
+
+            # Similarity-weighted kNN vote per source
+            weights = np.clip(similarities[nearest], 0, None)
+            knn_probabilities = (weights @ self._label_matrix[nearest]) / (weights.sum() or 1.0)
+
+            # Nearest-centroid classifier per source, squashed to a probability
+            all_centroids = self._centroids()
+            probabilities = []
+            for i, source in enumerate(self._sources):
+                centroids = all_centroids.get(source.value)
+                if centroids is None:
+                    probabilities.append(knn_probabilities[i])
+                    continue
+                positive, negative = centroids
+                margin = float(query_vector @ positive - query_vector @ negative)
+                centroid_probability = 1 / (1 + np.exp(-margin * 20))
+                probabilities.append((knn_probabilities[i] + centroid_probability) / 2)
+
+            probabilities = np.array(probabilities)
+            sources = [s for s, p in zip(self._sources, probabilities) if p >= 0.5]
+            confidence = float(np.min(np.abs(probabilities - 0.5) * 2))
+
+            if not sources or confidence < self.confidence_threshold:
+                self._counts["fallback"] += 1
+                return None
+
+            self._counts["knn+centroid"] += 1
+            return RouteDecision(sources, confidence, "knn+centroid")
+
+
+    def stats(self) -> Dict[str, float]:
+        with self._lock:
+            counts = dict(self._counts)
+            examples = self._size
+        total = sum(counts.values())
+        return {
+            **counts,
+            "examples": examples,
+            "total": total,
+            "local_rate": (total - counts.get("fallback", 0)) / total if total else 0.0,
+        }
@@ -0,0 +1,227 @@
+import re
+from typing import Optional
+
+from schemas.data_classes.content_type import ContentType
+from schemas.data_classes.scripture_reference import ScriptureReference
+from schemas.structured_outputs.retrieval_filters import RetrievalFiltersSchema
+
+
+# Transliterated surah names in order (index + 1 = surah number)
+_SURAH_NAMES = [
+    "Al-Fatihah", "Al-Baqarah", "Al-Imran", "An-Nisa", "Al-Maidah", "Al-Anam", "Al-Araf", "Al-Anfal",
+    "At-Tawbah", "Yunus", "Hud", "Yusuf", "Ar-Rad", "Ibrahim", "Al-Hijr", "An-Nahl", "Al-Isra", "Al-Kahf",
+    "Maryam", "Taha", "Al-Anbiya", "Al-Hajj", "Al-Muminun", "An-Nur", "Al-Furqan", "Ash-Shuara", "An-Naml",
+    "Al-Qasas", "Al-Ankabut", "Ar-Rum", "Luqman", "As-Sajdah", "Al-Ahzab", "Saba", "Fatir", "Ya-Sin",
+    "As-Saffat", "Sad", "Az-Zumar", "Ghafir", "Fussilat", "Ash-Shura", "Az-Zukhruf", "Ad-Dukhan",
+    "Al-Jathiyah", "Al-Ahqaf", "Muhammad", "Al-Fath", "Al-Hujurat", "Qaf", "Adh-Dhariyat", "At-Tur",
+    "An-Najm", "Al-Qamar", "Ar-Rahman", "Al-Waqiah", "Al-Hadid", "Al-Mujadilah", "Al-Hashr",
+    "Al-Mumtahanah", "As-Saff", "Al-Jumuah", "Al-Munafiqun", "At-Taghabun", "At-Talaq", "At-Tahrim",
+    "Al-Mulk", "Al-Qalam", "Al-Haqqah", "Al-Maarij", "Nuh", "Al-Jinn", "Al-Muzzammil", "Al-Muddaththir",
+    "Al-Qiyamah", "Al-Insan", "Al-Mursalat", "An-Naba", "An-Naziat", "Abasa", "At-Takwir", "Al-Infitar",
+    "Al-Mutaffifin", "Al-Inshiqaq", "Al-Buruj", "At-Tariq", "Al-Ala", "Al-Ghashiyah", "Al-Fajr",
+    "Al-Balad", "Ash-Shams", "Al-Layl", "Ad-Duha", "Ash-Sharh", "At-Tin", "Al-Alaq", "Al-Qadr",
+    "Al-Bayyinah", "Az-Zalzalah", "Al-Adiyat", "Al-Qariah", "At-Takathur", "Al-Asr", "Al-Humazah",
+    "Al-Fil", "Quraysh", "Al-Maun", "Al-Kawthar", "Al-Kafirun", "An-Nasr", "Al-Masad", "Al-Ikhlas",
+    "Al-Falaq", "An-Nas",
+]
+
+# Common alternative spellings
+_SURAH_ALIASES = {
+    "Al-Imran": "Ali Imran", "At-Tawbah": "At-Taubah", "Al-Isra": "Bani Israil", "Ghafir": "Al-Mumin",
+    "Fussilat": "Ha-Mim Sajdah", "Al-Insan": "Ad-Dahr", "Ash-Sharh": "Al-Inshirah", "Al-Masad": "Al-Lahab",
+    "Ya-Sin": "Yaseen", "Al-Kawthar": "Al-Kauthar", "Al-Layl": "Al-Lail", "Al-Muddaththir": "Al-Muddathir",
+}
+
+# Well-known verses named without numbers
+_NAMED_VERSES = {
+    "ayat al kursi": (2, 255, 255),
+    "ayatul kursi": (2, 255, 255),
+    "throne verse": (2, 255, 255),
+    "verse of the throne": (2, 255, 255),
+    "light verse": (24, 35, 35),
+}
+
+# Hadith collection aliases -> canonical collection name stored in the payload.
+# Aliases that are also everyday words or names only count with a prefix ("Sahih Muslim 40")
+# or a number marker ("Muslim #40").
+_HADITH_COLLECTIONS = {
+    "bukhari": ("Sahih al-Bukhari", False),
+    "muslim": ("Sahih Muslim", True),
+    "abu dawud": ("Sunan Abi Dawud", False),
+    "abu dawood": ("Sunan Abi Dawud", False),
+    "abi dawud": ("Sunan Abi Dawud", False),
+    "tirmidhi": ("Jami at-Tirmidhi", False),
+    "nasai": ("Sunan an-Nasai", False),
+    "ibn majah": ("Sunan Ibn Majah", False),
+    "malik": ("Muwatta Malik", True),
+    "muwatta": ("Muwatta Malik", False),
+    "ahmad": ("Musnad Ahmad", True),
+    "riyad as salihin": ("Riyad as-Salihin", False),
+    "nawawi": ("40 Hadith Nawawi", False),
+}
+
+_ARTICLE = re.compile(r"^(?:a[lnrstzd]|ash|adh)[\s\-']+")
+
+
+def _surah_key(name: str) -> str:
+    """Spelling-insensitive key: no article, punctuation, trailing h or doubled letters"""
+    key = _ARTICLE.sub("", name.lower().strip())
+    key = re.sub(r"[^a-z]", "", key)
+    key = re.sub(r"(.)\1+", r"\1", key)
+    key = key.replace("ee", "i").replace("ou", "u")
+    return key[:-1] if key.endswith("h") and len(key) > 3 else key
+
+
+_SURAH_NUMBERS = {}
+for number, name in enumerate(_SURAH_NAMES, start=1):
+    _SURAH_NUMBERS[_surah_key(name)] = number
+for canonical, alias in _SURAH_ALIASES.items():
+    _SURAH_NUMBERS[_surah_key(alias)] = _SURAH_NAMES.index(canonical) + 1
+
+
+_NAME = r"([a-z][a-z'\-]*(?:[ \-][a-z][a-z'\-]*){0,2}|\d{1,3})"
+_RANGE = r"(\d{1,3})(?:\s*[-–]\s*(\d{1,3}))?"
+
+_VERSE = r"(\d{1,3})\s*:\s*" + _RANGE + r"(?![\d:])"
+
+_NAMED_VERSE_PATTERNS = [
+    (re.compile(r"\b" + phrase.replace(" ", r"\s+") + r"\b"), verse) for phrase, verse in _NAMED_VERSES.items()
+]
+
+# "Quran 2:255", "Q. 2:255", "surah 18:10": a marker right before the numbers
+_MARKED_VERSE = re.compile(r"(?:\b(?:quran|qur'an|koran|surah|surat|sura|ayah|ayat|aya|verses?)\s*|\bq\.?\s*)" + _VERSE)
+# "Al-Baqarah 2:255": only when the name and the surah number agree
+_NAMED_SURAH_VERSE = re.compile(r"([a-z][a-z'\-]*(?:[ \-][a-z][a-z'\-]*){0,2})\s+" + _VERSE)
+# Any other "10:30" is read as a verse only in a query about the Quran, and then only as a hint
+_QURAN_CONTEXT = re.compile(r"\b(?:quran|qur'an|koran|surah|surat|sura|ayah|ayat|aya|verses?|tafs(?:ee|i)r)\b")
+_BARE_VERSE = re.compile(r"(?<![\d:])" + _VERSE)
+
+_QURAN_PATTERNS = [
+    # surah al-baqarah ayah 255, sura 2 verse 255
+    (re.compile(r"\b(?:surah|surat|sura|chapter)\s+" + _NAME + r"[\s,]+(?:ayah|ayat|aya|verses?|v\.)\s*" + _RANGE), ("surah", "start", "end")),
+    # ayah 255 of surah al-baqarah
+    (re.compile(r"\b(?:ayah|ayat|aya|verses?)\s+" + _RANGE + r"\s+(?:of|from|in)\s+(?:(?:the\s+)?(?:surah|surat|sura|chapter)\s+)?" + _NAME), ("start", "end", "surah")),
+    (_MARKED_VERSE, ("surah", "start", "end")),
+]
+
+_COLLECTION = "|".join(sorted((re.escape(alias) for alias in _HADITH_COLLECTIONS), key=len, reverse=True))
+_PREFIXES = r"sahih\s+|sunan\s+|muwatta\s+|musnad\s+|jami\s+(?:at\s*-?\s*)?"
+_COLLECTION_PREFIX = r"(" + _PREFIXES + r")?"
+_HADITH_PATTERNS = [
+    # sahih bukhari 1, bukhari hadith no. 52, muslim #40
+    (re.compile(r"\b" + _COLLECTION_PREFIX + r"(" + _COLLECTION + r")((?:\s+hadith)?\s*(?:no\.?|number|#)?)\s*(\d{1,5})\b"), ("prefix", "collection", "marker", "number")),
+    # hadith 52 of bukhari
+    (re.compile(r"\bhadith\s*(?:no\.?|number|#)?\s*(\d{1,5})\s+(?:of|from|in)\s+" + _COLLECTION_PREFIX + r"(" + _COLLECTION + r")\b"), ("number", "prefix", "collection")),
+]
+
+_SURAH_MENTION = re.compile(r"\b(?:surah|surat|sura)\s+" + _NAME)
+# "hadith in Sahih Muslim", "hadiths of Malik"
+_COLLECTION_MENTION = re.compile(r"\b(" + _PREFIXES + r"|hadiths?\s+(?:of|from|in|by)\s+)?(" + _COLLECTION + r")\b")
+
+
+def _resolve_surah(value: str) -> Optional[int]:
+    if value.isdigit():
+        number = int(value)
+        return number if 1 <= number <= 114 else None
+
+    words = re.split(r"[\s\-]+", value)
+    # Try the longest run of words first: "al imran" before "al"
+    for size in range(len(words), 0, -1):
+        number = _SURAH_NUMBERS.get(_surah_key(" ".join(words[:size])))
+        if number:
+            return number
+    return None
+
+
+def _surah_before(words: str) -> Optional[int]:
+    """Surah named by the last one to three words before a verse number"""
+    words = re.split(r"[\s\-]+", words)
+    for size in range(min(len(words), 3), 0, -1):
+        number = _SURAH_NUMBERS.get(_surah_key(" ".join(words[-size:])))
+        if number:
+            return number
+    return None
+
+
+def _verse(surah: Optional[int], start: str, end: Optional[str], exact: bool = True) -> Optional[ScriptureReference]:
+    start = int(start)
+    end = int(end) if end else start
+    if surah and 1 <= start <= end <= 286:
+        return ScriptureReference(ContentType.QURAN, surah=surah, ayah_start=start, ayah_end=end, exact=exact)
+    return None
+
+
+def _parse_quran(text: str) -> Optional[ScriptureReference]:
+    words = text.replace("-", " ")
+    for pattern, (surah, start, end) in _NAMED_VERSE_PATTERNS:
+        if pattern.search(words):
+            return ScriptureReference(ContentType.QURAN, surah=surah, ayah_start=start, ayah_end=end)
+
+    for pattern, roles in _QURAN_PATTERNS:
+        for match in pattern.finditer(text):
+            groups = dict(zip(roles, match.groups()))
+            reference = _verse(_resolve_surah(groups["surah"]), groups["start"], groups["end"])
+            if reference:
+                return reference
+
+    for match in _NAMED_SURAH_VERSE.finditer(text):
+        name, surah, start, end = match.groups()
+        if _surah_before(name) == int(surah):
+            reference = _verse(int(surah), start, end)
+            if reference:
+                return reference
+
+    if _QURAN_CONTEXT.search(text):
+        for match in _BARE_VERSE.finditer(text):
+            surah, start, end = match.groups()
+            reference = _verse(_resolve_surah(surah), start, end, exact=False)
+            if reference:
+                return reference
+    return None
+
+
+def _parse_hadith(text: str) -> Optional[ScriptureReference]:
+    for pattern, roles in _HADITH_PATTERNS:
+        for match in pattern.finditer(text):
+            groups = dict(zip(roles, match.groups()))
+            collection, ambiguous = _HADITH_COLLECTIONS[groups["collection"]]
+            # "hadith 40 of muslim" names the collection explicitly; "muslim 40" does not
+            explicit = groups["prefix"] or groups.get("marker", "hadith").strip()
+            if ambiguous and not explicit:
+                continue
+            return ScriptureReference(ContentType.HADITH, collection=collection, hadith_number=int(groups["number"]))
+    return None
+
+
+def parse_reference(query: str) -> Optional[ScriptureReference]:
+    """
+    Recognise an exact Quran verse ("Quran 2:255", "Surah Al-Baqarah ayah 255", "Ayat al-Kursi") or
+    hadith ("Sahih Bukhari 1", "hadith 52 of Muslim") in an (English) query. A bare "2:255" in a
+    question about the Quran is returned with exact=False, as a hint to merge with retrieval.
+    Returns None when the query does not name one.
+    """
+    text = " ".join(query.lower().replace("’", "'").split())
+    return _parse_quran(text) or _parse_hadith(text)
+
+
+def parse_filters(query: str) -> Optional[RetrievalFiltersSchema]:
+    """
+    Surah or hadith collection the (English) query names without an exact verse/hadith number,
+    e.g. "main themes of Surah Al-Kahf" or "hadith in Sahih Muslim about fasting".
+    Used when the LLM classifier did not run; returns None when nothing is named.
+    """
+    text = " ".join(query.lower().replace("’", "'").split())
+    filters = RetrievalFiltersSchema()
+
+    match = _SURAH_MENTION.search(text)
+    if match:
+        filters.surah = _resolve_surah(match.group(1))
+
+    for match in _COLLECTION_MENTION.finditer(text):
+        collection, ambiguous = _HADITH_COLLECTIONS[match.group(2)]
+        if ambiguous and not match.group(1):
+            continue
+        filters.collection = collection
+        break
+
+    return None if filters.is_empty() else filters
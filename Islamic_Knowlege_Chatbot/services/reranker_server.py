@@ -0,0 +1,243 @@
+"""
+Shared reranker for multi-worker deployments.
+
+One process loads the CrossEncoder and serves predictions over a Unix socket; every API worker
+uses RemoteCrossEncoder (selected by RERANKER_SOCKET) instead of loading its own copy of the
+weights. Requests from all workers that arrive within RERANKER_MAX_WAIT_MS are scored in one
+predict call.
+
+Frames are a 4-byte big-endian length followed by JSON:
+    request  {"pairs": [[query, passage], ...]}
+    response {"scores": [...]} or {"error": "..."}
+
+Usage (from the Islamic_Knowlege_Chatbot directory; gunicorn.conf.py starts it and restarts it if it exits):
+    python -m services.reranker_server --socket /tmp/islamic-chatbot-reranker.sock
+"""
+
+import os
+import json
+import time
+import socket
+import struct
+import asyncio
+import logging
+import argparse
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Optional, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+
+_HEADER = struct.Struct(">I")
+
+
+def _send_frame(sock: socket.socket, message: dict) -> None:
+    payload = json.dumps(message, ensure_ascii=False).encode("utf-8")
+    sock.sendall(_HEADER.pack(len(payload)) + payload)
+
+
+def _recv_exactly(sock: socket.socket, size: int) -> bytes:
+    chunks = []
+    while size:
+        chunk = sock.recv(size)
+        if not chunk:
+            raise ConnectionError("Reranker connection closed")
+        chunks.append(chunk)
+        size -= len(chunk)
+    return b"".join(chunks)
+
+
+def _recv_frame(sock: socket.socket) -> dict:
+    (size,) = _HEADER.unpack(_recv_exactly(sock, _HEADER.size))
+    return json.loads(_recv_exactly(sock, size))
+
+
+class RemoteCrossEncoder:
+    """
+    Client side of the shared reranker with the CrossEncoder.predict interface, so
+    RerankerService works unchanged. Blocking, like predict; one connection per thread.
+    """
+
+    def __init__(self, socket_path: str, timeout: float = 30.0, connect_timeout: float = 120.0):
+
+        self.socket_path = socket_path
+        self.timeout = timeout
+        self.connect_timeout = connect_timeout
+        self._local = threading.local()
+
+
+    def _connect(self) -> socket.socket:
+        # The reranker process may still be loading the model when workers start
+        deadline = time.monotonic() + self.connect_timeout
+        while True:
+            sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            sock.settimeout(self.timeout)
+            try:
+                sock.connect(self.socket_path)
+                return sock
+            except (FileNotFoundError, ConnectionRefusedError):
+                sock.close()
+                if time.monotonic() > deadline:
+                    raise
+                time.sleep(0.2)
+
+
+    def _close(self) -> None:
+        sock = getattr(self._local, "sock", None)
+        if sock is not None:
+            sock.close()
+        self._local.sock = None
+
+
+    def predict(self, pairs, batch_size: int = 32, **kwargs) -> np.ndarray:
+        request = {"pairs": [[query, passage] for query, passage in pairs]}
+
+        # Retry once on a fresh connection, e.g. after the reranker process restarted
+        for attempt in range(2):
+            try:
+                if getattr(self._local, "sock", None) is None:
+                    self._local.sock = self._connect()
+                _send_frame(self._local.sock, request)
+                response = _recv_frame(self._local.sock)
+                break
+            except (OSError, ConnectionError):
+                self._close()
+                if attempt:
+                    raise
+
+        if "error" in response:
+            raise RuntimeError(f"Shared reranker failed: {response['error']}")
+        return np.asarray(response["scores"], dtype=np.float32)
+
+
+async def shared_reranker_available(socket_path: str, timeout: float = 1.0) -> bool:
+    """Whether the reranker process accepts connections on its socket (used by the readiness probe)"""
+    try:
+        _, writer = await asyncio.wait_for(asyncio.open_unix_connection(socket_path), timeout)
+    except (OSError, asyncio.TimeoutError):
+        return False
+    writer.close()
+    return True
+
+
+class RerankerServer:
+    """Serves one CrossEncoder to every worker, coalescing concurrent requests into batches"""
+
+    def __init__(self, model, batch_size: int = 64, max_wait_ms: float = 5.0, threads: int = 1):
+
+        self.model = model
+        self.batch_size = batch_size
+        self.max_wait = max_wait_ms / 1000
+        self.executor = ThreadPoolExecutor(max_workers=threads, thread_name_prefix="rerank")
+
+        self._pending: List[Tuple[list, asyncio.Future]] = []
+        self._flush_task: Optional[asyncio.Task] = None
+
+
+    async def _flush(self, delay: float) -> None:
+        if delay:
+            await asyncio.sleep(delay)
+
+        batch, self._pending = self._pending, []
+        # The window is closed: requests arriving while this batch is predicted start a new one
+        if self._flush_task is asyncio.current_task():
+            self._flush_task = None
+        if not batch:
+            return
+
+        pairs = [pair for request_pairs, _ in batch for pair in request_pairs]
+        try:
+            loop = asyncio.get_running_loop()
+            scores = await loop.run_in_executor(
+                self.executor, lambda: self.model.predict(pairs, batch_size=self.batch_size)
+            )
+            offset = 0
+            for request_pairs, future in batch:
+                # The waiter is cancelled when its worker disconnected; the rest still get their scores
+                if not future.done():
+                    future.set_result([float(score) for score in scores[offset:offset + len(request_pairs)]])
+                offset += len(request_pairs)
+        except Exception as e:
+            logger.error(f"Shared reranker batch of {len(pairs)} pairs failed: {e}")
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+
+
+    async def score(self, pairs: list) -> List[float]:
+        future = asyncio.get_running_loop().create_future()
+        self._pending.append((pairs, future))
+
+        queued = sum(len(request_pairs) for request_pairs, _ in self._pending)
+        if queued >= self.batch_size:
+            self._flush_task = asyncio.create_task(self._flush(0))
+        elif self._flush_task is None or self._flush_task.done():
+            self._flush_task = asyncio.create_task(self._flush(self.max_wait))
+
+        return await future
+
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        try:
+            while True:
+                (size,) = _HEADER.unpack(await reader.readexactly(_HEADER.size))
+                request = json.loads(await reader.readexactly(size))
+                try:
+                    response = {"scores": await self.score(request["pairs"])}
+                except Exception as e:
+                    response = {"error": str(e)}
+
+                payload = json.dumps(response).encode("utf-8")
+                writer.write(_HEADER.pack(len(payload)) + payload)
+                await writer.drain()
+        except (asyncio.IncompleteReadError, ConnectionResetError):
+            pass  # worker closed the connection
+        finally:
+            writer.close()
+
+
+    async def serve(self, socket_path: str) -> None:
+        if os.path.exists(socket_path):
+            os.unlink(socket_path)
+
+        server = await asyncio.start_unix_server(self._handle, path=socket_path)
+        os.chmod(socket_path, 0o600)
+        logger.info(f"Shared reranker listening on {socket_path}")
+
+        async with server:
+            await server.serve_forever()
+
+
+def main():
+    from core.config import settings
+    from core.clients import load_cross_encoder
+    from services.reranker_service import cross_encoder_kwargs
+
+    parser = argparse.ArgumentParser(description="Serve the CrossEncoder reranker to all API workers over a Unix socket")
+    parser.add_argument("--socket", default=settings.RERANKER_SOCKET, required=not settings.RERANKER_SOCKET)
+    parser.add_argument("--model", default=settings.RERANKER_MODEL)
+    parser.add_argument("--threads", type=int, default=settings.RERANK_WORKERS, help="Concurrent predict calls")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+
+    model = load_cross_encoder(args.model, **cross_encoder_kwargs(
+        settings.RERANKER_BACKEND, settings.RERANKER_MODEL_FILE, settings.MODEL_CACHE_DIR, settings.MODEL_LOCAL_FILES_ONLY
+    ))
+    model.predict([("warm up", "warm up")])
+    logger.info(f"Loaded reranker {args.model} with backend={settings.RERANKER_BACKEND}")
+
+    server = RerankerServer(
+        model,
+        batch_size=settings.RERANKER_BATCH_SIZE,
+        max_wait_ms=settings.RERANKER_MAX_WAIT_MS,
+        threads=args.threads,
+    )
+    asyncio.run(server.serve(args.socket))
+
+
+if __name__ == "__main__":
+    main()
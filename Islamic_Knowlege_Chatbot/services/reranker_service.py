@@ -0,0 +1,177 @@
+import asyncio
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Optional, Tuple
+
+from core.clients import get_cross_encoder
+
+logger = logging.getLogger(__name__)
+
+
+def cross_encoder_kwargs(
+    backend: str = "torch",
+    model_file: Optional[str] = None,
+    cache_folder: Optional[str] = None,
+    local_files_only: bool = False,
+) -> dict:
+    """CrossEncoder constructor arguments shared by the in-process and the standalone reranker"""
+    # Artifacts are kept in a local cache folder so restarts do not download the model again
+    kwargs = {"cache_folder": cache_folder, "local_files_only": local_files_only}
+    # ONNX / OpenVINO (optionally quantized) CPU inference is opt-in; CrossEncoder takes backend= from sentence-transformers 4.1
+    if backend != "torch":
+        kwargs["backend"] = backend
+        if model_file:
+            kwargs["model_kwargs"] = {"file_name": model_file}
+    return kwargs
+
+
+class RerankerService:
+    """
+    CrossEncoder reranking shared by every retrieval of the process.
+
+    Pairs submitted within `max_wait_ms` of each other (all sources of one request, and
+    concurrent requests) are coalesced into a single `predict` call, and scores are cached
+    per (query hash, point id) so repeated questions skip inference entirely.
+    """
+
+    def __init__(
+        self,
+        model_name: str,
+        backend: str = "torch",
+        model_file: Optional[str] = None,
+        batch_size: int = 64,
+        max_wait_ms: float = 5.0,
+        cache_size: int = 20000,
+        workers: int = 2,
+        cache_folder: Optional[str] = None,
+        local_files_only: bool = False,
+    ):
+
+        self.batch_size = batch_size
+        self.max_wait = max_wait_ms / 1000
+        self.cache_size = cache_size
+
+        self.model_name = model_name
+        self.backend = backend
+        self.model_kwargs = cross_encoder_kwargs(backend, model_file, cache_folder, local_files_only)
+
+        # CrossEncoder.predict is CPU-bound, keep it off the event loop
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="rerank")
+
+        self._scores: "OrderedDict[tuple, float]" = OrderedDict()
+        self._scores_lock = threading.Lock()
+
+        self._pending: List[Tuple[Tuple[str, str], asyncio.Future]] = []
+        self._flush_task: Optional[asyncio.Task] = None
+
+
+    @property
+    def model(self):
+        """The CrossEncoder is loaded on first use (or by warm_up), not when the service is built"""
+        return get_cross_encoder(self.model_name, **self.model_kwargs)
+
+
+    def warm_up(self) -> None:
+        """Load the model and run one inference so the first request does not pay for it"""
+        self.model.predict([("warm up", "warm up")])
+        logger.info(f"Reranker {self.model_name} ready with backend={self.backend}")
+
+
+    @staticmethod
+    def _query_hash(query: str) -> str:
+        return hashlib.sha1(query.encode("utf-8")).hexdigest()
+
+
+    @staticmethod
+    def _document_key(document: dict) -> str:
+        """Point id scoped by collection; fall back to the content hash for documents without one"""
+        point_id = document.get('id')
+        if point_id is None:
+            return hashlib.sha1(document.get('content', '').encode("utf-8")).hexdigest()
+        return f"{document.get('source', '')}:{point_id}"
+
+
+    def _get_cached(self, key: tuple) -> Optional[float]:
+        with self._scores_lock:
+            score = self._scores.get(key)
+            if score is not None:
+                self._scores.move_to_end(key)
+            return score
+
+
+    def _put_cached(self, key: tuple, score: float) -> None:
+        if self.cache_size <= 0:
+            return
+        with self._scores_lock:
+            self._scores[key] = score
+            self._scores.move_to_end(key)
+            while len(self._scores) > self.cache_size:
+                self._scores.popitem(last=False)
+
+
+    async def score(self, query: str, documents: list) -> List[float]:
+        """
+        Return one relevance score per document, in order
+        """
+        query_hash = self._query_hash(query)
+        keys = [(query_hash, self._document_key(doc)) for doc in documents]
+        scores: List[Optional[float]] = [self._get_cached(key) for key in keys]
+
+        loop = asyncio.get_running_loop()
+        waiting = []
+        for i, doc in enumerate(documents):
+            if scores[i] is None:
+                future = loop.create_future()
+                self._pending.append(((query, doc['content']), future))
+                waiting.append((i, future))
+
+        if waiting:
+            self._schedule_flush()
+            results = await asyncio.gather(*(future for _, future in waiting))
+            for (i, _), score in zip(waiting, results):
+                scores[i] = score
+                self._put_cached(keys[i], score)
+
+        return scores
+
+
+    def _schedule_flush(self) -> None:
+        if len(self._pending) >= self.batch_size:
+            self._start_flush(delay=0)
+        elif self._flush_task is None or self._flush_task.done():
+            self._start_flush(delay=self.max_wait)
+
+
+    def _start_flush(self, delay: float) -> None:
+        self._flush_task = asyncio.create_task(self._flush(delay))
+
+
+    async def _flush(self, delay: float) -> None:
+        """Wait for the micro-batch window to close, then score everything queued in one predict call"""
+        if delay:
+            await asyncio.sleep(delay)
+
+        batch, self._pending = self._pending, []
+        # The window is closed: pairs queued while this batch is predicted start a new one
+        if self._flush_task is asyncio.current_task():
+            self._flush_task = None
+        if not batch:
+            return
+
+        pairs = [pair for pair, _ in batch]
+        try:
+            loop = asyncio.get_running_loop()
+            relevance_scores = await loop.run_in_executor(
+                self.executor, lambda: self.model.predict(pairs, batch_size=self.batch_size)
+            )
+            for (_, future), score in zip(batch, relevance_scores):
+                if not future.done():
+                    future.set_result(float(score))
+        except Exception as e:
+            logger.error(f"Reranking batch of {len(pairs)} pairs failed: {e}")
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
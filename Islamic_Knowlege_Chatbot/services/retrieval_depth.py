@@ -0,0 +1,93 @@
+import threading
+from collections import Counter
+from dataclasses import dataclass
+from typing import Dict, List
+
+
+@dataclass
+class DepthDecision:
+    action: str  # "fixed", "early_stop", "full" or "expand"
+    depth: int  # vector candidates kept for reranking (before any expansion)
+    top_score: float
+    spread: float  # top minus last vector score of the fetched pool
+
+
+class AdaptiveDepth:
+    """
+    Rerank depth from the shape of the vector scores instead of always reranking the whole
+    limit*2 pool.
+
+    When the top candidates clear `margin` over the rest, only those (at least `limit`) go to
+    the cross-encoder: the tail is unlikely to be reranked into the top `limit`. When the whole
+    pool lies within `flat_spread` and is relevant (top score at least `expand_min_score`), the
+    vector scores do not separate the candidates, so `expand_factor * limit` more are fetched and
+    everything is reranked; a flat pool of weak matches is not worth expanding. Scores must be
+    similarities (higher is better) in descending order, as Qdrant returns them for cosine/dot.
+    """
+
+    def __init__(
+        self,
+        enabled: bool = True,
+        margin: float = 0.05,
+        flat_spread: float = 0.02,
+        expand_min_score: float = 0.3,
+        expand_factor: int = 2,
+    ):
+
+        self.enabled = enabled
+        self.margin = margin
+        self.flat_spread = flat_spread
+        self.expand_min_score = expand_min_score
+        self.expand_factor = expand_factor
+
+        self._lock = threading.Lock()
+        self._counts = Counter()
+
+
+    def decide(self, scores: List[float], limit: int, requested: int, adaptive: bool = True) -> DepthDecision:
+        """
+        Args:
+            scores: vector scores of the fetched pool, best first
+            limit: documents kept after reranking
+            requested: pool size that was asked for; a shorter pool means the collection (or filter) ran out
+            adaptive: False for scores without an absolute scale, e.g. RRF fusion
+        """
+        if not scores:
+            return DepthDecision("fixed", 0, 0.0, 0.0)
+
+        top_score, spread = scores[0], scores[0] - scores[-1]
+        if not (self.enabled and adaptive) or len(scores) <= limit:
+            return DepthDecision("fixed", len(scores), top_score, spread)
+
+        if spread < self.flat_spread and top_score >= self.expand_min_score and len(scores) >= requested:
+            return DepthDecision("expand", len(scores), top_score, spread)
+
+        within_margin = sum(score >= top_score - self.margin for score in scores)
+        depth = max(limit, within_margin)
+        return DepthDecision("early_stop" if depth < len(scores) else "full", depth, top_score, spread)
+
+
+    def record(self, decision: DepthDecision, reranked: int, fixed: int) -> None:
+        """Count the decision and the reranked pairs against what the fixed limit*2 policy would have scored"""
+        with self._lock:
+            self._counts[decision.action] += 1
+            self._counts["pairs_reranked"] += reranked
+            self._counts["pairs_fixed"] += fixed
+
+
+    def reset(self) -> None:
+        with self._lock:
+            self._counts.clear()
+
+
+    def stats(self) -> Dict[str, float]:
+        with self._lock:
+            counts = dict(self._counts)
+        reranked, fixed = counts.pop("pairs_reranked", 0), counts.pop("pairs_fixed", 0)
+        return {
+            **counts,
+            "decisions": sum(counts.values()),
+            "pairs_reranked": reranked,
+            "pairs_fixed": fixed,
+            "pairs_saved_rate": 1 - reranked / fixed if fixed else 0.0,
+        }
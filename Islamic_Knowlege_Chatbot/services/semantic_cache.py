@@ -0,0 +1,164 @@
+import time
+import uuid
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+
+@dataclass
+class SemanticCacheEntry:
+    slot: int  # row of the embedding in the cache matrix
+    language: str
+    final_response: str
+    citations: List[Dict[str, Any]] = field(default_factory=list)
+    created_at: float = field(default_factory=time.monotonic)
+
+
+class SemanticCache:
+    """
+    Answer cache keyed on the query embedding, the detected language and a scope (the metadata
+    filters the answer was retrieved with). A lookup hits when a stored query of the same language
+    and scope is at least `threshold` cosine-similar.
+    Entries expire after `ttl_seconds` and the least recently used entry is evicted past `max_entries`.
+
+    Embeddings live in a matrix preallocated for `max_entries` rows that store() fills in place,
+    so a lookup is one matrix-vector product rather than a re-stack of every cached embedding.
+    """
+
+    def __init__(self, threshold: float = 0.92, ttl_seconds: int = 86400, max_entries: int = 2048):
+
+        self.threshold = threshold
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+
+        self._entries: "OrderedDict[str, SemanticCacheEntry]" = OrderedDict()
+        self._lock = threading.Lock()
+
+        # Allocated on the first store, once the embedding size is known
+        self._matrix: Optional[np.ndarray] = None
+        self._keys: List[Optional[str]] = [None] * max(max_entries, 0)
+        self._partitions = np.full(max(max_entries, 0), -1, dtype=np.int32)  # -1 marks a free row
+        self._created = np.full(max(max_entries, 0), np.inf)
+        self._partition_ids: Dict[str, int] = {}
+        self._free = list(range(max(max_entries, 0) - 1, -1, -1))
+
+        # Counters exposed through stats()
+        self.hits = 0
+        self.misses = 0
+        self.size_evictions = 0
+        self.ttl_evictions = 0
+        self._lookup_count = 0
+        self._lookup_seconds_total = 0.0
+        self._lookup_seconds_max = 0.0
+
+
+    @staticmethod
+    def _normalize(embedding) -> np.ndarray:
+        vector = np.asarray(embedding, dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+
+    @staticmethod
+    def _partition_key(language: str, scope: str) -> str:
+        return f"{(language or '').upper()}|{scope}"
+
+
+    def _remove(self, key: str) -> None:
+        """Free an entry's row (caller holds the lock)"""
+        entry = self._entries.pop(key)
+        self._keys[entry.slot] = None
+        self._partitions[entry.slot] = -1
+        self._created[entry.slot] = np.inf
+        self._free.append(entry.slot)
+
+
+    def _expire(self, now: float) -> None:
+        """Drop entries older than the TTL (caller holds the lock)"""
+        expired = np.flatnonzero(self._created < now - self.ttl_seconds)
+        for slot in expired:
+            self._remove(self._keys[slot])
+        self.ttl_evictions += len(expired)
+
+
+    def lookup(self, embedding, language: str, scope: str = "") -> Optional[SemanticCacheEntry]:
+        """Return the most similar cached answer for this language and scope, or None below the threshold"""
+        started = time.perf_counter()
+        query_vector = self._normalize(embedding)
+
+        with self._lock:
+            self._expire(time.monotonic())
+
+            partition = self._partition_ids.get(self._partition_key(language, scope))
+            best_key, best_score = None, -1.0
+            if partition is not None and self._matrix is not None:
+                scores = np.where(self._partitions == partition, self._matrix @ query_vector, -np.inf)
+                best_index = int(np.argmax(scores))
+                if np.isfinite(scores[best_index]):
+                    best_key, best_score = self._keys[best_index], float(scores[best_index])
+
+            if best_key is not None and best_score >= self.threshold:
+                self._entries.move_to_end(best_key)
+                self.hits += 1
+                result = self._entries[best_key]
+            else:
+                self.misses += 1
+                result = None
+
+            elapsed = time.perf_counter() - started
+            self._lookup_count += 1
+            self._lookup_seconds_total += elapsed
+            self._lookup_seconds_max = max(self._lookup_seconds_max, elapsed)
+
+        return result
+
+
+    def store(self, embedding, language: str, final_response: str, citations: List[Dict[str, Any]], scope: str = "") -> None:
+        if self.max_entries <= 0:
+            return
+
+        vector = self._normalize(embedding)
+        key = uuid.uuid4().hex
+
+        with self._lock:
+            if self._matrix is None:
+                self._matrix = np.zeros((self.max_entries, vector.shape[0]), dtype=np.float32)
+
+            if not self._free:
+                self._remove(next(iter(self._entries)))
+                self.size_evictions += 1
+
+            entry = SemanticCacheEntry(
+                slot=self._free.pop(),
+                language=(language or "").upper(),
+                final_response=final_response,
+                citations=citations,
+            )
+            partition = self._partition_ids.setdefault(self._partition_key(language, scope), len(self._partition_ids))
+
+            self._matrix[entry.slot] = vector
+            self._keys[entry.slot] = key
+            self._partitions[entry.slot] = partition
+            self._created[entry.slot] = entry.created_at
+            self._entries[key] = entry
+
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "threshold": self.threshold,
+                "ttl_seconds": self.ttl_seconds,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "size_evictions": self.size_evictions,
+                "ttl_evictions": self.ttl_evictions,
+                "avg_lookup_ms": 1000 * self._lookup_seconds_total / self._lookup_count if self._lookup_count else 0.0,
+                "max_lookup_ms": 1000 * self._lookup_seconds_max,
+            }
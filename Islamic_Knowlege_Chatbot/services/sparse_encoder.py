@@ -0,0 +1,63 @@
+
+import re
+import zlib
+from collections import Counter
+
+from qdrant_client import models
+
+
+
+# Words too common to help lexical matching
+_STOPWORDS = frozenset("""
+a an and are as at be by for from has have in is it of on or that the this to was were what which who
+with why how does do did about can i me my you your we our he his she her they their them its not no
+""".split())
+
+_TOKEN = re.compile(r"[\w']+", re.UNICODE)
+
+
+class SparseEncoder:
+    """
+    BM25 sparse vectors for Qdrant hybrid search. Documents carry the saturated term frequency,
+    queries mark each term once; Qdrant applies the IDF side (SparseVectorParams(modifier=IDF)),
+    so the collection statistics never have to be kept here.
+    """
+
+    def __init__(self, k1: float = 1.2, b: float = 0.75, avg_doc_length: float = 256.0):
+
+        self.k1 = k1
+        self.b = b
+        self.avg_doc_length = avg_doc_length
+
+
+    @staticmethod
+    def tokenize(text: str) -> list:
+        return [token for token in _TOKEN.findall((text or "").lower()) if token not in _STOPWORDS and len(token) > 1]
+
+
+    @staticmethod
+    def _index(token: str) -> int:
+        # Stable across processes, unlike hash()
+        return zlib.crc32(token.encode("utf-8"))
+
+
+    def _to_vector(self, weights: dict) -> models.SparseVector:
+        # Colliding tokens share one dimension
+        merged = Counter()
+        for token, weight in weights.items():
+            merged[self._index(token)] += weight
+        return models.SparseVector(indices=list(merged.keys()), values=[float(value) for value in merged.values()])
+
+
+    def encode_document(self, text: str) -> models.SparseVector:
+        tokens = self.tokenize(text)
+        length_norm = self.k1 * (1 - self.b + self.b * len(tokens) / self.avg_doc_length)
+        weights = {
+            token: count * (self.k1 + 1) / (count + length_norm)
+            for token, count in Counter(tokens).items()
+        }
+        return self._to_vector(weights)
+
+
+    def encode_query(self, text: str) -> models.SparseVector:
+        return self._to_vector({token: 1.0 for token in self.tokenize(text)})
@@ -0,0 +1,155 @@
+import uuid
+import time
+import logging
+import functools
+import threading
+import contextvars
+from bisect import bisect_left
+from contextlib import contextmanager
+from typing import Dict, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+# Request id of the query being served; copied into every task the request spawns
+request_id_var: contextvars.ContextVar = contextvars.ContextVar("request_id", default="-")
+
+# Histogram buckets in seconds, from cache lookups up to slow LLM answers
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+
+def new_request_id() -> str:
+    return uuid.uuid4().hex[:16]
+
+
+class StageTracer:
+    """
+    Per-stage latency spans for the query pipeline.
+    Every span is logged with the current request id and recorded in a latency histogram
+    labelled by stage and source, exported in the Prometheus text format by render_prometheus().
+    """
+
+    def __init__(self, buckets: Tuple[float, ...] = DEFAULT_BUCKETS):
+
+        self.buckets = buckets
+        self._lock = threading.Lock()
+        self._bucket_counts: Dict[Tuple[str, str], list] = {}
+        self._sums: Dict[Tuple[str, str], float] = {}
+        self._errors: Dict[Tuple[str, str], int] = {}
+
+
+    def observe(self, stage: str, seconds: float, source: str = "", error: bool = False) -> None:
+        key = (stage, source)
+        with self._lock:
+            counts = self._bucket_counts.setdefault(key, [0] * (len(self.buckets) + 1))
+            counts[bisect_left(self.buckets, seconds)] += 1
+            self._sums[key] = self._sums.get(key, 0.0) + seconds
+            if error:
+                self._errors[key] = self._errors.get(key, 0) + 1
+
+
+    @contextmanager
+    def span(self, stage: str, source: str = ""):
+        """Time a block of (sync or async) code as one stage of the current request"""
+        start = time.perf_counter()
+        error = False
+        try:
+            yield
+        except BaseException:
+            error = True
+            raise
+        finally:
+            elapsed = time.perf_counter() - start
+            self.observe(stage, elapsed, source, error)
+            label = f"{stage}[{source}]" if source else stage
+            logger.info(f"request_id={request_id_var.get()} span={label} duration_ms={elapsed * 1000:.1f}{' error' if error else ''}")
+
+
+    def traced(self, stage: str):
+        """
+        Decorator for async graph nodes and service methods. When the call receives a
+        LangraphState its request_id becomes the current one for the duration of the call.
+        """
+        def decorator(func):
+            @functools.wraps(func)
+            async def wrapper(*args, **kwargs):
+                request_id = next((getattr(arg, "request_id", None) for arg in args if getattr(arg, "request_id", None)), None)
+                token = request_id_var.set(request_id) if request_id else None
+                try:
+                    with self.span(stage):
+                        return await func(*args, **kwargs)
+                finally:
+                    if token is not None:
+                        request_id_var.reset(token)
+            return wrapper
+        return decorator
+
+
+    def _quantile(self, counts: list, q: float) -> float:
+        """Upper bound of the bucket holding the q-quantile (the last finite bound for the +Inf bucket)"""
+        target = q * sum(counts)
+        cumulative = 0
+        for bound, count in zip(self.buckets, counts):
+            cumulative += count
+            if cumulative >= target:
+                return bound
+        return self.buckets[-1]
+
+
+    def snapshot(self) -> Dict[str, Dict[str, float]]:
+        """Per stage[source]: count, mean and bucket-resolution p50/p95 in milliseconds"""
+        with self._lock:
+            bucket_counts = {key: list(counts) for key, counts in self._bucket_counts.items()}
+            sums = dict(self._sums)
+            errors = dict(self._errors)
+
+        summary = {}
+        for (stage, source), counts in sorted(bucket_counts.items()):
+            count = sum(counts)
+            summary[f"{stage}[{source}]" if source else stage] = {
+                "count": count,
+                "errors": errors.get((stage, source), 0),
+                "mean_ms": sums[(stage, source)] / count * 1000,
+                "p50_ms": self._quantile(counts, 0.5) * 1000,
+                "p95_ms": self._quantile(counts, 0.95) * 1000,
+            }
+        return summary
+
+
+    def reset(self) -> None:
+        with self._lock:
+            self._bucket_counts.clear()
+            self._sums.clear()
+            self._errors.clear()
+
+
+    def render_prometheus(self, metric: str = "rag_stage_duration_seconds") -> str:
+        with self._lock:
+            bucket_counts = {key: list(counts) for key, counts in self._bucket_counts.items()}
+            sums = dict(self._sums)
+            errors = dict(self._errors)
+
+        lines = [
+            f"# HELP {metric} Latency of each query pipeline stage.",
+            f"# TYPE {metric} histogram",
+        ]
+        for (stage, source), counts in sorted(bucket_counts.items()):
+            labels = f'stage="{stage}",source="{source}"'
+            cumulative = 0
+            for bound, count in zip(self.buckets, counts):
+                cumulative += count
+                lines.append(f'{metric}_bucket{{{labels},le="{bound}"}} {cumulative}')
+            cumulative += counts[-1]
+            lines.append(f'{metric}_bucket{{{labels},le="+Inf"}} {cumulative}')
+            lines.append(f"{metric}_sum{{{labels}}} {sums[(stage, source)]:.6f}")
+            lines.append(f"{metric}_count{{{labels}}} {cumulative}")
+
+        lines.append("# HELP rag_stage_errors_total Stage spans that ended with an exception.")
+        lines.append("# TYPE rag_stage_errors_total counter")
+        for (stage, source), count in sorted(errors.items()):
+            lines.append(f'rag_stage_errors_total{{stage="{stage}",source="{source}"}} {count}')
+
+        return "\n".join(lines) + "\n"
+
+
+tracer = StageTracer()
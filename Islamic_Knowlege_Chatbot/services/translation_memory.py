@@ -0,0 +1,64 @@
+import os
+import hashlib
+import sqlite3
+import threading
+from typing import Dict, List
+
+
+class TranslationMemory:
+    """Persistent translation memory keyed by source-text hash and target language (SQLite)"""
+
+    def __init__(self, path: str):
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(path, check_same_thread=False)
+        self._connection.execute("PRAGMA journal_mode=WAL")
+        self._connection.execute(
+            """
+            CREATE TABLE IF NOT EXISTS translations (
+                source_hash TEXT NOT NULL,
+                target_lang TEXT NOT NULL,
+                translated_text TEXT NOT NULL,
+                PRIMARY KEY (source_hash, target_lang)
+            )
+            """
+        )
+        self._connection.commit()
+
+
+    @staticmethod
+    def _hash(text: str) -> str:
+        return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+    def get_many(self, texts: List[str], target_lang: str) -> Dict[str, str]:
+        """Return {source text: translation} for every text already in memory"""
+        hashes = {self._hash(text): text for text in texts}
+        if not hashes:
+            return {}
+
+        placeholders = ",".join("?" * len(hashes))
+        with self._lock:
+            rows = self._connection.execute(
+                f"SELECT source_hash, translated_text FROM translations "
+                f"WHERE target_lang = ? AND source_hash IN ({placeholders})",
+                [target_lang, *hashes],
+            ).fetchall()
+
+        return {hashes[source_hash]: translated for source_hash, translated in rows}
+
+
+    def put_many(self, translations: Dict[str, str], target_lang: str) -> None:
+        if not translations:
+            return
+
+        with self._lock:
+            self._connection.executemany(
+                "INSERT OR REPLACE INTO translations (source_hash, target_lang, translated_text) VALUES (?, ?, ?)",
+                [(self._hash(source), target_lang, translated) for source, translated in translations.items()],
+            )
+            self._connection.commit()
@@ -0,0 +1,5 @@
+from benchmarks.fakes import prepare_environment
+
+
+# Settings are read at import time: provide every required one and keep caches and logs in a scratch directory
+prepare_environment()
@@ -0,0 +1,34 @@
+import asyncio
+import sqlite3
+from dataclasses import dataclass
+
+from services.deepL_service import Deepl_Service
+
+
+@dataclass
+class _Result:
+    text: str
+
+
+class LockedTranslationMemory:
+    """Every SQLite call fails, as with several workers contending for one database"""
+
+    def get_many(self, texts, target_lang):
+        raise sqlite3.OperationalError("database is locked")
+
+
+    def put_many(self, translations, target_lang):
+        raise sqlite3.OperationalError("database is locked")
+
+
+def test_translations_survive_a_failing_memory():
+    service = Deepl_Service()
+    service.translation_memory = LockedTranslationMemory()
+
+    async def translate_text(texts, **kwargs):
+        return [_Result(f"ru:{text}") for text in texts]
+
+    service._translate_text = translate_text
+
+    translated = asyncio.run(service.translate_passages(["patience", "mercy", "patience"], "RU"))
+    assert translated == ["ru:patience", "ru:mercy", "ru:patience"]
@@ -0,0 +1,23 @@
+import logging
+
+from qdrant_client import QdrantClient, models
+
+from scripts.provision_payload_indexes import check_fields
+
+
+def test_warns_about_keys_no_sampled_point_has(caplog):
+    client = QdrantClient(":memory:")
+    client.create_collection("hadith", vectors_config=models.VectorParams(size=2, distance=models.Distance.COSINE))
+    client.upsert("hadith", [
+        models.PointStruct(id=i, vector=[1.0, 0.0], payload={"metadata": {"collection": "Sahih Muslim", "hadith_number": str(i)}})
+        for i in range(5)
+    ])
+
+    fields = {"collection": "metadata.collection", "number": "metadata.hadith_number", "grading": "metadata.grading"}
+    with caplog.at_level(logging.WARNING):
+        check_fields(client, "hadith", fields, sample_size=50)
+
+    warnings = [record.getMessage() for record in caplog.records if record.levelno == logging.WARNING]
+    assert len(warnings) == 2
+    assert any("metadata.grading" in warning for warning in warnings)
+    assert any("not integers" in warning for warning in warnings)
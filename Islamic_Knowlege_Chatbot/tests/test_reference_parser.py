@@ -0,0 +1,64 @@
+import pytest
+
+from schemas.data_classes.content_type import ContentType
+from services.reference_parser import parse_filters, parse_reference
+
+
+@pytest.mark.parametrize("query, surah, ayah", [
+    ("What is the meaning of Ayat al-Kursi?", 2, 255),
+    ("Explain the light verse", 24, 35),
+    ("Explain verse 2:286 of the Quran", 2, 286),
+    ("Q. 2:255", 2, 255),
+    ("Surah 18:10", 18, 10),
+    ("Al-Baqarah 2:255", 2, 255),
+    ("Explain Surah Al-Baqarah ayah 30", 2, 30),
+    ("ayah 10 of surah Yusuf", 12, 10),
+])
+def test_quran_reference(query, surah, ayah):
+    reference = parse_reference(query)
+    assert reference.content_type == ContentType.QURAN
+    assert (reference.surah, reference.ayah_start, reference.exact) == (surah, ayah, True)
+
+
+@pytest.mark.parametrize("query", [
+    "highlight verse of the day",
+    "prayer times 5:30",
+    "Meeting at 5:30",
+    "Al-Baqarah 3:5",
+])
+def test_not_a_quran_reference(query):
+    assert parse_reference(query) is None
+
+
+def test_bare_verse_in_quran_question_is_only_a_hint():
+    reference = parse_reference("What does the Quran say about the 5 daily prayers and 2:30 times")
+    assert (reference.surah, reference.ayah_start, reference.exact) == (2, 30, False)
+
+
+@pytest.mark.parametrize("query, collection, number", [
+    ("Sahih Bukhari hadith 7", "Sahih al-Bukhari", 7),
+    ("Bukhari 1", "Sahih al-Bukhari", 1),
+    ("Sahih Muslim 40", "Sahih Muslim", 40),
+    ("Muslim #40", "Sahih Muslim", 40),
+    ("hadith 52 of Muslim", "Sahih Muslim", 52),
+    ("Muwatta Malik 3", "Muwatta Malik", 3),
+])
+def test_hadith_reference(query, collection, number):
+    reference = parse_reference(query)
+    assert reference.content_type == ContentType.HADITH
+    assert (reference.collection, reference.hadith_number) == (collection, number)
+
+
+@pytest.mark.parametrize("query", [
+    "hadith about muslim 40 brothers",
+    "what did imam malik 3 times say in hadith",
+    "hadith narrated by ahmad 2 days before",
+])
+def test_not_a_hadith_reference(query):
+    assert parse_reference(query) is None
+
+
+def test_filters_need_an_explicit_collection():
+    assert parse_filters("hadith in Sahih Muslim about fasting").collection == "Sahih Muslim"
+    assert parse_filters("hadith about muslim brothers") is None
+    assert parse_filters("main themes of Surah Al-Kahf").surah == 18
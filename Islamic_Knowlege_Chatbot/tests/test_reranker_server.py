@@ -0,0 +1,26 @@
+import asyncio
+
+from services.reranker_server import RerankerServer
+
+
+class LengthCrossEncoder:
+
+    def predict(self, pairs, batch_size: int = 32, **kwargs):
+        return [float(len(document)) for _, document in pairs]
+
+
+def test_cancelled_request_does_not_break_its_batch():
+    server = RerankerServer(LengthCrossEncoder(), max_wait_ms=20)
+
+    async def run():
+        first = asyncio.create_task(server.score([["q", "a"]]))
+        dropped = asyncio.create_task(server.score([["q", "bb"]]))
+        last = asyncio.create_task(server.score([["q", "ccc"], ["q", "dddd"]]))
+        await asyncio.sleep(0)
+
+        # A worker disconnects while its request waits in the batch window
+        dropped.cancel()
+        return await asyncio.wait_for(asyncio.gather(first, last), timeout=5)
+
+    assert asyncio.run(run()) == [[1.0], [3.0, 4.0]]
+    server.executor.shutdown()
@@ -0,0 +1,50 @@
+import asyncio
+import threading
+
+from core.clients import override_client
+from services.reranker_service import RerankerService
+
+
+class BlockingCrossEncoder:
+    """Scores a pair by its document length; the first predict waits until released"""
+
+    def __init__(self):
+        self.started = threading.Event()
+        self.release = threading.Event()
+        self.batches = []
+
+
+    def predict(self, pairs, batch_size: int = 32, **kwargs):
+        self.batches.append(len(pairs))
+        if len(self.batches) == 1:
+            self.started.set()
+            self.release.wait(timeout=5)
+        return [float(len(document)) for _, document in pairs]
+
+
+def _documents(prefix: str, count: int) -> list:
+    return [{"id": i, "source": prefix, "content": prefix * (i + 1)} for i in range(count)]
+
+
+def test_scores_queued_during_a_predict_all_resolve():
+    model = BlockingCrossEncoder()
+    override_client(("cross_encoder", "test-blocking"), model)
+    service = RerankerService("test-blocking", max_wait_ms=1, cache_size=0)
+
+    async def run():
+        first = asyncio.create_task(service.score("q", _documents("a", 3)))
+        while not model.started.is_set():
+            await asyncio.sleep(0.001)
+
+        # Arrive while the first batch is being predicted
+        later = [asyncio.create_task(service.score("q", _documents(prefix, 2))) for prefix in "bcd"]
+        await asyncio.sleep(0.02)
+        model.release.set()
+
+        return await asyncio.wait_for(asyncio.gather(first, *later), timeout=5)
+
+    results = asyncio.run(run())
+
+    assert results == [[1.0, 2.0, 3.0], [1.0, 2.0], [1.0, 2.0], [1.0, 2.0]]
+    assert sum(model.batches) == 9
+    service.executor.shutdown()